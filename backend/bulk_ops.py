@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Jimmy's Tapas Bar CMS - Bulk Admin Operations
+Helpers for admin endpoints that act on many rows at once.
+
+Each operation runs in one transaction: the affected rows are locked and
+read with SELECT ... WHERE id IN (...) FOR UPDATE, changed with one
+set-based statement per chunk, and every requested id gets a result
+("deleted", "approved", "not_found", ...), so the admin UI can report
+exactly what happened without issuing a request per row.
+"""
+
+from typing import List
+
+from pydantic import BaseModel
+
+# Ids per IN (...) list; keeps statements well below max_allowed_packet
+BULK_CHUNK_SIZE = 500
+BULK_MAX_IDS = 5000
+
+class BulkIds(BaseModel):
+    ids: List[str]
+
+def unique_ids(ids: list) -> list:
+    """Drop duplicates and blanks, keeping the request order."""
+    return list(dict.fromkeys(str(item_id) for item_id in ids if item_id))
+
+def id_chunks(ids: list):
+    for start in range(0, len(ids), BULK_CHUNK_SIZE):
+        yield ids[start:start + BULK_CHUNK_SIZE]
+
+def in_list(chunk: list) -> str:
+    return ", ".join(["%s"] * len(chunk))
+
+async def lock_rows(cursor, table: str, columns: str, ids: list) -> dict:
+    """{id: row} for the ids that exist, locked until the transaction ends."""
+    rows = {}
+    for chunk in id_chunks(ids):
+        await cursor.execute(f"SELECT id, {columns} FROM {table} WHERE id IN ({in_list(chunk)}) FOR UPDATE", chunk)
+        rows.update((row["id"], row) for row in await cursor.fetchall())
+    return rows
+
+async def execute_for_ids(cursor, statement: str, ids: list, params: tuple = ()) -> int:
+    """Run statement (ending in "WHERE id IN ({ids})") once per chunk; returns affected rows."""
+    affected = 0
+    for chunk in id_chunks(ids):
+        await cursor.execute(statement.format(ids=in_list(chunk)), (*params, *chunk))
+        affected += cursor.rowcount
+    return affected
+
+def bulk_result(results: dict) -> dict:
+    counts = {}
+    for status in results.values():
+        counts[status] = counts.get(status, 0) + 1
+    return {"results": results, "counts": counts}
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Jimmy's Tapas Bar CMS - Cache Versions
+Version rows in cache_versions that tell every backend worker to drop
+cached payloads.
+
+A writer bumps the row of whatever it changed on its own connection; each
+worker compares the rows with the versions it built its payloads from. The
+backend's caches and the command line tools (menu_import.py) share these
+helpers, so a write made outside a running worker invalidates the same rows.
+"""
+
+import hashlib
+
+from menu_search import fold
+
+MENU_CACHE = "menu"
+# One row per menu category, named by partition_version_name()
+MENU_CATEGORY_CACHE = "menu_category"
+
+async def bump_cache_version(cursor, name: str) -> int:
+    """Increment a version row on the writer's own connection/transaction."""
+    await cursor.execute("""
+        INSERT INTO cache_versions (name, version) VALUES (%s, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """, (name,))
+    await cursor.execute("SELECT version FROM cache_versions WHERE name = %s", (name,))
+    row = await cursor.fetchone()
+    return row['version']
+
+def partition_version_name(cache: str, partition: str) -> str:
+    # cache_versions.name is VARCHAR(50), category names may be longer. Folded like
+    # MySQL's case/accent-insensitive collation, so "paella" and "Paella" share a version
+    key = fold(partition).strip()
+    return f"{cache}:{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}"
+
+async def bump_menu_versions(cursor, categories) -> None:
+    """Announce a menu write: the full menu and each touched category are rebuilt.
+    Any category bump also drops the category list (PartitionedCache.INDEX_KEY)."""
+    await bump_cache_version(cursor, MENU_CACHE)
+    for category in {category for category in categories if category is not None}:
+        await bump_cache_version(cursor, partition_version_name(MENU_CATEGORY_CACHE, category))
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Jimmy's Tapas Bar CMS - Image Store
+Content-addressed storage for uploaded images and their responsive derivatives.
+
+Uploads are stored once under their SHA-256 hash:
+  uploads/<aa>/<sha256>.<ext>
+Width-bucketed derivatives, each as WebP plus a JPEG/PNG fallback, go to
+  uploads/derived/<aa>/<sha256>-<width>.<ext>
+followed by uploads/derived/<aa>/<sha256>.json, written last, which lists the
+widths that exist. Both trees never change once written, so nginx serves
+/api/uploads/ straight from disk with an immutable Cache-Control and every
+uvicorn worker sees the same files.
+
+Derivatives are built with Pillow in a small thread pool (Pillow releases the
+GIL while resizing and encoding). Without Pillow uploads still work, the API
+just has no srcset to offer.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it no derivatives are built
+    Image = None
+
+UPLOAD_DIR = Path(os.environ.get('UPLOAD_DIR', Path(__file__).parent / 'uploads'))
+DERIVED_DIR = UPLOAD_DIR / "derived"
+UPLOAD_URL_PREFIX = "/api/uploads"
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Widths sized for phone cards up to full-width desktop heroes
+IMAGE_WIDTHS = sorted(int(width) for width in os.environ.get('IMAGE_WIDTHS', '320,640,960,1280').split(','))
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+WEBP_QUALITY = 78
+JPEG_QUALITY = 82
+# Refuse decompression bombs well before Pillow's own limit
+IMAGE_MAX_PIXELS = 40_000_000
+
+# Sniffed from the file header, the client's content type is not trusted
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+]
+
+UPLOAD_URL_PATTERN = re.compile(re.escape(UPLOAD_URL_PREFIX) + r"/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z]+)")
+
+class ImageStoreError(ValueError):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def image_extension(header: bytes) -> Optional[str]:
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return ".webp"
+    if header[4:8] == b"ftyp" and header[8:12] in (b"avif", b"avis"):
+        return ".avif"
+    return None
+
+def stored_image_path(digest: str, extension: str) -> Path:
+    # Two-level fan-out keeps directories small
+    return UPLOAD_DIR / digest[:2] / f"{digest}{extension}"
+
+def stored_image_url(digest: str, extension: str) -> str:
+    return f"{UPLOAD_URL_PREFIX}/{digest[:2]}/{digest}{extension}"
+
+def parse_image_url(url) -> Optional[tuple]:
+    """(digest, extension) for URLs pointing into the store, None for anything else."""
+    if not isinstance(url, str) or UPLOAD_URL_PREFIX not in url:
+        return None
+    match = UPLOAD_URL_PATTERN.fullmatch(urlsplit(url).path)
+    return match.groups() if match else None
+
+def write_atomically(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            out.write(data)
+        os.chmod(temp_name, 0o644)
+        os.replace(temp_name, path)
+    except BaseException:
+        os.unlink(temp_name)
+        raise
+
+def commit_stored_image(temp_path: Path, digest: str, extension: str) -> Path:
+    """Move a fully written temp file to its content address (same content = same file)."""
+    target = stored_image_path(digest, extension)
+    if target.exists():
+        temp_path.unlink()
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, target)
+    return target
+
+def store_image_bytes(content: bytes) -> dict:
+    extension = image_extension(content[:16])
+    if extension is None:
+        raise ImageStoreError("Only JPEG, PNG, GIF, WebP and AVIF images are supported", 415)
+    digest = hashlib.sha256(content).hexdigest()
+    target = stored_image_path(digest, extension)
+    if not target.exists():
+        write_atomically(target, content)
+    return {"image_url": stored_image_url(digest, extension), "size": len(content), "sha256": digest}
+
+async def save_upload(file) -> dict:
+    """Stream an UploadFile into the store in chunks, hashing as it goes."""
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload-")
+    temp_path = Path(temp_name)
+    sha256 = hashlib.sha256()
+    size = 0
+    extension = None
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                if extension is None:
+                    extension = image_extension(chunk[:16])
+                    if extension is None:
+                        raise ImageStoreError("Only JPEG, PNG, GIF, WebP and AVIF images are supported", 415)
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise ImageStoreError(f"Image larger than {UPLOAD_MAX_BYTES // (1024 * 1024)} MB", 413)
+                sha256.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+        if extension is None:
+            raise ImageStoreError("Empty file")
+        digest = sha256.hexdigest()
+        await asyncio.to_thread(commit_stored_image, temp_path, digest, extension)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+    return {"image_url": stored_image_url(digest, extension), "size": size, "sha256": digest}
+
+# Responsive derivatives
+def derived_path(digest: str, name: str) -> Path:
+    return DERIVED_DIR / digest[:2] / f"{digest}{name}"
+
+def derived_url(digest: str, name: str) -> str:
+    return f"{UPLOAD_URL_PREFIX}/derived/{digest[:2]}/{digest}{name}"
+
+def encode_image(image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "WEBP":
+        image.save(buffer, "WEBP", quality=WEBP_QUALITY, method=4)
+    elif fmt == "JPEG":
+        image.convert("RGB").save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+def build_derivatives(digest: str, extension: str) -> dict:
+    """Resize one stored image into every width bucket. Runs in the worker pool."""
+    manifest_file = derived_path(digest, ".json")
+    if manifest_file.exists():
+        return json.loads(manifest_file.read_text())
+
+    manifest = {"width": None, "height": None, "widths": [], "fallback": None}
+    try:
+        with Image.open(stored_image_path(digest, extension)) as source:
+            if source.width * source.height > IMAGE_MAX_PIXELS:
+                raise ValueError(f"{source.width}x{source.height} exceeds {IMAGE_MAX_PIXELS} pixels")
+            # Animated GIFs would lose their animation, keep them as they are
+            if getattr(source, "is_animated", False):
+                raise ValueError("animated image")
+            image = ImageOps.exif_transpose(source)
+            image.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        # Recorded so the image is not retried on every request
+        manifest["error"] = str(e)
+        write_atomically(manifest_file, json.dumps(manifest).encode("utf-8"))
+        return manifest
+
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    fallback_format, fallback = ("PNG", ".png") if has_alpha else ("JPEG", ".jpg")
+    manifest.update(width=image.width, height=image.height, fallback=fallback)
+
+    # Never upscale: buckets wider than the source collapse into one at full width
+    widths = [width for width in IMAGE_WIDTHS if width < image.width]
+    if len(widths) < len(IMAGE_WIDTHS):
+        widths.append(image.width)
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        write_atomically(derived_path(digest, f"-{width}.webp"), encode_image(resized, "WEBP"))
+        write_atomically(derived_path(digest, f"-{width}{fallback}"), encode_image(resized, fallback_format))
+        manifest["widths"].append(width)
+
+    write_atomically(manifest_file, json.dumps(manifest).encode("utf-8"))
+    return manifest
+
+def document_strings(data):
+    """Every string value anywhere in a JSON document."""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif isinstance(value, str):
+            yield value
+
+class DerivativePipeline:
+    """Builds derivatives off the event loop and answers srcset lookups from memory."""
+
+    def __init__(self, workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-derivatives")
+        self.manifests = {}
+        self.pending = {}
+        # Coroutine functions awaited with the digest once new derivatives exist,
+        # so payloads cached without their srcsets can be rebuilt
+        self.listeners = []
+
+    def manifest(self, digest: str) -> Optional[dict]:
+        manifest = self.manifests.get(digest)
+        if manifest is None:
+            # Another worker may have built it; the files are shared
+            manifest_file = derived_path(digest, ".json")
+            if manifest_file.exists():
+                manifest = self.manifests[digest] = json.loads(manifest_file.read_text())
+        return manifest
+
+    def ensure(self, digest: str, extension: str) -> Optional[asyncio.Future]:
+        """Start building derivatives unless they exist or are already being built."""
+        if Image is None or self.manifest(digest) is not None:
+            return None
+        future = self.pending.get(digest)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, build_derivatives, digest, extension)
+            self.pending[digest] = future
+            future.add_done_callback(lambda done: self._finished(digest, done))
+        return future
+
+    def _finished(self, digest: str, future: asyncio.Future):
+        self.pending.pop(digest, None)
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            print(f"⚠️ Image derivatives for {digest[:12]} failed: {future.exception()}")
+        else:
+            manifest = self.manifests[digest] = future.result()
+            if manifest["widths"]:
+                for listener in self.listeners:
+                    asyncio.ensure_future(listener(digest))
+
+    async def build(self, url: str) -> Optional[dict]:
+        """Build (or reuse) the derivatives of a stored image and return its variants."""
+        parsed = parse_image_url(url)
+        if parsed is None:
+            return None
+        future = self.ensure(*parsed)
+        if future is not None:
+            try:
+                await asyncio.shield(future)
+            except Exception:
+                return None
+        return self.variants(url)
+
+    def variants(self, url, queue: bool = True) -> Optional[dict]:
+        """srcset strings for a stored image, or None if there are none (yet).
+
+        Missing derivatives of stored images are queued (unless queue is
+        False, e.g. outside an event loop), so images that predate the
+        pipeline get theirs on first use.
+        """
+        parsed = parse_image_url(url)
+        if parsed is None:
+            return None
+        digest, extension = parsed
+        manifest = self.manifest(digest)
+        if manifest is None:
+            if queue:
+                self.ensure(digest, extension)
+            return None
+        if not manifest["widths"]:
+            return None
+        return {
+            "width": manifest["width"],
+            "height": manifest["height"],
+            "srcset": ", ".join(f"{derived_url(digest, f'-{width}' + manifest['fallback'])} {width}w"
+                                for width in manifest["widths"]),
+            "webp_srcset": ", ".join(f"{derived_url(digest, f'-{width}.webp')} {width}w"
+                                     for width in manifest["widths"]),
+        }
+
+    def collect(self, data, queue: bool = True) -> dict:
+        """Variants for every stored image URL found anywhere in a JSON document, keyed by URL."""
+        found = {}
+        for value in set(document_strings(data)):
+            variants = self.variants(value, queue)
+            if variants is not None:
+                found[value] = variants
+        return found
+
+    def unbuilt(self, data) -> set:
+        """Stored image URLs in a JSON document whose derivatives were not built yet."""
+        if Image is None:
+            return set()
+        unbuilt = set()
+        for value in document_strings(data):
+            parsed = parse_image_url(value)
+            if parsed is not None and self.manifest(parsed[0]) is None:
+                unbuilt.add(value)
+        return unbuilt
+
+image_pipeline = DerivativePipeline(IMAGE_WORKERS)
+
+def srcset_fields(url) -> dict:
+    """image_srcset/image_webp_srcset fields for an API item whose image is url."""
+    variants = image_pipeline.variants(url)
+    if variants is None:
+        return {}
+    return {"image_srcset": variants["srcset"], "image_webp_srcset": variants["webp_srcset"]}
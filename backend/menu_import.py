@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Jimmy's Tapas Bar CMS - Menu Import
+Imports the menu from a declarative file (CSV, JSON or YAML) without blanking it.
+
+The file lists every menu item; items are matched to existing rows by their
+natural key (category, name). Only the differences are written, in one
+transaction: new items are inserted, changed items updated, and active items
+missing from the file are deactivated (is_active = FALSE) rather than deleted.
+
+Used by POST /api/admin/menu/import and from the command line:
+  python3 menu_import.py speisekarte.csv [--dry-run] [--keep-missing]
+
+Columns: name, category and price are required for new items. Optional:
+description, detailed_description, origin, allergens, additives,
+preparation_method, ingredients, vegan, vegetarian, glutenfree, order_index.
+Columns missing from the file keep their current values; order_index
+defaults to the position in the file.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import os
+import sys
+import uuid
+
+try:
+    import yaml
+except ImportError:  # PyYAML is optional; CSV and JSON always work
+    yaml = None
+
+MENU_TEXT_FIELDS = ["name", "description", "detailed_description", "price", "category", "origin",
+                    "allergens", "additives", "preparation_method", "ingredients"]
+MENU_FLAG_FIELDS = ["vegan", "vegetarian", "glutenfree"]
+MENU_FIELDS = MENU_TEXT_FIELDS + MENU_FLAG_FIELDS + ["order_index"]
+MENU_IMPORT_FORMATS = ("csv", "json", "yaml")
+# Rows per UPDATE ... WHERE id IN (...) statement
+MENU_IMPORT_CHUNK_SIZE = 500
+
+TRUE_VALUES = {"1", "true", "yes", "ja", "x", "y", "j"}
+
+class MenuImportError(ValueError):
+    pass
+
+def menu_format(filename: str) -> str:
+    extension = os.path.splitext(filename)[1].lower().lstrip(".")
+    fmt = "yaml" if extension == "yml" else extension
+    if fmt not in MENU_IMPORT_FORMATS:
+        raise MenuImportError(f"Unsupported menu file format: {filename}")
+    return fmt
+
+def parse_menu_document(text: str, fmt: str) -> list:
+    """Parse a menu file into a list of raw item dicts."""
+    if fmt == "csv":
+        # Excel exports often use ';' - let the sniffer decide
+        try:
+            dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        return list(csv.DictReader(io.StringIO(text), dialect=dialect))
+    if fmt == "json":
+        data = json.loads(text)
+    elif fmt == "yaml":
+        if yaml is None:
+            raise MenuImportError("YAML menu files need PyYAML (pip install pyyaml)")
+        data = yaml.safe_load(text)
+    else:
+        raise MenuImportError(f"Unsupported menu file format: {fmt}")
+    # Either a plain list or {"items": [...]}
+    if isinstance(data, dict):
+        data = data.get("items")
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        raise MenuImportError("Menu file must contain a list of items")
+    return data
+
+def normalize_price(value) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"{value:.2f}".replace(".", ",")
+    return str(value).replace("€", "").strip()
+
+def normalize_item(raw: dict, position: int) -> dict:
+    """Clean one raw item; only fields present in the file are kept."""
+    item = {}
+    for field in MENU_TEXT_FIELDS:
+        if field in raw:
+            value = raw[field]
+            item[field] = "" if value is None else (
+                normalize_price(value) if field == "price" else str(value).strip())
+    for field in MENU_FLAG_FIELDS:
+        if field in raw and raw[field] not in (None, ""):
+            value = raw[field]
+            item[field] = value if isinstance(value, bool) else str(value).strip().lower() in TRUE_VALUES
+    try:
+        item["order_index"] = int(raw["order_index"]) if raw.get("order_index") not in (None, "") else position
+    except (TypeError, ValueError):
+        raise MenuImportError(f"Item {position}: order_index must be a number")
+    if not item.get("name") or not item.get("category"):
+        raise MenuImportError(f"Item {position}: name and category are required")
+    return item
+
+def load_menu_items(text: str, fmt: str) -> list:
+    items = [normalize_item(raw, position) for position, raw in enumerate(parse_menu_document(text, fmt), 1)]
+    seen = set()
+    for item in items:
+        key = natural_key(item)
+        if key in seen:
+            raise MenuImportError(f"Duplicate menu item in file: {item['category']} / {item['name']}")
+        seen.add(key)
+    return items
+
+def natural_key(row: dict) -> tuple:
+    return (row["category"].strip().casefold(), row["name"].strip().casefold())
+
+def comparable(field: str, value):
+    if field in MENU_FLAG_FIELDS:
+        return bool(value)
+    if field == "order_index":
+        return int(value or 0)
+    return "" if value is None else str(value)
+
+def diff_menu(current_rows: list, items: list, deactivate_missing: bool = True) -> dict:
+    """Work out which rows to insert, update and deactivate.
+
+    Returns {"upserts": [row, ...], "deactivate": [id, ...], "inserted": n,
+    "updated": n, "unchanged": n}. Upsert rows carry every MENU_FIELDS value,
+    with fields missing from the file taken from the current row.
+    """
+    by_key = {}
+    duplicates = []
+    # Prefer the active row when earlier full reloads left duplicates behind
+    for row in sorted(current_rows, key=lambda row: not row["is_active"]):
+        key = natural_key(row)
+        if key in by_key:
+            duplicates.append(row)
+        else:
+            by_key[key] = row
+
+    upserts, inserted, updated, unchanged = [], 0, 0, 0
+    matched = set()
+    for item in items:
+        current = by_key.get(natural_key(item))
+        if current is None:
+            if not item.get("price"):
+                raise MenuImportError(f"New item {item['category']} / {item['name']} needs a price")
+            row = {field: False if field in MENU_FLAG_FIELDS else "" for field in MENU_FIELDS}
+            row.update(item)
+            row["id"] = str(uuid.uuid4())
+            upserts.append(row)
+            inserted += 1
+            continue
+        matched.add(current["id"])
+        row = {field: current[field] for field in MENU_FIELDS}
+        row.update(item)
+        row["id"] = current["id"]
+        if current["is_active"] and all(
+                comparable(field, row[field]) == comparable(field, current[field]) for field in MENU_FIELDS):
+            unchanged += 1
+        else:
+            upserts.append(row)
+            updated += 1
+
+    deactivate = [row["id"] for row in duplicates if row["is_active"]]
+    if deactivate_missing:
+        deactivate += [row["id"] for row in by_key.values() if row["is_active"] and row["id"] not in matched]
+    return {"upserts": upserts, "deactivate": deactivate, "inserted": inserted,
+            "updated": updated, "unchanged": unchanged}
+
+async def apply_menu_import(cursor, items: list, deactivate_missing: bool = True, dry_run: bool = False) -> dict:
+    """Diff items against menu_items and write the changes with the given (dict) cursor.
+
+    The caller owns the transaction: begin before, commit (or roll back for a
+    dry run) after, then invalidate the menu cache if anything changed.
+    """
+    await cursor.execute(f"SELECT id, is_active, {', '.join(MENU_FIELDS)} FROM menu_items FOR UPDATE")
+    current_rows = await cursor.fetchall()
+    diff = diff_menu(current_rows, items, deactivate_missing)
+    # Categories whose contents change, for the per-category menu cache
+    category_of = {row["id"]: row["category"] for row in current_rows}
+    categories = {row["category"] for row in diff["upserts"]} | {category_of[i] for i in diff["deactivate"]}
+
+    if not dry_run:
+        if diff["upserts"]:
+            columns = ["id"] + MENU_FIELDS + ["is_active"]
+            # executemany turns this into multi-row INSERT statements
+            await cursor.executemany(f"""
+                INSERT INTO menu_items ({', '.join(columns)})
+                VALUES ({', '.join(['%s'] * len(columns))})
+                ON DUPLICATE KEY UPDATE {', '.join(f'{field} = VALUES({field})' for field in MENU_FIELDS)},
+                is_active = VALUES(is_active)
+            """, [tuple(row[field] for field in ["id"] + MENU_FIELDS) + (True,) for row in diff["upserts"]])
+        for start in range(0, len(diff["deactivate"]), MENU_IMPORT_CHUNK_SIZE):
+            chunk = diff["deactivate"][start:start + MENU_IMPORT_CHUNK_SIZE]
+            await cursor.execute(
+                f"UPDATE menu_items SET is_active = FALSE WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+                chunk)
+
+    return {
+        "inserted": diff["inserted"],
+        "updated": diff["updated"],
+        "deactivated": len(diff["deactivate"]),
+        "unchanged": diff["unchanged"],
+        "categories": sorted(categories),
+        "dry_run": dry_run,
+    }
+
+def menu_import_changed(result: dict) -> bool:
+    return not result["dry_run"] and any(result[key] for key in ("inserted", "updated", "deactivated"))
+
+async def main():
+    import aiomysql
+    from dotenv import load_dotenv
+    from cache_versions import bump_menu_versions
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if len(args) != 1:
+        print(__doc__)
+        sys.exit(2)
+    dry_run = "--dry-run" in sys.argv
+    deactivate_missing = "--keep-missing" not in sys.argv
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+    path = args[0]
+    with open(path, encoding="utf-8-sig") as menu_file:
+        items = load_menu_items(menu_file.read(), menu_format(path))
+    print(f"📄 {len(items)} Menü-Artikel in {path}")
+
+    settings = dict(
+        user=os.environ.get('MYSQL_USER', 'root'),
+        password=os.environ.get('MYSQL_PASSWORD', ''),
+        db=os.environ.get('MYSQL_DATABASE', 'jimmys_tapas_bar'),
+        charset='utf8mb4',
+        cursorclass=aiomysql.DictCursor,
+        autocommit=True,
+    )
+    socket = os.environ.get('MYSQL_SOCKET', '/run/mysqld/mysqld.sock')
+    if os.path.exists(socket):
+        conn = await aiomysql.connect(unix_socket=socket, **settings)
+    else:
+        conn = await aiomysql.connect(host=os.environ.get('MYSQL_HOST', 'localhost'),
+                                      port=int(os.environ.get('MYSQL_PORT', 3306)), **settings)
+    try:
+        cursor = await conn.cursor()
+        await conn.begin()
+        try:
+            result = await apply_menu_import(cursor, items, deactivate_missing, dry_run)
+        except Exception:
+            await conn.rollback()
+            raise
+        if dry_run:
+            await conn.rollback()
+        else:
+            await conn.commit()
+        if menu_import_changed(result):
+            # Tell running backend workers to drop their cached menu and the touched categories
+            await bump_menu_versions(cursor, result["categories"])
+    finally:
+        conn.close()
+
+    prefix = "🔍 Probelauf: " if dry_run else "✅ "
+    print(f"{prefix}{result['inserted']} neu, {result['updated']} geändert, "
+          f"{result['deactivated']} deaktiviert, {result['unchanged']} unverändert")
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except MenuImportError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Jimmy's Tapas Bar CMS - Menu Search
+In-memory inverted index over the active menu items, so the Speisekarte can
+be searched and filtered without shipping the whole menu to the browser.
+
+Text is folded before indexing and querying: lower case, diacritics removed
+("Jamón Ibérico" -> "jamon iberico"), ß -> ss. German and Spanish filler words
+are dropped and common plural/inflection endings stripped ("Tomaten" and
+"Tomate" both index as "tomat"). Every query word is matched as a prefix, so
+results appear while typing, and long words are also indexed by their tail
+so compound parts match ("garnelen" finds "Knoblauchgarnelen").
+
+Document sets are Python ints used as bitsets (bit n = slot n): postings,
+diet facets, categories and allergens are all masks, so a query is a handful
+of AND/OR/AND NOT operations on a few hundred bits. refresh() diffs the given
+rows against the indexed ones and only (re)indexes what changed.
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left, insort
+
+# Field -> weight of a whole-word hit; a hit on a word tail counts half
+FIELD_WEIGHTS = {
+    "name": 8.0,
+    "category": 4.0,
+    "ingredients": 3.0,
+    "origin": 2.0,
+    "description": 2.0,
+    "detailed_description": 1.0,
+}
+PART_WEIGHT = 0.5
+DIET_FACETS = ("vegan", "vegetarian", "glutenfree")
+# Word tails shorter than this are not indexed ("en", "sse", ...)
+MIN_PART_LENGTH = 4
+STOPWORDS = frozenset("""
+    und oder mit ohne der die das den dem des ein eine einer eines einem einen
+    im in ins vom von aus auf an am zu zum zur fur nach bei sowie je art
+    de del la las el los y con al en a o
+""".split())
+# Longest first; only stripped while at least four characters remain
+SUFFIXES = ("ern", "en", "er", "es", "e", "n", "s")
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+ALLERGEN_SEPARATORS = re.compile(r"[,;/]|\bund\b")
+PREFIX_CACHE_SIZE = 2048
+
+def fold(text) -> str:
+    """Lower case ASCII-ish form: "Jamón Ibérico" -> "jamon iberico", "Süß" -> "suss"."""
+    text = unicodedata.normalize("NFKD", str(text or "").casefold())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+def stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+def tokenize(text) -> list:
+    """Folded, stemmed words of text without filler words."""
+    return [stem(word) for word in WORD_PATTERN.findall(fold(text)) if word not in STOPWORDS]
+
+def query_terms(query: str) -> list:
+    """Like tokenize, but the last word is kept even if it is a filler word - it may still be typed."""
+    words = WORD_PATTERN.findall(fold(query))
+    terms = [stem(word) for word in words[:-1] if word not in STOPWORDS]
+    if words:
+        terms.append(stem(words[-1]))
+    return list(dict.fromkeys(terms))
+
+def allergen_labels(text) -> list:
+    return [label.strip() for label in ALLERGEN_SEPARATORS.split(str(text or "")) if label.strip()]
+
+def bit_slots(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class Posting:
+    __slots__ = ("mask", "weights")
+
+    def __init__(self):
+        self.mask = 0
+        self.weights = {}
+
+class MenuSearchIndex:
+    def __init__(self):
+        self.version = None
+        self.slots = {}          # item id -> slot
+        self.free_slots = []
+        self.items = {}          # slot -> item dict as returned by the API
+        self.signatures = {}     # slot -> the indexed values, to detect changes
+        self.item_terms = {}     # slot -> terms to remove the slot from again
+        self.postings = {}       # term -> Posting
+        self.terms = []          # sorted postings keys, for prefix ranges
+        self.facets = {facet: 0 for facet in DIET_FACETS}
+        self.categories = {}     # folded category -> mask
+        self.allergens = {}      # folded allergen label -> mask
+        self.allergen_names = {}  # folded allergen label -> label as written
+        self.all_mask = 0
+        self.prefix_cache = {}
+
+    def __len__(self):
+        return len(self.slots)
+
+    @staticmethod
+    def signature(item: dict) -> tuple:
+        return tuple(sorted((key, str(value)) for key, value in item.items()))
+
+    def refresh(self, items: list) -> dict:
+        """Make the index hold exactly items (API dicts with an "id"); returns what changed."""
+        changes = {"added": 0, "updated": 0, "removed": 0}
+        seen = set()
+        for item in items:
+            item_id = item["id"]
+            seen.add(item_id)
+            slot = self.slots.get(item_id)
+            if slot is None:
+                self.add(item)
+                changes["added"] += 1
+            elif self.signatures[slot] != self.signature(item):
+                self.remove(item_id)
+                self.add(item)
+                changes["updated"] += 1
+        for item_id in [item_id for item_id in self.slots if item_id not in seen]:
+            self.remove(item_id)
+            changes["removed"] += 1
+        if any(changes.values()):
+            self.prefix_cache.clear()
+        return changes
+
+    def add(self, item: dict):
+        slot = self.free_slots.pop() if self.free_slots else len(self.slots)
+        bit = 1 << slot
+        self.slots[item["id"]] = slot
+        self.items[slot] = item
+        self.signatures[slot] = self.signature(item)
+        self.all_mask |= bit
+
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for word in tokenize(item.get(field)):
+                if weights.get(word, 0) < weight:
+                    weights[word] = weight
+                for start in range(1, len(word) - MIN_PART_LENGTH + 1):
+                    part = word[start:]
+                    if weights.get(part, 0) < weight * PART_WEIGHT:
+                        weights[part] = weight * PART_WEIGHT
+        for term, weight in weights.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = Posting()
+                insort(self.terms, term)
+            posting.mask |= bit
+            posting.weights[slot] = weight
+        self.item_terms[slot] = list(weights)
+
+        for facet in DIET_FACETS:
+            if item.get(facet):
+                self.facets[facet] |= bit
+        category = fold(item.get("category"))
+        self.categories[category] = self.categories.get(category, 0) | bit
+        for label in allergen_labels(item.get("allergens")):
+            key = fold(label)
+            self.allergens[key] = self.allergens.get(key, 0) | bit
+            self.allergen_names.setdefault(key, label)
+
+    def remove(self, item_id: str):
+        slot = self.slots.pop(item_id)
+        keep = ~(1 << slot)
+        for term in self.item_terms.pop(slot):
+            posting = self.postings[term]
+            posting.mask &= keep
+            del posting.weights[slot]
+            if not posting.mask:
+                del self.postings[term]
+                del self.terms[bisect_left(self.terms, term)]
+        for facet in DIET_FACETS:
+            self.facets[facet] &= keep
+        for masks in (self.categories, self.allergens):
+            for key in list(masks):
+                masks[key] &= keep
+                if not masks[key]:
+                    del masks[key]
+        for key in [key for key in self.allergen_names if key not in self.allergens]:
+            del self.allergen_names[key]
+        self.all_mask &= keep
+        del self.items[slot]
+        del self.signatures[slot]
+        self.free_slots.append(slot)
+
+    def expand(self, prefix: str):
+        """(mask, {slot: best weight}) over every term starting with prefix."""
+        cached = self.prefix_cache.get(prefix)
+        if cached is not None:
+            return cached
+        mask, scores = 0, {}
+        position = bisect_left(self.terms, prefix)
+        while position < len(self.terms) and self.terms[position].startswith(prefix):
+            term = self.terms[position]
+            posting = self.postings[term]
+            mask |= posting.mask
+            # A completed word ranks above a word that merely starts with the prefix
+            factor = 1.0 if term == prefix else 0.8
+            for slot, weight in posting.weights.items():
+                if scores.get(slot, 0) < weight * factor:
+                    scores[slot] = weight * factor
+            position += 1
+        if len(self.prefix_cache) >= PREFIX_CACHE_SIZE:
+            self.prefix_cache.clear()
+        self.prefix_cache[prefix] = cached = (mask, scores)
+        return cached
+
+    def allergen_mask(self, names) -> int:
+        mask = 0
+        for name in names:
+            key = fold(name).strip()
+            if key:
+                for label, label_mask in self.allergens.items():
+                    if label.startswith(key):
+                        mask |= label_mask
+        return mask
+
+    def search(self, query: str = "", vegan: bool = False, vegetarian: bool = False, glutenfree: bool = False,
+               exclude_allergens=(), category: str = None, limit: int = 50, offset: int = 0) -> dict:
+        matched = self.all_mask
+        scores = {}
+        for term in query_terms(query):
+            mask, term_scores = self.expand(term)
+            matched &= mask
+            if not matched:
+                break
+            for slot in bit_slots(matched):
+                scores[slot] = scores.get(slot, 0) + term_scores[slot]
+        if category:
+            matched &= self.categories.get(fold(category), 0)
+        if exclude_allergens:
+            matched &= ~self.allergen_mask(exclude_allergens)
+
+        # Counts for the diet toggles, before they are applied
+        facets = {facet: (matched & self.facets[facet]).bit_count() for facet in DIET_FACETS}
+        allergens = {self.allergen_names[key]: count for key, mask in self.allergens.items()
+                     if (count := (matched & mask).bit_count())}
+        for facet, wanted in zip(DIET_FACETS, (vegan, vegetarian, glutenfree)):
+            if wanted:
+                matched &= self.facets[facet]
+
+        items = self.items
+        ranked = sorted(bit_slots(matched), key=lambda slot: (
+            -scores.get(slot, 0), items[slot].get("order_index") or 0, items[slot]["name"]))
+        return {
+            "total": len(ranked),
+            "items": [items[slot] for slot in ranked[offset:offset + limit]],
+            "facets": {**facets, "allergens": allergens},
+        }
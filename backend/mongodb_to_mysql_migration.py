@@ -2,12 +2,24 @@
 """
 Jimmy's Tapas Bar CMS - MongoDB to MySQL Migration Script
 Migrates all data from MongoDB to the new MySQL database structure.
+
+Each collection is streamed from MongoDB in batches and written with
+multi-row upserts (executemany). Independent collections run concurrently
+over a small MySQL pool. After every batch the last migrated _id is stored
+in the migration_checkpoints table, in the same transaction as the rows, so
+a failed run resumes where it stopped instead of starting over.
+
+Usage: python3 mongodb_to_mysql_migration.py [--restart]
+  --restart   ignore existing checkpoints and migrate everything again
 """
 
 import asyncio
 import json
 import aiomysql
 import os
+import sys
+import time
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
 from dotenv import load_dotenv
@@ -31,6 +43,9 @@ mysql_config = {
     'autocommit': True
 }
 
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', 500))
+MIGRATION_CONCURRENCY = int(os.environ.get('MIGRATION_CONCURRENCY', 4))
+
 async def get_mysql_connection():
     return await aiomysql.connect(**mysql_config)
 
@@ -44,505 +59,337 @@ def convert_datetime(value):
         return [convert_datetime(item) for item in value]
     return value
 
-async def migrate_users():
-    """Migrate users from MongoDB to MySQL"""
-    print("🔄 Migrating users...")
-    
-    # Get all users from MongoDB
-    users = await mongo_db.users.find({}).to_list(length=None)
-    
-    if not users:
-        print("   ✅ No users found in MongoDB")
-        return
-    
-    mysql_conn = await get_mysql_connection()
-    try:
-        cursor = await mysql_conn.cursor()
-        
-        migrated_count = 0
-        for user in users:
-            try:
-                # Remove MongoDB ObjectId
-                if '_id' in user:
-                    del user['_id']
-                
-                await cursor.execute("""
-                    INSERT INTO users (id, username, email, password_hash, role, is_active, created_at, last_login)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    email = VALUES(email), password_hash = VALUES(password_hash), 
-                    role = VALUES(role), is_active = VALUES(is_active)
-                """, (
-                    user.get('id'), user.get('username'), user.get('email'),
-                    user.get('password_hash'), user.get('role', 'viewer'),
-                    user.get('is_active', True), user.get('created_at'),
-                    user.get('last_login')
-                ))
-                migrated_count += 1
-            except Exception as e:
-                print(f"   ❌ Error migrating user {user.get('username', 'unknown')}: {e}")
-        
-        print(f"   ✅ Migrated {migrated_count} users")
-    finally:
-        mysql_conn.close()
+def to_json(value):
+    return json.dumps(convert_datetime(value))
 
-async def migrate_reviews():
-    """Migrate reviews from MongoDB to MySQL"""
-    print("🔄 Migrating reviews...")
-    
-    reviews = await mongo_db.reviews.find({}).to_list(length=None)
-    
-    if not reviews:
-        print("   ✅ No reviews found in MongoDB")
-        return
-    
-    mysql_conn = await get_mysql_connection()
-    try:
-        cursor = await mysql_conn.cursor()
-        
-        migrated_count = 0
-        for review in reviews:
-            try:
-                if '_id' in review:
-                    del review['_id']
-                
-                await cursor.execute("""
-                    INSERT INTO reviews (id, customer_name, rating, comment, date, is_approved, approved_by, approved_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    customer_name = VALUES(customer_name), rating = VALUES(rating),
-                    comment = VALUES(comment), is_approved = VALUES(is_approved)
-                """, (
-                    review.get('id'), review.get('customer_name'), review.get('rating'),
-                    review.get('comment'), review.get('date'), review.get('is_approved', False),
-                    review.get('approved_by'), review.get('approved_at')
-                ))
-                migrated_count += 1
-            except Exception as e:
-                print(f"   ❌ Error migrating review {review.get('id', 'unknown')}: {e}")
-        
-        print(f"   ✅ Migrated {migrated_count} reviews")
-    finally:
-        mysql_conn.close()
+class TableMigration:
+    """How one MongoDB collection maps onto one MySQL table."""
+    def __init__(self, collection, table, columns, update_columns, to_row, label=None,
+                 sort=None, limit=None):
+        self.collection = collection
+        self.table = table
+        self.columns = columns
+        self.to_row = to_row
+        self.label = label or collection.replace('_', ' ')
+        # Collections migrated in _id order can resume from a checkpoint;
+        # a custom sort/limit selection is always migrated as a whole
+        self.sort = sort
+        self.limit = limit
+        placeholders = ", ".join(["%s"] * len(columns))
+        updates = ", ".join(f"{column} = VALUES({column})" for column in update_columns)
+        self.sql = (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+                    f"ON DUPLICATE KEY UPDATE {updates}")
 
-async def migrate_menu_items():
-    """Migrate menu items from MongoDB to MySQL"""
-    print("🔄 Migrating menu items...")
-    
-    menu_items = await mongo_db.menu_items.find({}).to_list(length=None)
-    
-    if not menu_items:
-        print("   ✅ No menu items found in MongoDB")
-        return
-    
-    mysql_conn = await get_mysql_connection()
-    try:
-        cursor = await mysql_conn.cursor()
-        
-        migrated_count = 0
-        for item in menu_items:
-            try:
-                if '_id' in item:
-                    del item['_id']
-                
-                await cursor.execute("""
-                    INSERT INTO menu_items (id, name, description, price, category, image, details,
-                                           vegan, vegetarian, glutenfree, order_index, is_active,
-                                           created_at, updated_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    name = VALUES(name), description = VALUES(description), price = VALUES(price),
-                    category = VALUES(category), image = VALUES(image), details = VALUES(details),
-                    vegan = VALUES(vegan), vegetarian = VALUES(vegetarian), 
-                    glutenfree = VALUES(glutenfree), order_index = VALUES(order_index),
-                    is_active = VALUES(is_active), updated_at = VALUES(updated_at)
-                """, (
-                    item.get('id'), item.get('name'), item.get('description'),
-                    item.get('price'), item.get('category'), item.get('image'),
-                    item.get('details'), item.get('vegan', False),
-                    item.get('vegetarian', False), item.get('glutenfree', False),
-                    item.get('order_index', 0), item.get('is_active', True),
-                    item.get('created_at'), item.get('updated_at')
-                ))
-                migrated_count += 1
-            except Exception as e:
-                print(f"   ❌ Error migrating menu item {item.get('name', 'unknown')}: {e}")
-        
-        print(f"   ✅ Migrated {migrated_count} menu items")
-    finally:
-        mysql_conn.close()
+    @property
+    def resumable(self):
+        return self.sort is None and self.limit is None
 
-async def migrate_contact_messages():
-    """Migrate contact messages from MongoDB to MySQL"""
-    print("🔄 Migrating contact messages...")
-    
-    messages = await mongo_db.contact_messages.find({}).to_list(length=None)
-    
-    if not messages:
-        print("   ✅ No contact messages found in MongoDB")
-        return
-    
-    mysql_conn = await get_mysql_connection()
-    try:
-        cursor = await mysql_conn.cursor()
-        
-        migrated_count = 0
-        for message in messages:
-            try:
-                if '_id' in message:
-                    del message['_id']
-                
-                await cursor.execute("""
-                    INSERT INTO contact_messages (id, name, email, phone, subject, message, date, is_read, responded)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    name = VALUES(name), email = VALUES(email), phone = VALUES(phone),
-                    subject = VALUES(subject), message = VALUES(message), 
-                    is_read = VALUES(is_read), responded = VALUES(responded)
-                """, (
-                    message.get('id'), message.get('name'), message.get('email'),
-                    message.get('phone'), message.get('subject'), message.get('message'),
-                    message.get('date'), message.get('is_read', False),
-                    message.get('responded', False)
-                ))
-                migrated_count += 1
-            except Exception as e:
-                print(f"   ❌ Error migrating contact message {message.get('id', 'unknown')}: {e}")
-        
-        print(f"   ✅ Migrated {migrated_count} contact messages")
-    finally:
-        mysql_conn.close()
+    def cursor(self, after_id):
+        query = {"_id": {"$gt": after_id}} if after_id is not None else {}
+        cursor = mongo_db[self.collection].find(query)
+        cursor = cursor.sort(self.sort) if self.sort else cursor.sort("_id", 1)
+        if self.limit:
+            cursor = cursor.limit(self.limit)
+        return cursor.batch_size(MIGRATION_BATCH_SIZE)
 
-async def migrate_homepage_content():
-    """Migrate homepage content from MongoDB to MySQL"""
-    print("🔄 Migrating homepage content...")
-    
-    content = await mongo_db.homepage_content.find_one()
-    
-    if not content:
-        print("   ✅ No homepage content found in MongoDB")
-        return
-    
-    mysql_conn = await get_mysql_connection()
-    try:
-        cursor = await mysql_conn.cursor()
-        
-        if '_id' in content:
-            del content['_id']
-        
-        # Convert nested objects to JSON strings
-        hero_data = content.get('hero', {})
-        features_data = content.get('features', {})
-        specialties_data = content.get('specialties', {})
-        delivery_data = content.get('delivery', {})
-        
-        await cursor.execute("""
-            INSERT INTO homepage_content (id, hero_title, hero_subtitle, hero_description,
-                                         hero_location, hero_background_image, hero_menu_button_text,
-                                         hero_locations_button_text, features_data, specialties_data,
-                                         delivery_data, updated_at, updated_by)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-            hero_title = VALUES(hero_title), hero_subtitle = VALUES(hero_subtitle),
-            hero_description = VALUES(hero_description), hero_location = VALUES(hero_location),
-            features_data = VALUES(features_data), specialties_data = VALUES(specialties_data),
-            delivery_data = VALUES(delivery_data), updated_at = VALUES(updated_at)
-        """, (
-            content.get('id'), hero_data.get('title', 'JIMMY\'S TAPAS BAR'),
-            hero_data.get('subtitle', 'an der Ostsee'),
-            hero_data.get('description', 'Genießen Sie authentische mediterrane Spezialitäten'),
-            hero_data.get('location', 'direkt an der malerischen Ostseeküste'),
-            hero_data.get('background_image'),
-            hero_data.get('menu_button_text', 'Zur Speisekarte'),
-            hero_data.get('locations_button_text', 'Unsere Standorte'),
-            json.dumps(convert_datetime(features_data)),
-            json.dumps(convert_datetime(specialties_data)),
-            json.dumps(convert_datetime(delivery_data)),
+MIGRATIONS = [
+    TableMigration(
+        "users", "users",
+        ["id", "username", "email", "password_hash", "role", "is_active", "created_at", "last_login"],
+        ["email", "password_hash", "role", "is_active"],
+        lambda user: (
+            user.get('id'), user.get('username'), user.get('email'),
+            user.get('password_hash'), user.get('role', 'viewer'),
+            user.get('is_active', True), user.get('created_at'),
+            user.get('last_login')
+        )),
+    TableMigration(
+        "reviews", "reviews",
+        ["id", "customer_name", "rating", "comment", "date", "is_approved", "approved_by", "approved_at"],
+        ["customer_name", "rating", "comment", "is_approved"],
+        lambda review: (
+            review.get('id'), review.get('customer_name'), review.get('rating'),
+            review.get('comment'), review.get('date'), review.get('is_approved', False),
+            review.get('approved_by'), review.get('approved_at')
+        )),
+    TableMigration(
+        "menu_items", "menu_items",
+        ["id", "name", "description", "price", "category", "image", "details",
+         "vegan", "vegetarian", "glutenfree", "order_index", "is_active", "created_at", "updated_at"],
+        ["name", "description", "price", "category", "image", "details", "vegan", "vegetarian",
+         "glutenfree", "order_index", "is_active", "updated_at"],
+        lambda item: (
+            item.get('id'), item.get('name'), item.get('description'),
+            item.get('price'), item.get('category'), item.get('image'),
+            item.get('details'), item.get('vegan', False),
+            item.get('vegetarian', False), item.get('glutenfree', False),
+            item.get('order_index', 0), item.get('is_active', True),
+            item.get('created_at'), item.get('updated_at')
+        )),
+    TableMigration(
+        "contact_messages", "contact_messages",
+        ["id", "name", "email", "phone", "subject", "message", "date", "is_read", "responded"],
+        ["name", "email", "phone", "subject", "message", "is_read", "responded"],
+        lambda message: (
+            message.get('id'), message.get('name'), message.get('email'),
+            message.get('phone'), message.get('subject'), message.get('message'),
+            message.get('date'), message.get('is_read', False),
+            message.get('responded', False)
+        )),
+    TableMigration(
+        "homepage_content", "homepage_content",
+        ["id", "hero_title", "hero_subtitle", "hero_description", "hero_location",
+         "hero_background_image", "hero_menu_button_text", "hero_locations_button_text",
+         "features_data", "specialties_data", "delivery_data", "updated_at", "updated_by"],
+        ["hero_title", "hero_subtitle", "hero_description", "hero_location",
+         "features_data", "specialties_data", "delivery_data", "updated_at"],
+        lambda content: (
+            content.get('id'), content.get('hero', {}).get('title', 'JIMMY\'S TAPAS BAR'),
+            content.get('hero', {}).get('subtitle', 'an der Ostsee'),
+            content.get('hero', {}).get('description', 'Genießen Sie authentische mediterrane Spezialitäten'),
+            content.get('hero', {}).get('location', 'direkt an der malerischen Ostseeküste'),
+            content.get('hero', {}).get('background_image'),
+            content.get('hero', {}).get('menu_button_text', 'Zur Speisekarte'),
+            content.get('hero', {}).get('locations_button_text', 'Unsere Standorte'),
+            to_json(content.get('features', {})),
+            to_json(content.get('specialties', {})),
+            to_json(content.get('delivery', {})),
             content.get('updated_at'), content.get('updated_by')
-        ))
-        
-        print("   ✅ Migrated homepage content")
-    except Exception as e:
-        print(f"   ❌ Error migrating homepage content: {e}")
-    finally:
-        mysql_conn.close()
-
-async def migrate_locations():
-    """Migrate locations content from MongoDB to MySQL"""
-    print("🔄 Migrating locations...")
-    
-    content = await mongo_db.locations.find_one()
-    
-    if not content:
-        print("   ✅ No locations found in MongoDB")
-        return
-    
-    mysql_conn = await get_mysql_connection()
-    try:
-        cursor = await mysql_conn.cursor()
-        
-        if '_id' in content:
-            del content['_id']
-        
-        await cursor.execute("""
-            INSERT INTO locations (id, page_title, page_description, locations_data, updated_at, updated_by)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-            page_title = VALUES(page_title), page_description = VALUES(page_description),
-            locations_data = VALUES(locations_data), updated_at = VALUES(updated_at)
-        """, (
+        ),
+        label="homepage content", limit=1, sort=[("_id", 1)]),
+    TableMigration(
+        "locations", "locations",
+        ["id", "page_title", "page_description", "locations_data", "updated_at", "updated_by"],
+        ["page_title", "page_description", "locations_data", "updated_at"],
+        lambda content: (
             content.get('id'), content.get('page_title', 'Unsere Standorte'),
             content.get('page_description', 'Besuchen Sie uns an einem unserer beiden Standorte'),
-            json.dumps(convert_datetime(content.get('locations', []))),
+            to_json(content.get('locations', [])),
             content.get('updated_at'), content.get('updated_by')
-        ))
-        
-        print("   ✅ Migrated locations content")
-    except Exception as e:
-        print(f"   ❌ Error migrating locations: {e}")
-    finally:
-        mysql_conn.close()
-
-async def migrate_about_content():
-    """Migrate about content from MongoDB to MySQL"""
-    print("🔄 Migrating about content...")
-    
-    content = await mongo_db.about_content.find_one()
-    
-    if not content:
-        print("   ✅ No about content found in MongoDB")
-        return
-    
-    mysql_conn = await get_mysql_connection()
-    try:
-        cursor = await mysql_conn.cursor()
-        
-        if '_id' in content:
-            del content['_id']
-        
-        await cursor.execute("""
-            INSERT INTO about_content (id, page_title, hero_title, hero_description, story_title,
-                                     story_content, story_image, team_title, team_members,
-                                     values_title, values_data, updated_at, updated_by)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-            page_title = VALUES(page_title), hero_title = VALUES(hero_title),
-            hero_description = VALUES(hero_description), story_title = VALUES(story_title),
-            story_content = VALUES(story_content), story_image = VALUES(story_image),
-            team_title = VALUES(team_title), team_members = VALUES(team_members),
-            values_title = VALUES(values_title), values_data = VALUES(values_data),
-            updated_at = VALUES(updated_at)
-        """, (
+        ),
+        limit=1, sort=[("_id", 1)]),
+    TableMigration(
+        "about_content", "about_content",
+        ["id", "page_title", "hero_title", "hero_description", "story_title", "story_content",
+         "story_image", "team_title", "team_members", "values_title", "values_data",
+         "updated_at", "updated_by"],
+        ["page_title", "hero_title", "hero_description", "story_title", "story_content",
+         "story_image", "team_title", "team_members", "values_title", "values_data", "updated_at"],
+        lambda content: (
             content.get('id'), content.get('page_title', 'Über uns'),
             content.get('hero_title', 'Unsere Geschichte'),
             content.get('hero_description', 'Entdecken Sie die Leidenschaft hinter Jimmy\'s Tapas Bar'),
             content.get('story_title', 'Unsere Leidenschaft'),
             content.get('story_content', ''), content.get('story_image'),
             content.get('team_title', 'Unser Team'),
-            json.dumps(convert_datetime(content.get('team_members', []))),
+            to_json(content.get('team_members', [])),
             content.get('values_title', 'Unsere Werte'),
-            json.dumps(convert_datetime(content.get('values', []))),
+            to_json(content.get('values', [])),
             content.get('updated_at'), content.get('updated_by')
-        ))
-        
-        print("   ✅ Migrated about content")
-    except Exception as e:
-        print(f"   ❌ Error migrating about content: {e}")
-    finally:
-        mysql_conn.close()
+        ),
+        label="about content", limit=1, sort=[("_id", 1)]),
+    TableMigration(
+        "legal_pages", "legal_pages",
+        ["id", "page_type", "title", "content", "contact_name", "contact_address",
+         "contact_phone", "contact_email", "company_info", "updated_at", "updated_by"],
+        ["title", "content", "contact_name", "contact_address", "contact_phone",
+         "contact_email", "company_info", "updated_at"],
+        lambda page: (
+            page.get('id'), page.get('page_type'), page.get('title'),
+            page.get('content'), page.get('contact_name'),
+            page.get('contact_address'), page.get('contact_phone'),
+            page.get('contact_email'),
+            to_json(page.get('company_info', {})),
+            page.get('updated_at'), page.get('updated_by')
+        )),
+    TableMigration(
+        "website_texts", "website_texts",
+        ["id", "section", "navigation_data", "footer_data", "buttons_data", "general_data",
+         "updated_at", "updated_by"],
+        ["navigation_data", "footer_data", "buttons_data", "general_data", "updated_at"],
+        lambda text: (
+            text.get('id'), text.get('section'),
+            to_json(text.get('navigation', {})),
+            to_json(text.get('footer', {})),
+            to_json(text.get('buttons', {})),
+            to_json(text.get('general', {})),
+            text.get('updated_at'), text.get('updated_by')
+        ),
+        label="website text sections"),
+    # Only the most recent status checks are worth keeping
+    TableMigration(
+        "status_checks", "status_checks",
+        ["id", "client_name", "timestamp"],
+        ["client_name", "timestamp"],
+        lambda check: (check.get('id'), check.get('client_name'), check.get('timestamp')),
+        sort=[("timestamp", -1)], limit=100),
+    TableMigration(
+        "maintenance_mode", "maintenance_mode",
+        ["id", "is_active", "message", "activated_by", "activated_at"],
+        ["is_active", "message", "activated_by", "activated_at"],
+        lambda maintenance: (
+            maintenance.get('id', '1'), maintenance.get('is_active', False),
+            maintenance.get('message', 'Die Website befindet sich derzeit im Wartungsmodus.'),
+            maintenance.get('activated_by'), maintenance.get('activated_at')
+        ),
+        label="maintenance mode", limit=1, sort=[("_id", 1)]),
+]
 
-async def migrate_legal_pages():
-    """Migrate legal pages from MongoDB to MySQL"""
-    print("🔄 Migrating legal pages...")
-    
-    pages = await mongo_db.legal_pages.find({}).to_list(length=None)
-    
-    if not pages:
-        print("   ✅ No legal pages found in MongoDB")
-        return
-    
-    mysql_conn = await get_mysql_connection()
-    try:
-        cursor = await mysql_conn.cursor()
-        
-        migrated_count = 0
-        for page in pages:
-            try:
-                if '_id' in page:
-                    del page['_id']
-                
-                await cursor.execute("""
-                    INSERT INTO legal_pages (id, page_type, title, content, contact_name,
-                                           contact_address, contact_phone, contact_email,
-                                           company_info, updated_at, updated_by)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    title = VALUES(title), content = VALUES(content),
-                    contact_name = VALUES(contact_name), contact_address = VALUES(contact_address),
-                    contact_phone = VALUES(contact_phone), contact_email = VALUES(contact_email),
-                    company_info = VALUES(company_info), updated_at = VALUES(updated_at)
-                """, (
-                    page.get('id'), page.get('page_type'), page.get('title'),
-                    page.get('content'), page.get('contact_name'),
-                    page.get('contact_address'), page.get('contact_phone'),
-                    page.get('contact_email'),
-                    json.dumps(convert_datetime(page.get('company_info', {}))),
-                    page.get('updated_at'), page.get('updated_by')
-                ))
-                migrated_count += 1
-            except Exception as e:
-                print(f"   ❌ Error migrating legal page {page.get('page_type', 'unknown')}: {e}")
-        
-        print(f"   ✅ Migrated {migrated_count} legal pages")
-    finally:
-        mysql_conn.close()
+async def ensure_checkpoint_table(pool):
+    async with pool.acquire() as conn:
+        cursor = await conn.cursor()
+        await cursor.execute("""
+            CREATE TABLE IF NOT EXISTS migration_checkpoints (
+                collection_name VARCHAR(100) PRIMARY KEY,
+                last_id VARCHAR(64) NULL,
+                rows_migrated BIGINT NOT NULL DEFAULT 0,
+                completed BOOLEAN NOT NULL DEFAULT FALSE,
+                updated_at DATETIME NOT NULL
+            )
+        """)
 
-async def migrate_website_texts():
-    """Migrate website texts from MongoDB to MySQL"""
-    print("🔄 Migrating website texts...")
-    
-    texts = await mongo_db.website_texts.find({}).to_list(length=None)
-    
-    if not texts:
-        print("   ✅ No website texts found in MongoDB")
-        return
-    
-    mysql_conn = await get_mysql_connection()
-    try:
-        cursor = await mysql_conn.cursor()
-        
-        migrated_count = 0
-        for text in texts:
-            try:
-                if '_id' in text:
-                    del text['_id']
-                
-                await cursor.execute("""
-                    INSERT INTO website_texts (id, section, navigation_data, footer_data,
-                                             buttons_data, general_data, updated_at, updated_by)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    navigation_data = VALUES(navigation_data), footer_data = VALUES(footer_data),
-                    buttons_data = VALUES(buttons_data), general_data = VALUES(general_data),
-                    updated_at = VALUES(updated_at)
-                """, (
-                    text.get('id'), text.get('section'),
-                    json.dumps(convert_datetime(text.get('navigation', {}))),
-                    json.dumps(convert_datetime(text.get('footer', {}))),
-                    json.dumps(convert_datetime(text.get('buttons', {}))),
-                    json.dumps(convert_datetime(text.get('general', {}))),
-                    text.get('updated_at'), text.get('updated_by')
-                ))
-                migrated_count += 1
-            except Exception as e:
-                print(f"   ❌ Error migrating website text {text.get('section', 'unknown')}: {e}")
-        
-        print(f"   ✅ Migrated {migrated_count} website text sections")
-    finally:
-        mysql_conn.close()
+async def load_checkpoint(pool, migration):
+    async with pool.acquire() as conn:
+        cursor = await conn.cursor(aiomysql.DictCursor)
+        await cursor.execute("SELECT * FROM migration_checkpoints WHERE collection_name = %s",
+                             (migration.collection,))
+        return await cursor.fetchone()
 
-async def migrate_status_checks():
-    """Migrate status checks from MongoDB to MySQL"""
-    print("🔄 Migrating status checks...")
-    
-    status_checks = await mongo_db.status_checks.find({}).sort("timestamp", -1).limit(100).to_list(length=None)
-    
-    if not status_checks:
-        print("   ✅ No status checks found in MongoDB")
-        return
-    
-    mysql_conn = await get_mysql_connection()
-    try:
-        cursor = await mysql_conn.cursor()
-        
-        migrated_count = 0
-        for check in status_checks:
-            try:
-                if '_id' in check:
-                    del check['_id']
-                
-                await cursor.execute("""
-                    INSERT INTO status_checks (id, client_name, timestamp)
-                    VALUES (%s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    client_name = VALUES(client_name), timestamp = VALUES(timestamp)
-                """, (
-                    check.get('id'), check.get('client_name'), check.get('timestamp')
-                ))
-                migrated_count += 1
-            except Exception as e:
-                print(f"   ❌ Error migrating status check {check.get('id', 'unknown')}: {e}")
-        
-        print(f"   ✅ Migrated {migrated_count} status checks")
-    finally:
-        mysql_conn.close()
+def decode_checkpoint_id(value):
+    if value is None:
+        return None
+    return ObjectId(value) if ObjectId.is_valid(value) else value
 
-async def migrate_maintenance_mode():
-    """Migrate maintenance mode from MongoDB to MySQL"""
-    print("🔄 Migrating maintenance mode...")
-    
-    maintenance = await mongo_db.maintenance_mode.find_one()
-    
-    if not maintenance:
-        print("   ✅ No maintenance mode found in MongoDB")
-        return
-    
-    mysql_conn = await get_mysql_connection()
-    try:
-        cursor = await mysql_conn.cursor()
-        
-        if '_id' in maintenance:
-            del maintenance['_id']
-        
-        await cursor.execute("""
-            INSERT INTO maintenance_mode (id, is_active, message, activated_by, activated_at)
-            VALUES (%s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-            is_active = VALUES(is_active), message = VALUES(message),
-            activated_by = VALUES(activated_by), activated_at = VALUES(activated_at)
-        """, (
-            maintenance.get('id', '1'), maintenance.get('is_active', False),
-            maintenance.get('message', 'Die Website befindet sich derzeit im Wartungsmodus.'),
-            maintenance.get('activated_by'), maintenance.get('activated_at')
-        ))
-        
-        print("   ✅ Migrated maintenance mode")
-    except Exception as e:
-        print(f"   ❌ Error migrating maintenance mode: {e}")
-    finally:
-        mysql_conn.close()
+async def save_checkpoint(cursor, migration, last_id, rows_migrated, completed=False):
+    await cursor.execute("""
+        INSERT INTO migration_checkpoints (collection_name, last_id, rows_migrated, completed, updated_at)
+        VALUES (%s, %s, %s, %s, UTC_TIMESTAMP())
+        ON DUPLICATE KEY UPDATE last_id = VALUES(last_id), rows_migrated = VALUES(rows_migrated),
+        completed = VALUES(completed), updated_at = VALUES(updated_at)
+    """, (migration.collection, str(last_id) if last_id is not None else None, rows_migrated, completed))
+
+async def write_batch(pool, migration, docs, stats, checkpoint_rows):
+    """Upsert one batch and advance the checkpoint in a single transaction."""
+    rows = [migration.to_row(doc) for doc in docs]
+    async with pool.acquire() as conn:
+        cursor = await conn.cursor()
+        await conn.begin()
+        try:
+            await cursor.executemany(migration.sql, rows)
+        except Exception:
+            # Find the offending rows: retry one by one, skipping failures
+            await conn.rollback()
+            await conn.begin()
+            migrated = []
+            for doc, row in zip(docs, rows):
+                try:
+                    await cursor.execute(migration.sql, row)
+                    migrated.append(row)
+                except Exception as e:
+                    stats['failed'] += 1
+                    print(f"   ❌ Error migrating {migration.table} row {doc.get('id', doc.get('_id'))}: {e}")
+            rows = migrated
+        stats['rows'] += len(rows)
+        if migration.resumable:
+            await save_checkpoint(cursor, migration, docs[-1]['_id'], checkpoint_rows + stats['rows'])
+        await conn.commit()
+
+async def migrate_collection(pool, migration, restart, semaphore):
+    stats = {'table': migration.table, 'rows': 0, 'failed': 0, 'seconds': 0.0, 'resumed_from': 0}
+    async with semaphore:
+        started = time.perf_counter()
+        checkpoint = None if restart else await load_checkpoint(pool, migration)
+        if checkpoint and checkpoint['completed']:
+            print(f"⏭️  {migration.label}: already migrated ({checkpoint['rows_migrated']} rows)")
+            stats['skipped'] = True
+            return stats
+        after_id = None
+        checkpoint_rows = 0
+        if checkpoint and migration.resumable:
+            after_id = decode_checkpoint_id(checkpoint['last_id'])
+            checkpoint_rows = checkpoint['rows_migrated']
+            stats['resumed_from'] = checkpoint_rows
+            print(f"🔄 Resuming {migration.label} after {checkpoint_rows} rows...")
+        else:
+            print(f"🔄 Migrating {migration.label}...")
+
+        batch = []
+        async for doc in migration.cursor(after_id):
+            batch.append(doc)
+            if len(batch) >= MIGRATION_BATCH_SIZE:
+                await write_batch(pool, migration, batch, stats, checkpoint_rows)
+                batch = []
+        if batch:
+            await write_batch(pool, migration, batch, stats, checkpoint_rows)
+
+        async with pool.acquire() as conn:
+            cursor = await conn.cursor()
+            await save_checkpoint(cursor, migration, None, checkpoint_rows + stats['rows'], completed=True)
+        stats['seconds'] = time.perf_counter() - started
+        if stats['rows'] or stats['failed'] or checkpoint_rows:
+            print(f"   ✅ Migrated {stats['rows']} {migration.label}")
+        else:
+            print(f"   ✅ No {migration.label} found in MongoDB")
+        return stats
+
+def print_report(results):
+    print(f"{'Table':<22}{'Rows':>9}{'Failed':>8}{'Seconds':>10}{'Rows/s':>11}")
+    total_rows = 0
+    for stats in results:
+        if stats.get('skipped'):
+            print(f"{stats['table']:<22}{'(checkpoint: already migrated)':>38}")
+            continue
+        rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+        total_rows += stats['rows']
+        print(f"{stats['table']:<22}{stats['rows']:>9}{stats['failed']:>8}"
+              f"{stats['seconds']:>10.2f}{rate:>11.0f}")
+    return total_rows
 
 async def main():
     """Main migration function"""
+    restart = "--restart" in sys.argv[1:]
     print("🚀 Starting MongoDB to MySQL migration for Jimmy's Tapas Bar CMS")
     print("=" * 60)
-    
+
+    pool = None
     try:
         # Test MySQL connection
         mysql_conn = await get_mysql_connection()
         mysql_conn.close()
         print("✅ MySQL connection test successful")
-        
+
         # Test MongoDB connection
         await mongo_db.list_collection_names()
         print("✅ MongoDB connection test successful")
+        print(f"   batch size {MIGRATION_BATCH_SIZE}, {MIGRATION_CONCURRENCY} collections at a time"
+              + (", ignoring checkpoints" if restart else ""))
         print()
-        
+
+        pool = await aiomysql.create_pool(minsize=1, maxsize=MIGRATION_CONCURRENCY, **mysql_config)
+        await ensure_checkpoint_table(pool)
+
         # Run migrations
-        await migrate_users()
-        await migrate_reviews()
-        await migrate_menu_items()
-        await migrate_contact_messages()
-        await migrate_homepage_content()
-        await migrate_locations()
-        await migrate_about_content()
-        await migrate_legal_pages()
-        await migrate_website_texts()
-        await migrate_status_checks()
-        await migrate_maintenance_mode()
-        
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(MIGRATION_CONCURRENCY)
+        results = await asyncio.gather(
+            *[migrate_collection(pool, migration, restart, semaphore) for migration in MIGRATIONS],
+            return_exceptions=True
+        )
+        elapsed = time.perf_counter() - started
+
+        failures = [(migration, result) for migration, result in zip(MIGRATIONS, results)
+                    if isinstance(result, BaseException)]
         print()
         print("=" * 60)
+        total_rows = print_report([result for result in results if not isinstance(result, BaseException)])
+        print(f"{total_rows} rows in {elapsed:.2f}s ({total_rows / elapsed if elapsed else 0:.0f} rows/s overall)")
+        print()
+        if failures:
+            for migration, error in failures:
+                print(f"❌ {migration.label} failed: {error}")
+            print("ℹ️  Run the script again to resume from the last checkpoint")
+            raise RuntimeError(f"{len(failures)} collection(s) failed")
+
         print("🎉 Migration completed successfully!")
         print()
         print("📋 Next steps:")
@@ -551,13 +398,16 @@ async def main():
         print("3. Update frontend to use new backend")
         print("4. Create backup of the migrated data")
         print("5. Consider decommissioning MongoDB after verification")
-        
+
     except Exception as e:
         print(f"❌ Migration failed: {e}")
         raise
     finally:
+        if pool is not None:
+            pool.close()
+            await pool.wait_closed()
         # Close MongoDB connection
         mongo_client.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
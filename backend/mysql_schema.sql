@@ -10,7 +10,8 @@ CREATE TABLE users (
     role ENUM('admin', 'editor', 'viewer') DEFAULT 'viewer',
     is_active BOOLEAN DEFAULT TRUE,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-    last_login DATETIME NULL
+    last_login DATETIME NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 -- Reviews table
@@ -22,7 +23,8 @@ CREATE TABLE reviews (
     date DATETIME DEFAULT CURRENT_TIMESTAMP,
     is_approved BOOLEAN DEFAULT FALSE,
     approved_by VARCHAR(50) NULL,
-    approved_at DATETIME NULL
+    approved_at DATETIME NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 -- Menu items table
@@ -53,7 +55,8 @@ CREATE TABLE contact_messages (
     message TEXT NOT NULL,
     date DATETIME DEFAULT CURRENT_TIMESTAMP,
     is_read BOOLEAN DEFAULT FALSE,
-    responded BOOLEAN DEFAULT FALSE
+    responded BOOLEAN DEFAULT FALSE,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 -- Status checks table (for API monitoring)
@@ -72,6 +75,7 @@ CREATE TABLE content_sections (
     images JSON NULL,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     updated_by VARCHAR(50) NOT NULL,
+    version INT NOT NULL DEFAULT 1,
     UNIQUE KEY unique_page_section (page, section)
 );
 
@@ -155,7 +159,8 @@ CREATE TABLE newsletter_subscribers (
     subscribe_date DATETIME DEFAULT CURRENT_TIMESTAMP,
     unsubscribe_date DATETIME NULL,
     ip_address VARCHAR(45) NULL,
-    user_agent TEXT NULL
+    user_agent TEXT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
 -- Newsletter templates table
@@ -224,6 +229,34 @@ CREATE TABLE system_backups (
     INDEX idx_type (type)
 );
 
+-- Review aggregates (approved reviews per star rating)
+CREATE TABLE review_stats (
+    rating INT PRIMARY KEY,
+    review_count INT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL
+);
+
+-- Cache version counters (cross-worker invalidation of in-process caches)
+CREATE TABLE cache_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- Backup job state (shared between uvicorn workers)
+CREATE TABLE backup_jobs (
+    id VARCHAR(36) PRIMARY KEY,
+    filename VARCHAR(255) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    dump_bytes BIGINT NOT NULL DEFAULT 0,
+    written_bytes BIGINT NOT NULL DEFAULT 0,
+    estimated_bytes BIGINT NOT NULL DEFAULT 0,
+    started_at DATETIME NOT NULL,
+    finished_at DATETIME NULL,
+    error TEXT NULL,
+    updated_at DATETIME NOT NULL,
+    INDEX idx_backup_jobs_filename (filename, status)
+);
+
 -- Create indexes for better performance
 CREATE INDEX idx_users_username ON users(username);
 CREATE INDEX idx_reviews_approved ON reviews(is_approved, date DESC);
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Jimmy's Tapas Bar CMS - Newsletter Rendering
+Compiles a newsletter (subject + HTML content) once per campaign into a
+renderer that produces ready-to-send RFC 5322 bytes for each recipient.
+
+Templates may use placeholders, optionally with a fallback:
+  {{name}}  {{name|liebe Gäste}}  {{email}}  {{unsubscribe_url}}
+
+Everything that is the same for all recipients is built and encoded up front:
+the static headers, the MIME structure and the text/plain and text/html
+bodies, split at the placeholders and quoted-printable encoded piece by
+piece. Encoded pieces are joined with soft line breaks ("=\\r\\n"), which
+decode to nothing, so the hot loop only encodes the short per-recipient
+values (cached, most names repeat) and joins bytes.
+"""
+
+import hashlib
+import hmac
+import html
+import os
+import re
+import time
+from collections import OrderedDict
+from email import quoprimime
+from email.header import Header
+from email.utils import formataddr, formatdate
+from functools import lru_cache
+
+NEWSLETTER_PUBLIC_URL = os.environ.get('NEWSLETTER_PUBLIC_URL', '').rstrip('/')
+NEWSLETTER_TOKEN_SECRET = os.environ.get('NEWSLETTER_TOKEN_SECRET') or os.environ.get('JWT_SECRET_KEY', 'your-secret-key-here')
+PLACEHOLDER_FIELDS = ("name", "email", "unsubscribe_url")
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(\w+)\s*(?:\|([^}]*))?\}\}")
+# Anything that could end a header line or smuggle in a new one
+CONTROL_CHARACTERS = re.compile(r"[\x00-\x1f\x7f\x85\u2028\u2029]")
+EMAIL_PATTERN = re.compile(r"[\w.!#$%&'*+/=?^`{|}~-]+@[\w-]+(\.[\w-]+)+")
+# Compiled renderers kept per process, keyed by everything that goes into them
+COMPILED_CACHE_SIZE = 32
+# 75 leaves room for the "=" of the soft break appended after each piece
+QP_LINE_LENGTH = 75
+SOFT_BREAK = b"=\r\n"
+
+class NewsletterTemplateError(ValueError):
+    pass
+
+class NewsletterRecipientError(ValueError):
+    """A subscriber whose name or address cannot go into a header; the recipient is skipped."""
+
+def is_valid_email(email) -> bool:
+    return isinstance(email, str) and len(email) <= 254 and EMAIL_PATTERN.fullmatch(email) is not None
+
+def clean_subscriber_name(name) -> str:
+    """Subscriber name as stored: control characters (CR/LF, ...) replaced, whitespace collapsed."""
+    return " ".join(CONTROL_CHARACTERS.sub(" ", str(name or "")).split())[:100]
+
+def html_to_text(content: str) -> str:
+    text = re.sub(r"(?i)<br\s*/?>|</p>|</h[1-6]>|</li>", "\n", content)
+    text = re.sub(r"<[^>]+>", "", text)
+    return html.unescape(re.sub(r"\n{3,}", "\n\n", text).strip())
+
+def qp_encode(text: str) -> bytes:
+    # quoprimime works on code points; feed it the UTF-8 bytes one per character
+    return quoprimime.body_encode(text.encode("utf-8").decode("latin-1"),
+                                  maxlinelen=QP_LINE_LENGTH, eol="\r\n").encode("ascii")
+
+@lru_cache(maxsize=4096)
+def qp_encode_value(value: str, escape_html: bool) -> bytes:
+    return qp_encode(html.escape(value) if escape_html else value)
+
+@lru_cache(maxsize=4096)
+def encode_header_value(value: str) -> str:
+    return value if value.isascii() else Header(value, "utf-8").encode()
+
+def split_placeholders(text: str) -> list:
+    """["static", (field, fallback), "static", ...] - always starts and ends with a string."""
+    pieces, position = [], 0
+    for match in PLACEHOLDER_PATTERN.finditer(text):
+        field = match.group(1).lower()
+        if field not in PLACEHOLDER_FIELDS:
+            raise NewsletterTemplateError(
+                f"Unbekannter Platzhalter {{{{{match.group(1)}}}}} - erlaubt: {', '.join(PLACEHOLDER_FIELDS)}")
+        pieces.append(text[position:match.start()])
+        pieces.append((field, (match.group(2) or "").strip()))
+        position = match.end()
+    pieces.append(text[position:])
+    return pieces
+
+def compile_template(subject: str, content: str):
+    """Validate the placeholders of a template; raises NewsletterTemplateError."""
+    if CONTROL_CHARACTERS.search(subject):
+        raise NewsletterTemplateError("Der Betreff darf keine Zeilenumbrüche oder Steuerzeichen enthalten")
+    split_placeholders(subject)
+    split_placeholders(content)
+
+def unsubscribe_token(subscriber_id: str) -> str:
+    signature = hmac.new(NEWSLETTER_TOKEN_SECRET.encode("utf-8"), subscriber_id.encode("utf-8"), hashlib.sha256)
+    return f"{subscriber_id}.{signature.hexdigest()[:32]}"
+
+def verify_unsubscribe_token(token: str):
+    """The subscriber id of a valid token, None otherwise."""
+    subscriber_id, _, _ = token.rpartition(".")
+    if subscriber_id and hmac.compare_digest(unsubscribe_token(subscriber_id), token):
+        return subscriber_id
+    return None
+
+class CompiledBody:
+    """One text part, pre-encoded around its placeholders."""
+
+    def __init__(self, text: str, escape_html: bool):
+        pieces = split_placeholders(text)
+        self.static = [qp_encode(piece) for piece in pieces[0::2]]
+        self.slots = pieces[1::2]
+        self.escape_html = escape_html
+
+    def render(self, values: dict) -> bytes:
+        if not self.slots:
+            return self.static[0]
+        parts = [self.static[0]]
+        for (field, fallback), static in zip(self.slots, self.static[1:]):
+            parts.append(qp_encode_value(values[field] or fallback, self.escape_html))
+            parts.append(static)
+        return SOFT_BREAK.join(parts)
+
+class CompiledNewsletter:
+    def __init__(self, config: dict, campaign: dict):
+        self.from_email = config["from_email"]
+        self.domain = self.from_email.rpartition("@")[2] or "localhost"
+        self.campaign_id = campaign["id"]
+        compile_template(campaign["subject"], campaign["content"])
+        self.subject = split_placeholders(campaign["subject"])
+        self.static_subject = encode_header_value(campaign["subject"]) if len(self.subject) == 1 else None
+        self.boundary = f"=_jimmys_{hashlib.sha256(campaign['content'].encode('utf-8')).hexdigest()[:24]}"
+
+        from_name = config.get("from_name") or "Jimmy's Tapas Bar"
+        headers = [
+            f"From: {formataddr((from_name, self.from_email), 'utf-8')}",
+            "MIME-Version: 1.0",
+            f'Content-Type: multipart/alternative;\r\n boundary="{self.boundary}"',
+        ]
+        self.static_headers = ("\r\n".join(headers) + "\r\n").encode("ascii")
+        part_headers = "Content-Type: text/{}; charset=\"utf-8\"\r\nContent-Transfer-Encoding: quoted-printable\r\n\r\n"
+        self.text_head = f"\r\n--{self.boundary}\r\n{part_headers.format('plain')}".encode("ascii")
+        self.html_head = f"\r\n--{self.boundary}\r\n{part_headers.format('html')}".encode("ascii")
+        self.tail = f"\r\n--{self.boundary}--\r\n".encode("ascii")
+        self.text = CompiledBody(html_to_text(campaign["content"]), escape_html=False)
+        self.html = CompiledBody(campaign["content"], escape_html=True)
+        self.date_second = None
+        self.date_header = None
+
+    def date(self) -> str:
+        # Renderers outlive a single run (resume), so the Date is taken at send time
+        now = int(time.time())
+        if now != self.date_second:
+            self.date_second = now
+            self.date_header = formatdate(now, localtime=True)
+        return self.date_header
+
+    def unsubscribe_url(self, subscriber: dict) -> str:
+        if NEWSLETTER_PUBLIC_URL:
+            return f"{NEWSLETTER_PUBLIC_URL}/api/newsletter/unsubscribe/{unsubscribe_token(subscriber['id'])}"
+        return f"mailto:{self.from_email}?subject=unsubscribe"
+
+    def render(self, subscriber: dict) -> bytes:
+        """RFC 5322 bytes for one subscriber; raises NewsletterRecipientError for unsafe name/address."""
+        email = subscriber["email"]
+        name = (subscriber.get("name") or "").strip()
+        # Both end up in headers verbatim (To:, Subject: via {{name}}), so a CR/LF would add headers
+        if not is_valid_email(email):
+            raise NewsletterRecipientError(f"Ungültige E-Mail-Adresse: {email!r}")
+        if CONTROL_CHARACTERS.search(name):
+            raise NewsletterRecipientError(f"Name enthält Steuerzeichen: {name!r}")
+        url = self.unsubscribe_url(subscriber)
+        values = {"name": name, "email": email, "unsubscribe_url": url}
+        if self.static_subject is not None:
+            subject = self.static_subject
+        else:
+            subject = "".join(
+                piece if isinstance(piece, str) else values[piece[0]] or piece[1] for piece in self.subject)
+            if CONTROL_CHARACTERS.search(subject):
+                raise NewsletterRecipientError(f"Betreff enthält Steuerzeichen: {subject!r}")
+            subject = encode_header_value(subject)
+        list_unsubscribe = f"<{url}>" if url.startswith("mailto:") else \
+            f"<{url}>\r\nList-Unsubscribe-Post: List-Unsubscribe=One-Click"
+        headers = (
+            f"To: {formataddr((name, email), 'utf-8') if name else email}\r\n"
+            f"Subject: {subject}\r\n"
+            f"Date: {self.date()}\r\n"
+            # Stable per recipient, so a resumed send is recognisable as a duplicate
+            f"Message-ID: <{self.campaign_id}.{subscriber['id']}@{self.domain}>\r\n"
+            f"List-Unsubscribe: {list_unsubscribe}\r\n"
+        ).encode("utf-8")
+        return b"".join((headers, self.static_headers, self.text_head, self.text.render(values),
+                         self.html_head, self.html.render(values), self.tail))
+
+compiled_newsletters = OrderedDict()
+
+def compile_newsletter(config: dict, campaign: dict) -> CompiledNewsletter:
+    """Compiled renderer for a campaign, reused while subject, content and sender stay the same."""
+    key = (campaign["id"], campaign["subject"], campaign["content"], config["from_email"], config.get("from_name"))
+    compiled = compiled_newsletters.get(key)
+    if compiled is None:
+        compiled = CompiledNewsletter(config, campaign)
+        compiled_newsletters[key] = compiled
+        while len(compiled_newsletters) > COMPILED_CACHE_SIZE:
+            compiled_newsletters.popitem(last=False)
+    else:
+        compiled_newsletters.move_to_end(key)
+    return compiled
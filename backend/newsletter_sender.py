@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Jimmy's Tapas Bar CMS - Newsletter Send Engine
+Delivers a newsletter campaign to all active subscribers.
+
+Subscribers are streamed from MongoDB in batches (ordered by _id). Each batch
+is sent over a small pool of persistent SMTP connections, throttled per
+recipient domain so large providers do not start deferring us, and the
+outcome of every recipient is written back with one bulk write per batch
+into newsletter_deliveries. The campaign stores the last finished _id, so a
+run that crashed or was stopped resumes after it; recipients already marked
+as sent are never mailed twice. A stop is requested with stop_requested on
+the campaign and honoured between batches, once the batch in flight is on
+record; a run that reached nobody ends as failed.
+
+A campaign is claimed with a lease (lease_until) that a heartbeat task renews
+every NEWSLETTER_LEASE_RENEW_SECONDS for as long as the run is alive - also
+while a batch on a slow relay takes longer than the lease itself. A lease
+that ran out means the sending process died, and the campaign may be picked
+up again.
+
+smtplib is blocking, so every connection lives in a worker thread
+(asyncio.to_thread) while the event loop keeps serving requests. Messages
+are rendered to bytes by a renderer compiled once per campaign
+(newsletter_render.py).
+"""
+
+import asyncio
+import smtplib
+import time
+from datetime import datetime, timedelta
+import os
+
+from pymongo import UpdateOne
+
+from newsletter_render import compile_newsletter, NewsletterRecipientError
+
+NEWSLETTER_BATCH_SIZE = int(os.environ.get('NEWSLETTER_BATCH_SIZE', 500))
+NEWSLETTER_SMTP_CONNECTIONS = int(os.environ.get('NEWSLETTER_SMTP_CONNECTIONS', 4))
+# Most providers drop a connection after a few hundred messages; reconnect first
+NEWSLETTER_MESSAGES_PER_CONNECTION = int(os.environ.get('NEWSLETTER_MESSAGES_PER_CONNECTION', 100))
+# Messages per second to any single recipient domain (gmail.com, web.de, ...)
+NEWSLETTER_DOMAIN_RATE = float(os.environ.get('NEWSLETTER_DOMAIN_RATE', 10))
+NEWSLETTER_MAX_ATTEMPTS = 3
+NEWSLETTER_SMTP_TIMEOUT = 30
+NEWSLETTER_LEASE_SECONDS = 120
+NEWSLETTER_LEASE_RENEW_SECONDS = NEWSLETTER_LEASE_SECONDS / 4
+
+# Campaigns in these states may be (re)started by hand
+STARTABLE_STATUSES = ["draft", "scheduled", "failed", "stopped"]
+
+class SMTPConnection:
+    """One persistent SMTP session. All methods block; call them via asyncio.to_thread."""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.smtp = None
+        self.sent = 0
+
+    def open(self):
+        config = self.config
+        self.smtp = smtplib.SMTP(config["smtp_server"], int(config["smtp_port"]), timeout=NEWSLETTER_SMTP_TIMEOUT)
+        self.smtp.ehlo()
+        if config.get("use_tls", True):
+            self.smtp.starttls()
+            self.smtp.ehlo()
+        if config.get("username"):
+            self.smtp.login(config["username"], config.get("password", ""))
+        self.sent = 0
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self.smtp.close()
+            self.smtp = None
+
+    def send(self, recipient: str, message: bytes):
+        if self.smtp is None or self.sent >= NEWSLETTER_MESSAGES_PER_CONNECTION:
+            self.close()
+            self.open()
+        try:
+            self.smtp.sendmail(self.config["from_email"], [recipient], message)
+        except smtplib.SMTPRecipientsRefused:
+            # The session survives a refused recipient (smtplib sends RSET)
+            self.sent += 1
+            raise
+        except smtplib.SMTPServerDisconnected:
+            # Idle connections get dropped by the server; retry once on a fresh one
+            self.close()
+            self.open()
+            self.smtp.sendmail(self.config["from_email"], [recipient], message)
+        except (smtplib.SMTPException, OSError):
+            # Session state unknown, start over with the next message
+            self.close()
+            raise
+        self.sent += 1
+
+class SMTPPool:
+    """A fixed number of SMTP connections, opened lazily and handed out one sender at a time."""
+
+    def __init__(self, config: dict, size: int = NEWSLETTER_SMTP_CONNECTIONS):
+        self.size = size
+        self.idle = asyncio.Queue()
+        for _ in range(size):
+            self.idle.put_nowait(SMTPConnection(config))
+
+    async def send(self, recipient: str, message: bytes):
+        connection = await self.idle.get()
+        try:
+            await asyncio.to_thread(connection.send, recipient, message)
+        finally:
+            self.idle.put_nowait(connection)
+
+    async def close(self):
+        connections = []
+        while not self.idle.empty():
+            connections.append(self.idle.get_nowait())
+        await asyncio.gather(*(asyncio.to_thread(connection.close) for connection in connections))
+
+class DomainThrottle:
+    """Spaces out messages to the same recipient domain to at most rate per second."""
+
+    def __init__(self, rate: float = NEWSLETTER_DOMAIN_RATE):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = {}
+
+    async def wait(self, email: str):
+        if not self.interval:
+            return
+        domain = email.rpartition("@")[2].lower()
+        now = time.monotonic()
+        # Reserve the slot before sleeping so concurrent senders queue up behind it
+        slot = max(now, self.next_slot.get(domain, 0.0))
+        self.next_slot[domain] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class SendReport:
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add(self, results: list):
+        for _, status, _ in results:
+            if status == "sent":
+                self.sent += 1
+            else:
+                self.failed += 1
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def messages_per_second(self) -> float:
+        elapsed = self.elapsed or time.perf_counter() - self.started
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "elapsed_seconds": round(self.elapsed or time.perf_counter() - self.started, 2),
+            "messages_per_second": round(self.messages_per_second, 1),
+        }
+
+def is_permanent(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # 4xx on RCPT (greylisting, mailbox busy) is worth another attempt
+        return all(500 <= code < 600 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+async def deliver_one(pool: SMTPPool, throttle: DomainThrottle, key, email: str, message: bytes):
+    """Send one message with retries; returns (key, "sent" | "failed", error)."""
+    error = None
+    for attempt in range(1, NEWSLETTER_MAX_ATTEMPTS + 1):
+        # Throttle before taking a connection so a slow domain does not block the pool
+        await throttle.wait(email)
+        try:
+            await pool.send(email, message)
+            return key, "sent", None
+        except (smtplib.SMTPException, OSError) as e:
+            error = e
+            if is_permanent(e) or attempt == NEWSLETTER_MAX_ATTEMPTS:
+                break
+            await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+    return key, "failed", str(error)[:500]
+
+async def deliver(pool: SMTPPool, throttle: DomainThrottle, messages: list) -> list:
+    """Send [(key, email, message), ...] concurrently over the pool."""
+    return await asyncio.gather(*(deliver_one(pool, throttle, key, email, message)
+                                  for key, email, message in messages))
+
+# Campaign runner (MongoDB)
+async def ensure_delivery_indexes(db):
+    await db.newsletter_deliveries.create_index([("campaign_id", 1), ("subscriber_id", 1)], unique=True)
+    await db.newsletter_deliveries.create_index([("campaign_id", 1), ("status", 1)])
+
+async def claim_campaign(db, campaign_id: str, resume: bool = False):
+    """Atomically mark a campaign as sending; None if it is not startable or already running."""
+    now = datetime.utcnow()
+    startable = {"status": "sending", "lease_until": {"$lt": now}} if resume else \
+        {"$or": [{"status": {"$in": STARTABLE_STATUSES}}, {"status": "sending", "lease_until": {"$lt": now}}]}
+    return await db.newsletter_campaigns.find_one_and_update(
+        {"id": campaign_id, **startable},
+        {"$set": {"status": "sending", "lease_until": now + timedelta(seconds=NEWSLETTER_LEASE_SECONDS),
+                  "error": None, "stop_requested": False}},
+        return_document=True,
+    )
+
+async def keep_lease(db, campaign_id: str):
+    """Heartbeat: push lease_until forward until cancelled by the run that owns the campaign."""
+    while True:
+        await asyncio.sleep(NEWSLETTER_LEASE_RENEW_SECONDS)
+        try:
+            await db.newsletter_campaigns.update_one({"id": campaign_id, "status": "sending"}, {
+                "$set": {"lease_until": datetime.utcnow() + timedelta(seconds=NEWSLETTER_LEASE_SECONDS)}})
+        except Exception as e:
+            # Try again on the next beat; the lease still has three quarters left
+            print(f"⚠️ Lease für Kampagne {campaign_id} nicht verlängert: {e}")
+
+async def run_campaign(db, campaign_id: str, resume: bool = False) -> dict:
+    campaign = await claim_campaign(db, campaign_id, resume)
+    if campaign is None:
+        return None
+    config = await db.smtp_config.find_one()
+    if not config or not config.get("from_email"):
+        await db.newsletter_campaigns.update_one(
+            {"id": campaign_id}, {"$set": {"status": "failed", "error": "SMTP-Konfiguration fehlt"}})
+        return None
+
+    if not campaign.get("content") and campaign.get("template_id"):
+        template = await db.newsletter_templates.find_one({"id": campaign["template_id"]})
+        if template:
+            campaign = {**campaign, "subject": campaign.get("subject") or template["subject"],
+                        "content": template["content"]}
+
+    try:
+        renderer = compile_newsletter(config, campaign)
+    except ValueError as e:
+        await db.newsletter_campaigns.update_one(
+            {"id": campaign_id}, {"$set": {"status": "failed", "error": str(e), "lease_until": None}})
+        return None
+    await ensure_delivery_indexes(db)
+    pool = SMTPPool(config)
+    throttle = DomainThrottle()
+    report = SendReport()
+    query = {"subscribed": True}
+    resuming = campaign.get("resume_after") is not None
+    if resuming:
+        query["_id"] = {"$gt": campaign["resume_after"]}
+    print(f"📨 Kampagne {campaign['name']!r}: Versand {'fortgesetzt' if resuming else 'gestartet'}")
+
+    async def send_batch(batch: list) -> bool:
+        """Send and record one batch; True if a stop was requested meanwhile."""
+        ids = [subscriber["id"] for subscriber in batch]
+        done = set(await db.newsletter_deliveries.distinct(
+            "subscriber_id", {"campaign_id": campaign_id, "subscriber_id": {"$in": ids}, "status": "sent"}))
+        pending = [subscriber for subscriber in batch if subscriber["id"] not in done]
+        report.skipped += len(batch) - len(pending)
+        messages, rejected = [], []
+        for subscriber in pending:
+            try:
+                messages.append((subscriber["id"], subscriber["email"], renderer.render(subscriber)))
+            except NewsletterRecipientError as e:
+                rejected.append((subscriber["id"], "failed", str(e)[:500]))
+        results = rejected + await deliver(pool, throttle, messages)
+        report.add(results)
+        emails = {subscriber["id"]: subscriber["email"] for subscriber in pending}
+        now = datetime.utcnow()
+        if results:
+            await db.newsletter_deliveries.bulk_write([
+                UpdateOne({"campaign_id": campaign_id, "subscriber_id": subscriber_id},
+                          {"$set": {"email": emails[subscriber_id], "status": status, "error": error,
+                                    "updated_at": now},
+                           "$inc": {"attempts": 1}},
+                          upsert=True)
+                for subscriber_id, status, error in results], ordered=False)
+        # Checkpoint after the batch is on record, and renew the lease
+        checkpoint = await db.newsletter_campaigns.find_one_and_update({"id": campaign_id}, {
+            "$set": {"resume_after": batch[-1]["_id"], "status": "sending",
+                     "lease_until": now + timedelta(seconds=NEWSLETTER_LEASE_SECONDS),
+                     "stats": report.as_dict()},
+            "$inc": {"sent_count": sum(1 for _, status, _ in results if status == "sent"),
+                     "failed_count": sum(1 for _, status, _ in results if status != "sent")},
+        }, return_document=True)
+        return bool(checkpoint and checkpoint.get("stop_requested"))
+
+    heartbeat = asyncio.create_task(keep_lease(db, campaign_id))
+    try:
+        try:
+            cursor = db.newsletter_subscribers.find(query, {"_id": 1, "id": 1, "email": 1, "name": 1}) \
+                .sort("_id", 1).batch_size(NEWSLETTER_BATCH_SIZE)
+            batch = []
+            stopped = False
+            async for subscriber in cursor:
+                batch.append(subscriber)
+                if len(batch) >= NEWSLETTER_BATCH_SIZE:
+                    stopped = await send_batch(batch)
+                    batch = []
+                    # Only between batches: everything sent so far is checkpointed
+                    if stopped:
+                        break
+            if batch:
+                await send_batch(batch)
+        finally:
+            # Stopped before the final status write, so no late renewal can overwrite it
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+        report.finish()
+        # Including earlier runs of this campaign and recipients they already reached
+        delivered = campaign.get("sent_count", 0) + report.sent + report.skipped
+        if stopped:
+            outcome = {"status": "stopped"}
+        elif delivered == 0:
+            outcome = {"status": "failed", "error": "Keine Nachricht zugestellt"}
+        else:
+            outcome = {"status": "sent", "sent_date": datetime.utcnow()}
+        await db.newsletter_campaigns.update_one({"id": campaign_id}, {
+            "$set": {**outcome, "lease_until": None, "stop_requested": False, "stats": report.as_dict()}})
+    except asyncio.CancelledError:
+        # Shutdown: give the lease back so the next start resumes right away
+        report.finish()
+        await db.newsletter_campaigns.update_one({"id": campaign_id}, {
+            "$set": {"lease_until": datetime.utcnow(), "stats": report.as_dict()}})
+        raise
+    except Exception as e:
+        report.finish()
+        await db.newsletter_campaigns.update_one({"id": campaign_id}, {
+            "$set": {"status": "failed", "error": str(e)[:500], "lease_until": None,
+                     "stats": report.as_dict()}})
+        print(f"❌ Kampagne {campaign['name']!r} abgebrochen: {e}")
+        raise
+    finally:
+        await pool.close()
+
+    stats = report.as_dict()
+    print(f"✅ Kampagne {campaign['name']!r}: {stats['sent']} gesendet, {stats['failed']} fehlgeschlagen, "
+          f"{stats['skipped']} bereits zugestellt in {stats['elapsed_seconds']}s "
+          f"({stats['messages_per_second']} Nachrichten/s)")
+    return stats
+
+async def request_stop(db, campaign_id: str):
+    """Stop a sending campaign: "stopped" at once if its run is gone, "stopping" if the
+    run that owns it will stop after its current batch, None if it is not sending."""
+    now = datetime.utcnow()
+    if await db.newsletter_campaigns.find_one_and_update(
+            {"id": campaign_id, "status": "sending", "lease_until": {"$lt": now}},
+            {"$set": {"status": "stopped", "lease_until": None}}):
+        return "stopped"
+    if await db.newsletter_campaigns.find_one_and_update(
+            {"id": campaign_id, "status": "sending"}, {"$set": {"stop_requested": True}}):
+        return "stopping"
+    return None
+
+async def interrupted_campaign_ids(db) -> list:
+    """Campaigns left in "sending" by a process that died (lease ran out)."""
+    cursor = db.newsletter_campaigns.find(
+        {"status": "sending", "lease_until": {"$lt": datetime.utcnow()}}, {"id": 1})
+    return [campaign["id"] async for campaign in cursor]
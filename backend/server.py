@@ -1,45 +1,110 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, UploadFile, File
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-import pymysql
+from starlette.staticfiles import StaticFiles
+import aiomysql
+import asyncio
 import os
+import time
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+import base64
+import gzip
+import zlib
 import jwt
 from passlib.context import CryptContext
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import json
+from menu_import import (MenuImportError, MENU_IMPORT_FORMATS, load_menu_items, apply_menu_import,
+                         menu_import_changed)
+from menu_search import MenuSearchIndex
+from newsletter_render import is_valid_email
+from cache_versions import MENU_CACHE, MENU_CATEGORY_CACHE, bump_cache_version, partition_version_name
+from bulk_ops import BulkIds, BULK_CHUNK_SIZE, BULK_MAX_IDS, unique_ids, lock_rows, execute_for_ids, bulk_result
+from image_store import (ImageStoreError, UPLOAD_DIR, UPLOAD_URL_PREFIX, save_upload, image_pipeline,
+                         srcset_fields)
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# SIMPLE MYSQL CONNECTION FOR WEBSPACE COMPATIBILITY
-def get_mysql_connection():
+# MySQL connection pool shared by all routes
+mysql_pool = None
+
+MYSQL_SOCKET = os.environ.get('MYSQL_SOCKET', '/run/mysqld/mysqld.sock')
+MYSQL_POOL_MINSIZE = int(os.environ.get('MYSQL_POOL_MINSIZE', 2))
+MYSQL_POOL_MAXSIZE = int(os.environ.get('MYSQL_POOL_MAXSIZE', 10))
+# Free connections not used for this long (seconds since their last use, not
+# since they were opened) are closed and replaced on the next acquire; keep it
+# below the server's wait_timeout
+MYSQL_POOL_RECYCLE = int(os.environ.get('MYSQL_POOL_RECYCLE', 3600))
+# Connections idle longer than this (seconds) are pinged before being handed out
+MYSQL_POOL_PING_AFTER = float(os.environ.get('MYSQL_POOL_PING_AFTER', 60))
+MYSQL_POOL_ACQUIRE_TIMEOUT = float(os.environ.get('MYSQL_POOL_ACQUIRE_TIMEOUT', 5))
+
+async def init_mysql_pool():
+    global mysql_pool
+    if mysql_pool is not None:
+        return
+    pool_settings = dict(
+        user=os.environ.get('MYSQL_USER', 'root'),
+        password=os.environ.get('MYSQL_PASSWORD', ''),
+        db=os.environ.get('MYSQL_DATABASE', 'jimmys_tapas_bar'),
+        charset='utf8mb4',
+        cursorclass=aiomysql.DictCursor,
+        autocommit=True,
+        minsize=MYSQL_POOL_MINSIZE,
+        maxsize=MYSQL_POOL_MAXSIZE,
+        pool_recycle=MYSQL_POOL_RECYCLE,
+    )
     try:
         # Try socket connection first (Linux default)
-        return pymysql.connect(
-            unix_socket='/run/mysqld/mysqld.sock',
-            user=os.environ.get('MYSQL_USER', 'root'),
-            password=os.environ.get('MYSQL_PASSWORD', ''),
-            database=os.environ.get('MYSQL_DATABASE', 'jimmys_tapas_bar'),
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
-        )
-    except:
+        mysql_pool = await aiomysql.create_pool(unix_socket=MYSQL_SOCKET, **pool_settings)
+    except Exception:
         # Fallback to TCP connection
-        return pymysql.connect(
+        mysql_pool = await aiomysql.create_pool(
             host=os.environ.get('MYSQL_HOST', 'localhost'),
             port=int(os.environ.get('MYSQL_PORT', 3306)),
-            user=os.environ.get('MYSQL_USER', 'root'),
-            password=os.environ.get('MYSQL_PASSWORD', ''),
-            database=os.environ.get('MYSQL_DATABASE', 'jimmys_tapas_bar'),
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
+            **pool_settings
         )
 
+async def close_mysql_pool():
+    global mysql_pool
+    if mysql_pool is not None:
+        mysql_pool.close()
+        await mysql_pool.wait_closed()
+        mysql_pool = None
+
+async def get_mysql_connection():
+    """Acquire a pooled connection; hand it back with mysql_pool.release(conn)."""
+    if mysql_pool is None:
+        await init_mysql_pool()
+    try:
+        conn = await asyncio.wait_for(mysql_pool.acquire(), timeout=MYSQL_POOL_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Database busy, please retry")
+    # The server silently drops idle connections (wait_timeout), so check stale ones
+    if asyncio.get_running_loop().time() - conn.last_usage > MYSQL_POOL_PING_AFTER:
+        try:
+            await conn.ping(reconnect=True)
+        except Exception:
+            mysql_pool.release(conn)
+            raise HTTPException(status_code=503, detail="Database unavailable")
+    return conn
+
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
@@ -56,6 +121,10 @@ class MenuItem(BaseModel):
     additives: Optional[str] = None
     preparation_method: Optional[str] = None
     ingredients: Optional[str] = None
+    image: Optional[str] = None
+    # Width-bucketed derivatives of image, "<url> <width>w, ..." for <img srcset>
+    image_srcset: Optional[str] = None
+    image_webp_srcset: Optional[str] = None
     vegan: bool = False
     vegetarian: bool = False
     glutenfree: bool = False
@@ -96,8 +165,58 @@ security = HTTPBearer(auto_error=True)
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "jimmy-secret-2024")
 ALGORITHM = "HS256"
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt takes 100-300 ms per call but releases the GIL, so it runs in a small
+# dedicated thread pool instead of on the event loop. Callers beyond the queue
+# limit are turned away rather than piling up behind a burst of logins.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 16))
+
+class PasswordHasher:
+    def __init__(self, workers: int, max_queue: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Too many concurrent logins, please retry",
+                                headers={"Retry-After": "1"})
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.pending -= 1
+            self.completed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def metrics(self) -> dict:
+        return {
+            "pid": os.getpid(),  # metrics are per uvicorn worker process
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_ms": round(self.total_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 1),
+        }
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE)
+
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.run(pwd_context.verify, plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await password_hasher.run(pwd_context.hash, password)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -105,62 +224,592 @@ def create_access_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+# Response caches
+# Each worker keeps fully serialized JSON payloads in memory. Writers bump a
+# version row in cache_versions so other uvicorn workers notice the change
+# within CACHE_VERSION_CHECK_INTERVAL seconds without a query per request.
+CACHE_VERSION_CHECK_INTERVAL = float(os.environ.get('CACHE_VERSION_CHECK_INTERVAL', 2))
+
+def encode_json(data) -> bytes:
+    """Serialize like FastAPI's JSONResponse so cached bodies are byte-identical."""
+    return json.dumps(jsonable_encoder(data), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_SIZE = 1024
+
+class Payload:
+    """An encoded JSON body plus the validators used for conditional GETs."""
+    __slots__ = ("body", "etag", "last_modified", "variants")
+
+    def __init__(self, body: bytes, last_modified: Optional[datetime] = None, compress: bool = False):
+        self.body = body
+        self.etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+        # Only for data with a real modification time: a worker's own clock would
+        # differ between workers, and lists also change by deletions. Without it
+        # the ETag alone answers conditional GETs.
+        self.last_modified = last_modified.replace(microsecond=0) if last_modified else None
+        # Content-Encoding -> pre-compressed body
+        self.variants = {}
+        if compress and len(body) >= COMPRESS_MIN_SIZE:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=11)
+
+    def variant_etag(self, encoding: str) -> str:
+        # Each representation needs its own strong validator
+        return self.etag[:-1] + "-" + encoding + '"'
+
+    def matches(self, tag: str) -> bool:
+        return tag == self.etag or any(tag == self.variant_etag(encoding) for encoding in self.variants)
+
+def make_payload(data, last_modified: Optional[datetime] = None, compress: bool = False) -> Payload:
+    return Payload(encode_json(data), last_modified, compress)
+
+def choose_encoding(request: Request, payload: Payload) -> Optional[str]:
+    """Pick the best pre-compressed variant the client accepts (q=0 means refused)."""
+    if not payload.variants:
+        return None
+    accepted = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding in payload.variants and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+# Conditional GET support
+# Clients and the nginx front may store public responses but must revalidate
+# them; the revalidation is answered with a body-less 304.
+PUBLIC_CACHE_CONTROL = os.environ.get('PUBLIC_CACHE_CONTROL', 'public, max-age=0, must-revalidate')
+# Last-Modified for the built-in default CMS content
+CONTENT_LAST_MODIFIED = datetime.now(timezone.utc)
+
+def is_not_modified(request: Request, payload: Payload) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match uses weak comparison and takes precedence over If-Modified-Since
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or any(payload.matches(tag) for tag in tags)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and payload.last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return payload.last_modified <= since
+    return False
+
+def conditional_response(request: Request, payload: Payload, cache_control: str = PUBLIC_CACHE_CONTROL) -> Response:
+    encoding = choose_encoding(request, payload)
+    headers = {
+        "ETag": payload.variant_etag(encoding) if encoding else payload.etag,
+        "Cache-Control": cache_control,
+    }
+    if payload.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(payload.last_modified, usegmt=True)
+    if payload.variants:
+        headers["Vary"] = "Accept-Encoding"
+    if is_not_modified(request, payload):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        return Response(content=payload.variants[encoding], media_type="application/json", headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
+async def read_cache_version(name: str) -> int:
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT version FROM cache_versions WHERE name = %s", (name,))
+        row = await cursor.fetchone()
+        return row['version'] if row else 0
+    finally:
+        mysql_pool.release(conn)
+
+class ResponseCache:
+    def __init__(self, name: str):
+        self.name = name
+        self.version = None
+        self.payloads = {}
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def sync(self):
+        """Drop cached payloads if another worker bumped the shared version."""
+        now = time.monotonic()
+        if self.version is not None and now - self._checked_at < CACHE_VERSION_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        version = await read_cache_version(self.name)
+        if version != self.version:
+            self.payloads.clear()
+            self.version = version
+
+    async def get_or_build(self, key, build):
+        await self.sync()
+        payload = self.payloads.get(key)
+        if payload is not None:
+            return payload
+        async with self._lock:
+            payload = self.payloads.get(key)
+            if payload is None:
+                version = self.version
+                payload = await build()
+                # A write that landed while we were building makes this payload stale
+                if self.version == version:
+                    self.payloads[key] = payload
+        return payload
+
+    async def invalidate(self, cursor):
+        """Forget local payloads and tell the other workers to do the same."""
+        self.payloads.clear()
+        self.version = await bump_cache_version(cursor, self.name)
+        self._checked_at = time.monotonic()
+
+class PartitionedCache:
+    """Like ResponseCache, but with a version row per partition (menu category):
+    a write drops and rebuilds only the partitions it touched. The partition
+    list (INDEX_KEY) depends on all of them and goes whenever any one changes."""
+    INDEX_KEY = ""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.versions = None     # cache_versions name -> version
+        self.payloads = {}       # version name (INDEX_KEY for the list) -> Payload
+        # Bumped when a partition (generations) or everything (epoch) is dropped,
+        # so an in-flight build of that partition knows its result is stale
+        self.generations = {}
+        self.epoch = 0
+        self._checked_at = 0.0
+        # Per-partition build locks, [lock, users]; removed when nobody holds or waits
+        self._locks = {}
+
+    def version_name(self, partition: str) -> str:
+        return partition_version_name(self.name, partition)
+
+    def drop(self, key: str):
+        for dropped in (key, self.INDEX_KEY):
+            self.payloads.pop(dropped, None)
+            self.generations[dropped] = self.generations.get(dropped, 0) + 1
+
+    def clear(self):
+        self.payloads.clear()
+        self.epoch += 1
+
+    async def sync(self):
+        """Drop the partitions another worker bumped since the last check."""
+        now = time.monotonic()
+        if self.versions is not None and now - self._checked_at < CACHE_VERSION_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        conn = await get_mysql_connection()
+        try:
+            cursor = await conn.cursor()
+            await cursor.execute("SELECT name, version FROM cache_versions WHERE name = %s OR name LIKE %s",
+                                 (self.name, self.name + ":%"))
+            versions = {row['name']: row['version'] for row in await cursor.fetchall()}
+        finally:
+            mysql_pool.release(conn)
+        if self.versions is None or versions.get(self.name) != self.versions.get(self.name):
+            self.clear()
+        else:
+            for key, version in versions.items():
+                if version != self.versions.get(key):
+                    self.drop(key)
+        self.versions = versions
+
+    async def get_or_build(self, partition: Optional[str], build):
+        """Payload of a partition (None: the partition list); build() returning None is not cached."""
+        await self.sync()
+        key = self.INDEX_KEY if partition is None else self.version_name(partition)
+        payload = self.payloads.get(key)
+        if payload is not None:
+            return payload
+        # Categories build in parallel; only requests for the same one queue up
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                payload = self.payloads.get(key)
+                if payload is None:
+                    stamp = (self.epoch, self.generations.get(key, 0))
+                    payload = await build()
+                    if payload is not None and (self.epoch, self.generations.get(key, 0)) == stamp:
+                        self.payloads[key] = payload
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+        return payload
+
+    async def invalidate(self, cursor, partitions):
+        """Rebuild only these partitions here and in the other workers."""
+        for partition in {partition for partition in partitions if partition is not None}:
+            key = self.version_name(partition)
+            self.drop(key)
+            version = await bump_cache_version(cursor, key)
+            if self.versions is not None:
+                self.versions[key] = version
+        self._checked_at = time.monotonic()
+
+    async def invalidate_all(self, cursor):
+        self.clear()
+        version = await bump_cache_version(cursor, self.name)
+        if self.versions is not None:
+            self.versions[self.name] = version
+        self._checked_at = time.monotonic()
+
+menu_cache = ResponseCache(MENU_CACHE)
+menu_category_cache = PartitionedCache(MENU_CATEGORY_CACHE)
+review_stats_cache = ResponseCache("review_stats")
+
 # Routes
 @api_router.get("/menu/items", response_model=List[MenuItem])
-async def get_menu_items():
-    conn = get_mysql_connection()
+async def get_menu_items(request: Request):
+    payload = await menu_cache.get_or_build("items", build_menu_items_payload)
+    return conditional_response(request, payload)
+
+async def build_menu_items_payload():
+    conn = await get_mysql_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM menu_items WHERE is_active = TRUE ORDER BY order_index, category, name")
-        items = cursor.fetchall()
-        return [MenuItem(**item) for item in items]
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT * FROM menu_items WHERE is_active = TRUE ORDER BY order_index, category, name")
+        items = await cursor.fetchall()
+        return make_payload([MenuItem(**item, **srcset_fields(item['image'])) for item in items], compress=True)
     finally:
-        conn.close()
+        mysql_pool.release(conn)
+
+# The menu split by category, so the Speisekarte can render the first category
+# while the others load; each category is cached and invalidated on its own
+@api_router.get("/menu/categories")
+async def get_menu_categories(request: Request):
+    payload = await menu_category_cache.get_or_build(None, build_menu_categories_payload)
+    return conditional_response(request, payload)
+
+async def build_menu_categories_payload():
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        await cursor.execute("""
+            SELECT category, COUNT(*) AS count, MIN(order_index) AS first_order
+            FROM menu_items WHERE is_active = TRUE
+            GROUP BY category ORDER BY first_order, category
+        """)
+        rows = await cursor.fetchall()
+        return make_payload([{"name": row['category'], "count": row['count'], "order": position}
+                             for position, row in enumerate(rows)])
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.get("/menu/categories/{category:path}")
+async def get_menu_category(request: Request, category: str):
+    payload = await menu_category_cache.get_or_build(category, lambda: build_menu_category_payload(category))
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    return conditional_response(request, payload)
+
+async def build_menu_category_payload(category: str) -> Optional[Payload]:
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        await cursor.execute("""
+            SELECT * FROM menu_items WHERE is_active = TRUE AND category = %s ORDER BY order_index, name
+        """, (category,))
+        items = await cursor.fetchall()
+        if not items:
+            return None
+        return make_payload({
+            "name": items[0]['category'],
+            "count": len(items),
+            "items": [MenuItem(**item, **srcset_fields(item['image'])) for item in items],
+        }, compress=True)
+    finally:
+        mysql_pool.release(conn)
+
+# Search index over the active menu, kept in step with menu_cache's version:
+# after a menu write the rows are re-read and only changed items re-indexed
+menu_search_index = MenuSearchIndex()
+menu_search_lock = asyncio.Lock()
+
+async def current_menu_search_index() -> MenuSearchIndex:
+    await menu_cache.sync()
+    if menu_search_index.version != menu_cache.version:
+        async with menu_search_lock:
+            version = menu_cache.version
+            if menu_search_index.version != version:
+                conn = await get_mysql_connection()
+                try:
+                    cursor = await conn.cursor()
+                    await cursor.execute("SELECT * FROM menu_items WHERE is_active = TRUE")
+                    rows = await cursor.fetchall()
+                finally:
+                    mysql_pool.release(conn)
+                menu_search_index.refresh([jsonable_encoder(MenuItem(**row, **srcset_fields(row['image'])))
+                                           for row in rows])
+                menu_search_index.version = version
+    return menu_search_index
+
+@api_router.get("/menu/search")
+async def search_menu(q: str = "", vegan: bool = False, vegetarian: bool = False, glutenfree: bool = False,
+                      exclude_allergens: str = "", category: Optional[str] = None, limit: int = 50, offset: int = 0):
+    """Full-text menu search; exclude_allergens is comma separated ("Milch,Eier")"""
+    if not 1 <= limit <= 500 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be 1-500 and offset >= 0")
+    index = await current_menu_search_index()
+    started = time.perf_counter()
+    result = index.search(q, vegan=vegan, vegetarian=vegetarian, glutenfree=glutenfree,
+                          exclude_allergens=[name for name in exclude_allergens.split(",") if name.strip()],
+                          category=category, limit=limit, offset=offset)
+    result["took_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return result
 
 @api_router.get("/reviews", response_model=List[Review])
-async def get_reviews(approved_only: bool = True):
-    conn = get_mysql_connection()
+async def get_reviews(request: Request, approved_only: bool = True):
+    conn = await get_mysql_connection()
     try:
-        cursor = conn.cursor()
+        cursor = await conn.cursor()
         if approved_only:
-            cursor.execute("SELECT * FROM reviews WHERE is_approved = TRUE ORDER BY date DESC LIMIT 1000")
+            await cursor.execute("SELECT * FROM reviews WHERE is_approved = TRUE ORDER BY date DESC LIMIT 1000")
         else:
-            cursor.execute("SELECT * FROM reviews ORDER BY date DESC LIMIT 1000")
-        reviews = cursor.fetchall()
-        return [Review(**review) for review in reviews]
+            await cursor.execute("SELECT * FROM reviews ORDER BY date DESC LIMIT 1000")
+        reviews = await cursor.fetchall()
+        return conditional_response(request, make_payload([Review(**review) for review in reviews]))
     finally:
-        conn.close()
+        mysql_pool.release(conn)
+
+# Keyset pagination over (date, id), newest first. The cursor is the sort key
+# of the last row served, so deep pages cost the same as the first one.
+REVIEWS_PAGE_DEFAULT = 20
+REVIEWS_PAGE_MAX = 100
+REVIEW_FIELDS = ("id", "customer_name", "rating", "comment", "date", "is_approved")
+
+def encode_review_cursor(review: dict) -> str:
+    raw = json.dumps([review['date'].isoformat(), review['id']]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_review_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        date, review_id = json.loads(raw)
+        return datetime.fromisoformat(date), str(review_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@api_router.get("/reviews/page")
+async def get_reviews_page(
+    request: Request,
+    approved_only: bool = True,
+    limit: int = REVIEWS_PAGE_DEFAULT,
+    cursor: Optional[str] = None,
+    rating: Optional[int] = None,
+    fields: Optional[str] = None,
+):
+    """Get one page of reviews; pass next_cursor back as cursor for the following page"""
+    limit = max(1, min(limit, REVIEWS_PAGE_MAX))
+    selected = list(REVIEW_FIELDS)
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = set(selected) - set(REVIEW_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # The sort key is always read so the next cursor can be built
+    columns = list(dict.fromkeys(selected + ["date", "id"]))
+
+    conditions = []
+    params = []
+    if approved_only:
+        conditions.append("is_approved = TRUE")
+    if rating is not None:
+        conditions.append("rating = %s")
+        params.append(rating)
+    if cursor:
+        last_date, last_id = decode_review_cursor(cursor)
+        conditions.append("(date < %s OR (date = %s AND id < %s))")
+        params.extend([last_date, last_date, last_id])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    conn = await get_mysql_connection()
+    try:
+        db_cursor = await conn.cursor()
+        await db_cursor.execute(
+            f"SELECT {', '.join(columns)} FROM reviews {where} ORDER BY date DESC, id DESC LIMIT %s",
+            (*params, limit + 1)
+        )
+        rows = await db_cursor.fetchall()
+    finally:
+        mysql_pool.release(conn)
+
+    next_cursor = encode_review_cursor(rows[limit - 1]) if len(rows) > limit else None
+    items = [{field: row[field] for field in selected} for row in rows[:limit]]
+    return conditional_response(request, make_payload({"items": items, "next_cursor": next_cursor}))
 
 @api_router.post("/reviews", response_model=Review)
 async def create_review(review_data: ReviewCreate):
     review = Review(**review_data.dict())
-    conn = get_mysql_connection()
+    conn = await get_mysql_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
+        cursor = await conn.cursor()
+        await cursor.execute("""
             INSERT INTO reviews (id, customer_name, rating, comment, date, is_approved)
             VALUES (%s, %s, %s, %s, %s, %s)
         """, (review.id, review.customer_name, review.rating, review.comment, review.date, review.is_approved))
-        conn.commit()
+        if review.is_approved:
+            await adjust_review_stats(cursor, {review.rating: 1})
+        await conn.commit()
+        if review.is_approved:
+            await review_stats_cache.invalidate(cursor)
         return review
     finally:
-        conn.close()
+        mysql_pool.release(conn)
+
+# Review aggregates
+# review_stats holds one row per star rating with the number of approved
+# reviews. Every write that changes the approved set adjusts it in the same
+# transaction, so the stats endpoint never scans the reviews table.
+async def adjust_review_stats(cursor, deltas: dict):
+    """Apply {rating: count delta}; callers invalidate review_stats_cache after committing."""
+    now = datetime.utcnow()
+    for rating, delta in deltas.items():
+        if not delta:
+            continue
+        await cursor.execute("""
+            INSERT INTO review_stats (rating, review_count, updated_at) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE review_count = GREATEST(review_count + VALUES(review_count), 0),
+                                    updated_at = VALUES(updated_at)
+        """, (rating, delta, now))
+
+async def build_review_stats_payload():
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT rating, review_count, updated_at FROM review_stats")
+        rows = await cursor.fetchall()
+    finally:
+        mysql_pool.release(conn)
+    histogram = {str(rating): 0 for rating in range(1, 6)}
+    rating_sum = 0
+    last_updated = None
+    for row in rows:
+        histogram[str(row['rating'])] = row['review_count']
+        rating_sum += row['rating'] * row['review_count']
+        if last_updated is None or row['updated_at'] > last_updated:
+            last_updated = row['updated_at']
+    count = sum(histogram.values())
+    return make_payload({
+        "count": count,
+        "rating_sum": rating_sum,
+        "average": round(rating_sum / count, 2) if count else None,
+        "histogram": histogram,
+        "last_updated": last_updated,
+    }, last_updated.replace(tzinfo=timezone.utc) if last_updated else None)
+
+@api_router.get("/reviews/stats")
+async def get_review_stats(request: Request):
+    """Get approved review count, average and star histogram"""
+    payload = await review_stats_cache.get_or_build("stats", build_review_stats_payload)
+    return conditional_response(request, payload)
 
 @api_router.post("/auth/login", response_model=Token)
 async def login(user_credentials: UserLogin):
-    conn = get_mysql_connection()
+    conn = await get_mysql_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE username = %s", (user_credentials.username,))
-        user = cursor.fetchone()
-        
-        if not user or not verify_password(user_credentials.password, user['password_hash']):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        
-        access_token = create_access_token(data={"sub": user['username']})
-        return {"access_token": access_token, "token_type": "bearer"}
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT * FROM users WHERE username = %s", (user_credentials.username,))
+        user = await cursor.fetchone()
     finally:
-        conn.close()
+        mysql_pool.release(conn)
+    
+    if not user or not await verify_password(user_credentials.password, user['password_hash']):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    access_token = create_access_token(data={"sub": user['username']})
+    return {"access_token": access_token, "token_type": "bearer"}
+
+# Authenticated users are cached briefly by token subject so a dashboard load
+# firing a dozen parallel admin calls costs one user lookup. update_user and
+# delete_user invalidate explicitly (and bump the "users" cache version for
+# the other workers); the TTL bounds staleness for anything else.
+PRINCIPAL_CACHE_TTL = float(os.environ.get('PRINCIPAL_CACHE_TTL', 30))
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 256))
+
+class PrincipalCache:
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()  # username -> (expires_at, User)
+        self.inflight = {}            # username -> Future of a running lookup
+        self.version = None
+        self._checked_at = 0.0
+
+    async def sync(self):
+        now = time.monotonic()
+        if now - self._checked_at < CACHE_VERSION_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        version = await read_cache_version("users")
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+
+    async def get_or_load(self, username: str, load):
+        await self.sync()
+        entry = self.entries.get(username)
+        if entry is not None and entry[0] > time.monotonic():
+            self.entries.move_to_end(username)
+            return entry[1]
+        # Concurrent requests for the same subject share one lookup
+        future = self.inflight.get(username)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[username] = future
+        version = self.version
+        try:
+            user = await load(username)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            future.set_result(user)
+        finally:
+            del self.inflight[username]
+        if user is not None and self.version == version:
+            self.entries[username] = (time.monotonic() + self.ttl, user)
+            self.entries.move_to_end(username)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return user
+
+    async def invalidate(self, cursor, user_id: str):
+        for username, (_, user) in list(self.entries.items()):
+            if user.id == user_id:
+                del self.entries[username]
+        self.version = await bump_cache_version(cursor, "users")
+        self._checked_at = time.monotonic()
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_SIZE)
+
+async def load_user(username: str) -> Optional[User]:
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT id, username, email, role, is_active FROM users WHERE username = %s", (username,))
+        user = await cursor.fetchone()
+        return User(**user) if user else None
+    finally:
+        mysql_pool.release(conn)
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
@@ -172,41 +821,82 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    conn = get_mysql_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, email, role, is_active FROM users WHERE username = %s", (username,))
-        user = cursor.fetchone()
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return User(**user)
-    finally:
-        conn.close()
+    user = await principal_cache.get_or_load(username, load_user)
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
 
 @api_router.get("/auth/me", response_model=User)
 async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
+@api_router.put("/reviews/{review_id}/approve")
+async def approve_review(review_id: str, current_user: User = Depends(get_current_user)):
+    conn = await get_mysql_connection()
+    try:
+        await conn.begin()
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT rating, is_approved FROM reviews WHERE id = %s FOR UPDATE", (review_id,))
+        review = await cursor.fetchone()
+        if review is None:
+            raise HTTPException(status_code=404, detail="Review not found")
+        if not review['is_approved']:
+            await cursor.execute("UPDATE reviews SET is_approved = TRUE WHERE id = %s", (review_id,))
+            await adjust_review_stats(cursor, {review['rating']: 1})
+        await conn.commit()
+        if not review['is_approved']:
+            await review_stats_cache.invalidate(cursor)
+        return {"message": "Review approved successfully"}
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.delete("/admin/reviews/{review_id}")
+async def delete_review(review_id: str, current_user: User = Depends(get_current_user)):
+    conn = await get_mysql_connection()
+    try:
+        await conn.begin()
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT rating, is_approved FROM reviews WHERE id = %s FOR UPDATE", (review_id,))
+        review = await cursor.fetchone()
+        if review is None:
+            raise HTTPException(status_code=404, detail="Review not found")
+        await cursor.execute("DELETE FROM reviews WHERE id = %s", (review_id,))
+        if review['is_approved']:
+            await adjust_review_stats(cursor, {review['rating']: -1})
+        await conn.commit()
+        if review['is_approved']:
+            await review_stats_cache.invalidate(cursor)
+        return {"message": "Review deleted successfully"}
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        mysql_pool.release(conn)
+
 @api_router.post("/contact")
 async def create_contact_message(message_data: dict):
-    conn = get_mysql_connection()
+    conn = await get_mysql_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
+        cursor = await conn.cursor()
+        await cursor.execute("""
             INSERT INTO contact_messages (id, name, email, phone, subject, message, date, is_read)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         """, (str(uuid.uuid4()), message_data.get("name"), message_data.get("email"), 
               message_data.get("phone"), message_data.get("subject"), message_data.get("message"), 
               datetime.utcnow(), False))
-        conn.commit()
+        await conn.commit()
         return {"message": "Contact message sent successfully"}
     finally:
-        conn.close()
+        mysql_pool.release(conn)
 
 # CMS Endpoints with static data for webspace compatibility
-@api_router.get("/cms/homepage")
-async def get_homepage_content():
-    return {
+# Default page content; every entry is encoded once into cms_registry and
+# only re-encoded when the matching PUT endpoint replaces it.
+DEFAULT_CMS_CONTENT = {
+    "homepage": {
         "hero": {
             "title": "JIMMY'S TAPAS BAR",
             "subtitle": "an der Ostsee",
@@ -231,123 +921,8 @@ async def get_homepage_content():
                 {"title": "Gambas al Ajillo", "description": "Garnelen in Knoblauchöl", "image_url": "https://images.unsplash.com/photo-1619860705243-dbef552e7118"}
             ]
         }
-    }
-
-@api_router.put("/cms/homepage")
-async def update_homepage_content(content_data: dict, current_user: User = Depends(get_current_user)):
-    # Store updated content in database or file
-    return {"message": "Homepage content updated successfully", "data": content_data}
-
-@api_router.put("/cms/standorte-enhanced")
-async def update_standorte_enhanced(content_data: dict, current_user: User = Depends(get_current_user)):
-    return {"message": "Standorte content updated successfully", "data": content_data}
-
-@api_router.put("/cms/ueber-uns-enhanced")
-async def update_ueber_uns_enhanced(content_data: dict, current_user: User = Depends(get_current_user)):
-    """Update about us content"""
-    # In a real implementation, this would save to database
-    return {"message": "Über uns content updated successfully", "data": content_data}
-
-@api_router.get("/cms/website-texts/{section}")
-async def get_website_texts(section: str):
-    """Get website texts for a specific section (navigation, footer, buttons)"""
-    if section == "navigation":
-        return {
-            "home": "Startseite",
-            "locations": "Standorte",
-            "menu": "Speisekarte",
-            "reviews": "Bewertungen",
-            "about": "Über uns",
-            "contact": "Kontakt",
-            "privacy": "Datenschutz",
-            "imprint": "Impressum"
-        }
-    elif section == "footer":
-        return {
-            "opening_hours_title": "Öffnungszeiten",
-            "contact_title": "Kontakt",
-            "follow_us_title": "Folgen Sie uns",
-            "copyright": "© 2024 Jimmy's Tapas Bar. Alle Rechte vorbehalten."
-        }
-    elif section == "buttons":
-        return {
-            "menu_button": "Speisekarte ansehen",
-            "locations_button": "Standorte entdecken",
-            "contact_button": "Kontakt aufnehmen",
-            "reserve_button": "Tisch reservieren",
-            "order_button": "Online bestellen"
-        }
-    else:
-        raise HTTPException(status_code=404, detail=f"Section '{section}' not found")
-
-@api_router.put("/cms/website-texts/{section}")
-async def update_website_texts(section: str, content_data: dict, current_user: User = Depends(get_current_user)):
-    return {"message": f"Website texts for {section} updated successfully", "data": content_data}
-
-# Menu Items CRUD für CMS
-@api_router.put("/menu/items/{item_id}")
-async def update_menu_item(item_id: str, item_data: dict, current_user: User = Depends(get_current_user)):
-    conn = get_mysql_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE menu_items SET 
-            name = %s, description = %s, detailed_description = %s, price = %s, 
-            category = %s, origin = %s, allergens = %s, ingredients = %s,
-            vegan = %s, vegetarian = %s, glutenfree = %s, order_index = %s
-            WHERE id = %s
-        """, (
-            item_data.get('name'), item_data.get('description'), 
-            item_data.get('detailed_description'), item_data.get('price'),
-            item_data.get('category'), item_data.get('origin'),
-            item_data.get('allergens'), item_data.get('ingredients'),
-            item_data.get('vegan', False), item_data.get('vegetarian', False),
-            item_data.get('glutenfree', False), item_data.get('order_index', 0),
-            item_id
-        ))
-        conn.commit()
-        return {"message": "Menu item updated successfully"}
-    finally:
-        conn.close()
-
-@api_router.delete("/menu/items/{item_id}")
-async def delete_menu_item(item_id: str, current_user: User = Depends(get_current_user)):
-    conn = get_mysql_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM menu_items WHERE id = %s", (item_id,))
-        conn.commit()
-        return {"message": "Menu item deleted successfully"}
-    finally:
-        conn.close()
-
-@api_router.post("/menu/items")
-async def create_menu_item(item_data: dict, current_user: User = Depends(get_current_user)):
-    conn = get_mysql_connection()
-    try:
-        cursor = conn.cursor()
-        item_id = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO menu_items (id, name, description, detailed_description, price, category, 
-                                   origin, allergens, ingredients, vegan, vegetarian, glutenfree, 
-                                   order_index, is_active)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            item_id, item_data.get('name'), item_data.get('description'),
-            item_data.get('detailed_description'), item_data.get('price'),
-            item_data.get('category'), item_data.get('origin'),
-            item_data.get('allergens'), item_data.get('ingredients'),
-            item_data.get('vegan', False), item_data.get('vegetarian', False),
-            item_data.get('glutenfree', False), item_data.get('order_index', 0), True
-        ))
-        conn.commit()
-        return {"message": "Menu item created successfully", "id": item_id}
-    finally:
-        conn.close()
-
-@api_router.get("/cms/standorte-enhanced")
-async def get_standorte_enhanced():
-    return {
+    },
+    "standorte-enhanced": {
         "page_title": "Unsere Standorte",
         "page_subtitle": "Besuchen Sie uns an der malerischen Ostseeküste",
         "neustadt": {
@@ -372,16 +947,8 @@ async def get_standorte_enhanced():
             },
             "features": ["Panorama-Meerblick", "Ruhige Lage", "Romantische Atmosphäre", "Sonnenuntergänge"]
         }
-    }
-
-@api_router.put("/cms/standorte-enhanced")
-async def update_standorte_enhanced(content_data: dict, current_user: User = Depends(get_current_user)):
-    return {"message": "Standorte content updated successfully", "data": content_data}
-
-@api_router.get("/cms/locations")
-async def get_locations():
-    """Get locations data - returns current live data structure"""
-    return {
+    },
+    "locations": {
         "page_title": "Unsere Standorte",
         "page_description": "Besuchen Sie uns an der malerischen Ostseeküste",
         "locations": [
@@ -416,15 +983,8 @@ async def get_locations():
                 "maps_embed": ""
             }
         ]
-    }
-
-@api_router.put("/cms/locations")
-async def update_locations(content_data: dict, current_user: User = Depends(get_current_user)):
-    return {"message": "Standorte content updated successfully", "data": content_data}
-
-@api_router.get("/cms/kontakt-page")
-async def get_kontakt_page():
-    return {
+    },
+    "kontakt-page": {
         "page_title": "Kontakt",
         "page_subtitle": "Wir freuen uns auf Ihren Besuch",
         "contact_form_title": "Schreiben Sie uns",
@@ -432,12 +992,8 @@ async def get_kontakt_page():
         "locations_section_title": "Unsere Standorte",
         "opening_hours_title": "Öffnungszeiten",
         "additional_info": "Wir sind täglich für Sie da."
-    }
-
-@api_router.get("/cms/ueber-uns-enhanced")
-async def get_ueber_uns_enhanced():
-    """Get about us data - matches the live website structure exactly"""
-    return {
+    },
+    "ueber-uns-enhanced": {
         "page_title": "Über uns",
         "page_subtitle": "Die Geschichte hinter Jimmy's Tapas Bar",
         "header_background": "https://images.unsplash.com/photo-1571197119738-26123cb0d22f",
@@ -458,65 +1014,548 @@ async def get_ueber_uns_enhanced():
             "text4": "An beiden Standorten erleben Sie die entspannte Atmosphäre des Mittelmeers,",
             "text5": "während Sie den Blick auf die Ostsee genießen können."
         }
-    }
+    },
+    "eu-compliance": {
+        "gdpr_enabled": True,
+        "cookie_consent_required": True,
+        "data_retention_period": 730,
+        "privacy_policy_version": "2.0",
+        "last_updated": "2024-12-19"
+    },
+    "cookie-settings": {
+        "cookieSettings": {
+            "essential_cookies": {"enabled": True, "description": "Technisch notwendige Cookies"},
+            "analytics_cookies": {"enabled": False, "description": "Analyse-Cookies"},
+            "marketing_cookies": {"enabled": False, "description": "Marketing-Cookies"}
+        },
+        "bannerSettings": {
+            "banner_title": "Diese Website verwendet Cookies",
+            "banner_text": "Wir verwenden Cookies für beste Nutzererfahrung",
+            "accept_button_text": "Alle akzeptieren"
+        }
+    },
+    "website-texts/navigation": {
+        "home": "Startseite",
+        "locations": "Standorte",
+        "menu": "Speisekarte",
+        "reviews": "Bewertungen",
+        "about": "Über uns",
+        "contact": "Kontakt",
+        "privacy": "Datenschutz",
+        "imprint": "Impressum"
+    },
+    "website-texts/footer": {
+        "opening_hours_title": "Öffnungszeiten",
+        "contact_title": "Kontakt",
+        "follow_us_title": "Folgen Sie uns",
+        "copyright": "© 2024 Jimmy's Tapas Bar. Alle Rechte vorbehalten."
+    },
+    "website-texts/buttons": {
+        "menu_button": "Speisekarte ansehen",
+        "locations_button": "Standorte entdecken",
+        "contact_button": "Kontakt aufnehmen",
+        "reserve_button": "Tisch reservieren",
+        "order_button": "Online bestellen"
+    },
+}
+
+class ContentRegistry:
+    """Pre-encoded CMS payloads keyed by page (or "website-texts/<section>").
+
+    Edits are persisted in content_sections, one row per (page, section)
+    with its own version. Workers only re-read and re-encode rows whose
+    version moved, after noticing a bump of the "cms" cache version.
+    """
+
+    def __init__(self, content: dict):
+        self.payloads = {}
+        self.versions = {}
+        self.version = None
+        # key -> (data, last_modified, image URLs) of sections published before
+        # their images had derivatives; see refresh_images()
+        self.unbuilt = {}
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        # No event loop yet at import time; startup queues the derivatives
+        for key, data in content.items():
+            self.publish(key, data, CONTENT_LAST_MODIFIED, queue=False)
+
+    @staticmethod
+    def split_key(key: str):
+        page, _, section = key.partition("/")
+        return page, section or "main"
+
+    @staticmethod
+    def join_key(page: str, section: str) -> str:
+        return page if section == "main" else f"{page}/{section}"
+
+    def publish(self, key: str, data, last_modified: Optional[datetime] = None, queue: bool = True) -> Payload:
+        self.unbuilt.pop(key, None)
+        if isinstance(data, dict):
+            unbuilt = image_pipeline.unbuilt(data)
+            if unbuilt:
+                self.unbuilt[key] = (data, last_modified, unbuilt)
+            # srcsets for uploaded images, keyed by the image URL used in the content
+            variants = image_pipeline.collect(data, queue)
+            if variants:
+                data = {**data, "image_variants": variants}
+        payload = make_payload(data, last_modified, compress=True)
+        self.payloads[key] = payload
+        return payload
+
+    def get(self, key: str) -> Optional[Payload]:
+        return self.payloads.get(key)
+
+    def refresh_images(self):
+        """Republish sections whose images got their derivatives since, queue the others."""
+        for key, (data, last_modified, unbuilt) in list(self.unbuilt.items()):
+            if image_pipeline.unbuilt(data) != unbuilt:
+                self.publish(key, data, last_modified)
+            else:
+                image_pipeline.collect(data)
+
+    async def sync(self, force: bool = False):
+        if not force and time.monotonic() - self._checked_at < CACHE_VERSION_CHECK_INTERVAL:
+            return
+        async with self._lock:
+            if not force and time.monotonic() - self._checked_at < CACHE_VERSION_CHECK_INTERVAL:
+                return
+            self._checked_at = time.monotonic()
+            try:
+                version = await read_cache_version("cms")
+                if version != self.version or force:
+                    await self._reload_changed()
+                    self.refresh_images()
+                    self.version = version
+            except Exception as e:
+                # Keep serving the last known content while the database is unavailable
+                print(f"⚠️ CMS content sync skipped: {e}")
 
-# Fehlende Admin-Endpunkte hinzufügen
+    async def _reload_changed(self):
+        conn = await get_mysql_connection()
+        try:
+            cursor = await conn.cursor()
+            # Versions first; the (large) content only of the sections that moved
+            await cursor.execute("SELECT page, section, version FROM content_sections")
+            changed = [(row['page'], row['section']) for row in await cursor.fetchall()
+                       if self.versions.get(self.join_key(row['page'], row['section'])) != row['version']]
+            rows = []
+            for start in range(0, len(changed), BULK_CHUNK_SIZE):
+                chunk = changed[start:start + BULK_CHUNK_SIZE]
+                await cursor.execute(f"""
+                    SELECT page, section, version, content, updated_at FROM content_sections
+                    WHERE (page, section) IN ({", ".join(["(%s, %s)"] * len(chunk))})
+                """, [value for pair in chunk for value in pair])
+                rows += await cursor.fetchall()
+        finally:
+            mysql_pool.release(conn)
+        for row in rows:
+            key = self.join_key(row['page'], row['section'])
+            try:
+                data = json.loads(row['content'])
+            except ValueError as e:
+                # Keep the last good content; retried once the row's version moves again
+                print(f"⚠️ CMS section {key} v{row['version']} skipped, invalid JSON: {e}")
+            else:
+                self.publish(key, data, row['updated_at'].replace(tzinfo=timezone.utc))
+            self.versions[key] = row['version']
+
+    async def save(self, key: str, data, username: str) -> int:
+        """Atomically store a new version of a section and announce it to all workers."""
+        page, section = self.split_key(key)
+        if isinstance(data, dict):
+            # Derived on publish, editors send back what they loaded
+            data = {k: v for k, v in data.items() if k != "image_variants"}
+        updated_at = datetime.now(timezone.utc).replace(microsecond=0)
+        conn = await get_mysql_connection()
+        try:
+            await conn.begin()
+            cursor = await conn.cursor()
+            await cursor.execute("""
+                INSERT INTO content_sections (id, page, section, content, updated_at, updated_by, version)
+                VALUES (%s, %s, %s, %s, %s, %s, 1)
+                ON DUPLICATE KEY UPDATE content = VALUES(content), updated_at = VALUES(updated_at),
+                                        updated_by = VALUES(updated_by), version = version + 1
+            """, (str(uuid.uuid4()), page, section, json.dumps(data, ensure_ascii=False),
+                  updated_at.replace(tzinfo=None), username))
+            await cursor.execute("SELECT version FROM content_sections WHERE page = %s AND section = %s", (page, section))
+            version = (await cursor.fetchone())['version']
+            await bump_cache_version(cursor, "cms")
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+        finally:
+            mysql_pool.release(conn)
+        self.publish(key, data, updated_at)
+        self.versions[key] = version
+        return version
+
+cms_registry = ContentRegistry(DEFAULT_CMS_CONTENT)
+
+async def refresh_image_variants(digest: str):
+    """New derivatives: rebuild the payloads cached without their srcsets, here and in the other workers."""
+    cms_registry.refresh_images()
+    try:
+        conn = await get_mysql_connection()
+        try:
+            cursor = await conn.cursor()
+            await menu_cache.invalidate(cursor)
+            await menu_category_cache.invalidate_all(cursor)
+            await bump_cache_version(cursor, "cms")
+        finally:
+            mysql_pool.release(conn)
+    except Exception as e:
+        print(f"⚠️ Cache refresh after image derivatives {digest[:12]} failed: {e}")
+
+image_pipeline.listeners.append(refresh_image_variants)
+
+async def cms_response(request: Request, key: str) -> Response:
+    await cms_registry.sync()
+    payload = cms_registry.get(key)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+    return conditional_response(request, payload)
+
+@api_router.get("/cms/homepage")
+async def get_homepage_content(request: Request):
+    return await cms_response(request, "homepage")
+
+@api_router.put("/cms/homepage")
+async def update_homepage_content(content_data: dict, current_user: User = Depends(get_current_user)):
+    version = await cms_registry.save("homepage", content_data, current_user.username)
+    return {"message": "Homepage content updated successfully", "data": content_data, "version": version}
+
+@api_router.put("/cms/standorte-enhanced")
+async def update_standorte_enhanced(content_data: dict, current_user: User = Depends(get_current_user)):
+    version = await cms_registry.save("standorte-enhanced", content_data, current_user.username)
+    return {"message": "Standorte content updated successfully", "data": content_data, "version": version}
+
+@api_router.put("/cms/ueber-uns-enhanced")
+async def update_ueber_uns_enhanced(content_data: dict, current_user: User = Depends(get_current_user)):
+    """Update about us content"""
+    version = await cms_registry.save("ueber-uns-enhanced", content_data, current_user.username)
+    return {"message": "Über uns content updated successfully", "data": content_data, "version": version}
+
+@api_router.get("/cms/website-texts/{section}")
+async def get_website_texts(request: Request, section: str):
+    """Get website texts for a specific section (navigation, footer, buttons)"""
+    await cms_registry.sync()
+    if cms_registry.get(f"website-texts/{section}") is None:
+        raise HTTPException(status_code=404, detail=f"Section '{section}' not found")
+    return await cms_response(request, f"website-texts/{section}")
+
+@api_router.put("/cms/website-texts/{section}")
+async def update_website_texts(section: str, content_data: dict, current_user: User = Depends(get_current_user)):
+    version = await cms_registry.save(f"website-texts/{section}", content_data, current_user.username)
+    return {"message": f"Website texts for {section} updated successfully", "data": content_data, "version": version}
+
+# Menu Items CRUD für CMS
+@api_router.put("/menu/items/{item_id}")
+async def update_menu_item(item_id: str, item_data: dict, current_user: User = Depends(get_current_user)):
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        # The item may move between categories; both need rebuilding
+        await cursor.execute("SELECT category FROM menu_items WHERE id = %s", (item_id,))
+        previous = await cursor.fetchone()
+        await cursor.execute("""
+            UPDATE menu_items SET 
+            name = %s, description = %s, detailed_description = %s, price = %s, 
+            category = %s, origin = %s, allergens = %s, ingredients = %s,
+            vegan = %s, vegetarian = %s, glutenfree = %s, order_index = %s,
+            image = IF(%s, %s, image)
+            WHERE id = %s
+        """, (
+            item_data.get('name'), item_data.get('description'), 
+            item_data.get('detailed_description'), item_data.get('price'),
+            item_data.get('category'), item_data.get('origin'),
+            item_data.get('allergens'), item_data.get('ingredients'),
+            item_data.get('vegan', False), item_data.get('vegetarian', False),
+            item_data.get('glutenfree', False), item_data.get('order_index', 0),
+            'image' in item_data, item_data.get('image'),
+            item_id
+        ))
+        await menu_cache.invalidate(cursor)
+        await menu_category_cache.invalidate(cursor, [previous and previous['category'], item_data.get('category')])
+        await conn.commit()
+        return {"message": "Menu item updated successfully"}
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.delete("/menu/items/{item_id}")
+async def delete_menu_item(item_id: str, current_user: User = Depends(get_current_user)):
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT category FROM menu_items WHERE id = %s", (item_id,))
+        previous = await cursor.fetchone()
+        await cursor.execute("DELETE FROM menu_items WHERE id = %s", (item_id,))
+        await menu_cache.invalidate(cursor)
+        await menu_category_cache.invalidate(cursor, [previous and previous['category']])
+        await conn.commit()
+        return {"message": "Menu item deleted successfully"}
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.post("/menu/items")
+async def create_menu_item(item_data: dict, current_user: User = Depends(get_current_user)):
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        item_id = str(uuid.uuid4())
+        await cursor.execute("""
+            INSERT INTO menu_items (id, name, description, detailed_description, price, category, 
+                                   origin, allergens, ingredients, image, vegan, vegetarian, glutenfree, 
+                                   order_index, is_active)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (
+            item_id, item_data.get('name'), item_data.get('description'),
+            item_data.get('detailed_description'), item_data.get('price'),
+            item_data.get('category'), item_data.get('origin'),
+            item_data.get('allergens'), item_data.get('ingredients'), item_data.get('image'),
+            item_data.get('vegan', False), item_data.get('vegetarian', False),
+            item_data.get('glutenfree', False), item_data.get('order_index', 0), True
+        ))
+        await menu_cache.invalidate(cursor)
+        await menu_category_cache.invalidate(cursor, [item_data.get('category')])
+        await conn.commit()
+        return {"message": "Menu item created successfully", "id": item_id}
+    finally:
+        mysql_pool.release(conn)
+
+# Bulk admin operations: one transaction and one IN (...) statement per chunk
+# instead of a request per row; caches are invalidated once at the end
+def bulk_request_ids(body: BulkIds) -> list:
+    ids = unique_ids(body.ids)
+    if not ids:
+        raise HTTPException(status_code=400, detail="No ids given")
+    if len(ids) > BULK_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_IDS} ids per request")
+    return ids
+
+@api_router.post("/admin/menu/items/bulk-delete")
+async def bulk_delete_menu_items(body: BulkIds, current_user: User = Depends(get_current_user)):
+    ids = bulk_request_ids(body)
+    conn = await get_mysql_connection()
+    try:
+        await conn.begin()
+        cursor = await conn.cursor()
+        found = await lock_rows(cursor, "menu_items", "category", ids)
+        await execute_for_ids(cursor, "DELETE FROM menu_items WHERE id IN ({ids})", list(found))
+        await conn.commit()
+        if found:
+            await menu_cache.invalidate(cursor)
+            await menu_category_cache.invalidate(cursor, [row['category'] for row in found.values()])
+        return bulk_result({item_id: "deleted" if item_id in found else "not_found" for item_id in ids})
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.post("/admin/reviews/bulk-approve")
+async def bulk_approve_reviews(body: BulkIds, current_user: User = Depends(get_current_user)):
+    ids = bulk_request_ids(body)
+    conn = await get_mysql_connection()
+    try:
+        await conn.begin()
+        cursor = await conn.cursor()
+        found = await lock_rows(cursor, "reviews", "rating, is_approved", ids)
+        pending = [review_id for review_id, review in found.items() if not review['is_approved']]
+        await execute_for_ids(cursor, "UPDATE reviews SET is_approved = TRUE WHERE id IN ({ids})", pending)
+        deltas = {}
+        for review_id in pending:
+            rating = found[review_id]['rating']
+            deltas[rating] = deltas.get(rating, 0) + 1
+        await adjust_review_stats(cursor, deltas)
+        await conn.commit()
+        if pending:
+            await review_stats_cache.invalidate(cursor)
+        return bulk_result({
+            review_id: "not_found" if review_id not in found else
+            "already_approved" if found[review_id]['is_approved'] else "approved"
+            for review_id in ids})
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.post("/admin/reviews/bulk-delete")
+async def bulk_delete_reviews(body: BulkIds, current_user: User = Depends(get_current_user)):
+    ids = bulk_request_ids(body)
+    conn = await get_mysql_connection()
+    try:
+        await conn.begin()
+        cursor = await conn.cursor()
+        found = await lock_rows(cursor, "reviews", "rating, is_approved", ids)
+        await execute_for_ids(cursor, "DELETE FROM reviews WHERE id IN ({ids})", list(found))
+        deltas = {}
+        for review in found.values():
+            if review['is_approved']:
+                deltas[review['rating']] = deltas.get(review['rating'], 0) - 1
+        await adjust_review_stats(cursor, deltas)
+        await conn.commit()
+        if deltas:
+            await review_stats_cache.invalidate(cursor)
+        return bulk_result({review_id: "deleted" if review_id in found else "not_found" for review_id in ids})
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.post("/admin/contact/bulk-read")
+async def bulk_mark_messages_read(body: BulkIds, current_user: User = Depends(get_current_user)):
+    ids = bulk_request_ids(body)
+    conn = await get_mysql_connection()
+    try:
+        await conn.begin()
+        cursor = await conn.cursor()
+        found = await lock_rows(cursor, "contact_messages", "is_read", ids)
+        unread = [message_id for message_id, message in found.items() if not message['is_read']]
+        await execute_for_ids(cursor, "UPDATE contact_messages SET is_read = TRUE WHERE id IN ({ids})", unread)
+        await conn.commit()
+        return bulk_result({
+            message_id: "not_found" if message_id not in found else
+            "already_read" if found[message_id]['is_read'] else "marked_read"
+            for message_id in ids})
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.post("/admin/contact/bulk-delete")
+async def bulk_delete_messages(body: BulkIds, current_user: User = Depends(get_current_user)):
+    ids = bulk_request_ids(body)
+    conn = await get_mysql_connection()
+    try:
+        await conn.begin()
+        cursor = await conn.cursor()
+        found = await lock_rows(cursor, "contact_messages", "is_read", ids)
+        await execute_for_ids(cursor, "DELETE FROM contact_messages WHERE id IN ({ids})", list(found))
+        await conn.commit()
+        return bulk_result({message_id: "deleted" if message_id in found else "not_found" for message_id in ids})
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.post("/admin/upload-image")
+async def upload_image(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+    """Store an image by content hash and build its responsive derivatives"""
+    try:
+        stored = await save_upload(file)
+    except ImageStoreError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    # Built in the image pool, off the event loop; waiting means the URL has
+    # its srcset by the time the editor saves it into a menu item or page
+    variants = await image_pipeline.build(stored["image_url"])
+    return {**stored, "filename": file.filename, "variants": variants}
+
+@api_router.post("/admin/menu/import")
+async def import_menu(request: Request, format: str = "json", dry_run: bool = False,
+                      deactivate_missing: bool = True, current_user: User = Depends(get_current_user)):
+    """Import the menu from a CSV/JSON/YAML request body, writing only the differences"""
+    if format not in MENU_IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(MENU_IMPORT_FORMATS)}")
+    try:
+        items = load_menu_items((await request.body()).decode("utf-8-sig"), format)
+    except (MenuImportError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        await conn.begin()
+        try:
+            result = await apply_menu_import(cursor, items, deactivate_missing, dry_run)
+        except MenuImportError as e:
+            await conn.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception:
+            await conn.rollback()
+            raise
+        if dry_run:
+            await conn.rollback()
+        else:
+            await conn.commit()
+        # After the commit, so no worker can rebuild the menu from the old rows
+        if menu_import_changed(result):
+            await menu_cache.invalidate(cursor)
+            await menu_category_cache.invalidate(cursor, result["categories"])
+        return result
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.get("/cms/standorte-enhanced")
+async def get_standorte_enhanced(request: Request):
+    return await cms_response(request, "standorte-enhanced")
+
+@api_router.get("/cms/locations")
+async def get_locations(request: Request):
+    """Get locations data - returns current live data structure"""
+    return await cms_response(request, "locations")
+
+@api_router.put("/cms/locations")
+async def update_locations(content_data: dict, current_user: User = Depends(get_current_user)):
+    version = await cms_registry.save("locations", content_data, current_user.username)
+    return {"message": "Standorte content updated successfully", "data": content_data, "version": version}
+
+@api_router.get("/cms/kontakt-page")
+async def get_kontakt_page(request: Request):
+    return await cms_response(request, "kontakt-page")
+
+@api_router.get("/cms/ueber-uns-enhanced")
+async def get_ueber_uns_enhanced(request: Request):
+    """Get about us data - matches the live website structure exactly"""
+    return await cms_response(request, "ueber-uns-enhanced")
 @api_router.get("/admin/newsletter/subscribers")
 async def get_newsletter_subscribers(current_user: User = Depends(get_current_user)):
-    conn = get_mysql_connection()
+    conn = await get_mysql_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM newsletter_subscribers ORDER BY created_at DESC")
-        subscribers = cursor.fetchall()
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT * FROM newsletter_subscribers ORDER BY created_at DESC")
+        subscribers = await cursor.fetchall()
         return subscribers
     except Exception as e:
         # Falls Tabelle nicht existiert, leere Liste zurückgeben
         return []
     finally:
-        conn.close()
+        mysql_pool.release(conn)
 
 @api_router.get("/users")
 async def get_users(current_user: User = Depends(get_current_user)):
-    conn = get_mysql_connection()
+    conn = await get_mysql_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, email, role, is_active FROM users")
-        users = cursor.fetchall()
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT id, username, email, role, is_active FROM users")
+        users = await cursor.fetchall()
         return [User(**user) for user in users]
     finally:
-        conn.close()
+        mysql_pool.release(conn)
 
 @api_router.get("/admin/contact")
 async def get_contact_messages(current_user: User = Depends(get_current_user)):
-    conn = get_mysql_connection()
+    conn = await get_mysql_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM contact_messages ORDER BY date DESC")
-        messages = cursor.fetchall()
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT * FROM contact_messages ORDER BY date DESC")
+        messages = await cursor.fetchall()
         return messages
     finally:
-        conn.close()
+        mysql_pool.release(conn)
 
 @api_router.post("/contact")
 async def submit_contact_form(contact_data: dict):
-    conn = get_mysql_connection()
-    try:
-        cursor = conn.cursor()
-        # Versuche Tabelle zu erstellen falls sie nicht existiert
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS contact_messages (
-                id VARCHAR(36) PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                email VARCHAR(255) NOT NULL,
-                phone VARCHAR(50),
-                subject VARCHAR(255) NOT NULL,
-                message TEXT NOT NULL,
-                date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status VARCHAR(50) DEFAULT 'new'
-            )
-        """)
-        
-        cursor.execute("""
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        # Table is created by migrate_schema() at startup; the pool autocommits
+        await cursor.execute("""
             INSERT INTO contact_messages (id, name, email, phone, subject, message)
             VALUES (%s, %s, %s, %s, %s, %s)
         """, (
@@ -527,40 +1566,32 @@ async def submit_contact_form(contact_data: dict):
             contact_data.get("subject"),
             contact_data.get("message")
         ))
-        conn.commit()
         return {"message": "Contact form submitted successfully"}
     except Exception as e:
         return {"message": "Contact form submission failed", "error": str(e)}
     finally:
-        conn.close()
+        mysql_pool.release(conn)
 
 @api_router.post("/newsletter/subscribe")
 async def newsletter_subscribe(email_data: dict):
-    conn = get_mysql_connection()
-    try:
-        cursor = conn.cursor()
-        # Versuche Tabelle zu erstellen falls sie nicht existiert
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS newsletter_subscribers (
-                id VARCHAR(36) PRIMARY KEY,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_active BOOLEAN DEFAULT TRUE
-            )
-        """)
-        
-        cursor.execute("""
+    email = str(email_data.get("email") or "").strip().lower()
+    if not is_valid_email(email):
+        raise HTTPException(status_code=400, detail="Valid email address required")
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        # Table is created by migrate_schema() at startup; the pool autocommits
+        await cursor.execute("""
             INSERT INTO newsletter_subscribers (id, email)
             VALUES (%s, %s)
-        """, (str(uuid.uuid4()), email_data.get("email")))
-        conn.commit()
+        """, (str(uuid.uuid4()), email))
         return {"message": "Newsletter subscription successful"}
     except Exception as e:
         if "Duplicate entry" in str(e):
             return {"message": "Email already subscribed"}
         return {"message": "Subscription failed", "error": str(e)}
     finally:
-        conn.close()
+        mysql_pool.release(conn)
 
 # CORS
 app.add_middleware(
@@ -571,181 +1602,366 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(api_router)
+# Schema migrations
+# Each entry is applied exactly once, in order, and recorded in
+# schema_migrations. Steps are SQL strings or async callables taking a
+# cursor. Add new entries at the end; never edit applied ones.
+SCHEMA_MIGRATIONS = [
+    (1, "core tables", [
+        """
+        CREATE TABLE IF NOT EXISTS menu_items (
+            id VARCHAR(36) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            description TEXT,
+            detailed_description TEXT,
+            price VARCHAR(20) NOT NULL,
+            category VARCHAR(100) NOT NULL,
+            origin VARCHAR(255),
+            allergens TEXT,
+            additives TEXT,
+            preparation_method TEXT,
+            ingredients TEXT,
+            vegan BOOLEAN DEFAULT FALSE,
+            vegetarian BOOLEAN DEFAULT FALSE,
+            glutenfree BOOLEAN DEFAULT FALSE,
+            order_index INT DEFAULT 0,
+            is_active BOOLEAN DEFAULT TRUE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS reviews (
+            id VARCHAR(36) PRIMARY KEY,
+            customer_name VARCHAR(255) NOT NULL,
+            rating INT NOT NULL,
+            comment TEXT NOT NULL,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_approved BOOLEAN DEFAULT FALSE,
+            INDEX idx_reviews_approved (is_approved, date DESC)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id VARCHAR(36) PRIMARY KEY,
+            username VARCHAR(100) UNIQUE NOT NULL,
+            email VARCHAR(255) NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            role ENUM('admin', 'editor', 'viewer') DEFAULT 'viewer',
+            is_active BOOLEAN DEFAULT TRUE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS contact_messages (
+            id VARCHAR(36) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL,
+            phone VARCHAR(50),
+            subject VARCHAR(255),
+            message TEXT NOT NULL,
+            date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_read BOOLEAN DEFAULT FALSE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS newsletter_subscribers (
+            id VARCHAR(36) PRIMARY KEY,
+            email VARCHAR(255) UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE
+        )
+        """
+    ]),
+    (2, "CMS content store and cache versions", [
+        """
+        CREATE TABLE IF NOT EXISTS content_sections (
+            id VARCHAR(36) PRIMARY KEY,
+            page VARCHAR(50) NOT NULL,
+            section VARCHAR(50) NOT NULL,
+            content JSON NOT NULL,
+            images JSON NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            updated_by VARCHAR(50) NOT NULL,
+            version INT NOT NULL DEFAULT 1,
+            UNIQUE KEY unique_page_section (page, section)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            name VARCHAR(50) PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0
+        )
+        """,
+        # content_sections may predate the version column (mysql_schema.sql)
+        lambda cursor: add_column_if_missing(cursor, "content_sections", "version", "INT NOT NULL DEFAULT 1")
+    ]),
+    (3, "review aggregates", [
+        """
+        CREATE TABLE IF NOT EXISTS review_stats (
+            rating INT PRIMARY KEY,
+            review_count INT NOT NULL DEFAULT 0,
+            updated_at DATETIME NOT NULL
+        )
+        """,
+        """
+        REPLACE INTO review_stats (rating, review_count, updated_at)
+        SELECT rating, COUNT(*), UTC_TIMESTAMP() FROM reviews WHERE is_approved = TRUE GROUP BY rating
+        """
+    ]),
+    (4, "updated_at change tracking for differential backups", [
+        lambda cursor, table=table: add_column_if_missing(
+            cursor, table, "updated_at", "DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")
+        for table in ("menu_items", "reviews", "users", "contact_messages", "newsletter_subscribers")
+    ]),
+    (5, "backup job state shared between workers", [
+        """
+        CREATE TABLE IF NOT EXISTS backup_jobs (
+            id VARCHAR(36) PRIMARY KEY,
+            filename VARCHAR(255) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            dump_bytes BIGINT NOT NULL DEFAULT 0,
+            written_bytes BIGINT NOT NULL DEFAULT 0,
+            estimated_bytes BIGINT NOT NULL DEFAULT 0,
+            started_at DATETIME NOT NULL,
+            finished_at DATETIME NULL,
+            error TEXT NULL,
+            updated_at DATETIME NOT NULL,
+            INDEX idx_backup_jobs_filename (filename, status)
+        )
+        """
+    ]),
+    (6, "menu item images", [
+        # Uploaded image URL (or a legacy data URL), see image_store.py
+        lambda cursor: add_column_if_missing(cursor, "menu_items", "image", "LONGTEXT NULL")
+    ]),
+]
 
-# Initialize database with sample data
-def init_database():
-    conn = get_mysql_connection()
+async def add_column_if_missing(cursor, table: str, column: str, definition: str):
+    await cursor.execute("""
+        SELECT COUNT(*) AS count FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    if (await cursor.fetchone())['count'] == 0:
+        await cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+async def migrate_schema(cursor) -> int:
+    """Apply pending SCHEMA_MIGRATIONS and return the resulting schema version.
+
+    Callers hold the startup lock (see init_database).
+    """
+    await cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """)
+    await cursor.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations")
+    current = (await cursor.fetchone())['version']
+    for version, description, statements in SCHEMA_MIGRATIONS:
+        if version <= current:
+            continue
+        for statement in statements:
+            if callable(statement):
+                await statement(cursor)
+            else:
+                await cursor.execute(statement)
+        await cursor.execute("""
+            INSERT INTO schema_migrations (version, description, applied_at)
+            VALUES (%s, %s, UTC_TIMESTAMP())
+        """, (version, description))
+        print(f"✅ Applied schema migration {version}: {description}")
+        current = version
+    return current
+
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+# GET_LOCK wait (seconds) per attempt while another worker migrates
+SCHEMA_LOCK_TIMEOUT = 60
+SCHEMA_LOCK_ATTEMPTS = 3
+
+async def read_boot_state(cursor) -> Optional[dict]:
+    """Schema version and seed data presence in one round trip; None on a fresh database."""
     try:
-        cursor = conn.cursor()
-        
-        # Create tables
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS menu_items (
-                id VARCHAR(36) PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                description TEXT,
-                detailed_description TEXT,
-                price VARCHAR(20) NOT NULL,
-                category VARCHAR(100) NOT NULL,
-                origin VARCHAR(255),
-                allergens TEXT,
-                additives TEXT,
-                preparation_method TEXT,
-                ingredients TEXT,
-                vegan BOOLEAN DEFAULT FALSE,
-                vegetarian BOOLEAN DEFAULT FALSE,
-                glutenfree BOOLEAN DEFAULT FALSE,
-                order_index INT DEFAULT 0,
-                is_active BOOLEAN DEFAULT TRUE
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS reviews (
-                id VARCHAR(36) PRIMARY KEY,
-                customer_name VARCHAR(255) NOT NULL,
-                rating INT NOT NULL,
-                comment TEXT NOT NULL,
-                date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_approved BOOLEAN DEFAULT FALSE
-            )
+        await cursor.execute("""
+            SELECT (SELECT MAX(version) FROM schema_migrations) AS version,
+                   EXISTS(SELECT 1 FROM users WHERE username = 'admin') AS has_admin,
+                   EXISTS(SELECT 1 FROM menu_items) AS has_menu
         """)
+    except aiomysql.ProgrammingError:
+        return None  # schema_migrations (or a core table) does not exist yet
+    return await cursor.fetchone()
+
+async def seed_database(cursor):
+    """Run pending migrations and insert the admin user and sample menu on an empty database."""
+    await migrate_schema(cursor)
+    
+    # Check if admin user exists
+    await cursor.execute("SELECT COUNT(*) as count FROM users WHERE username = 'admin'")
+    result = await cursor.fetchone()
+    
+    if result['count'] == 0:
+        admin_hash = await get_password_hash("jimmy2024")
+        await cursor.execute("""
+            INSERT INTO users (id, username, email, password_hash, role)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (str(uuid.uuid4()), "admin", "admin@jimmys-tapasbar.de", admin_hash, "admin"))
+    
+    # Check if menu items exist
+    await cursor.execute("SELECT COUNT(*) as count FROM menu_items")
+    result = await cursor.fetchone()
+    
+    if result['count'] == 0:
+        # Add sample menu items
+        menu_items = [
+            ("Gambas al Ajillo", "Klassische spanische Knoblauchgarnelen", "Frische Garnelen in bestem Olivenöl mit viel Knoblauch, Chili und Petersilie", "12,90", "Vorspeisen", "Andalusien", "Krustentiere", "", "In der Pfanne gebraten", "Garnelen, Olivenöl, Knoblauch, Chili, Petersilie", 0, 0, 1),
+            ("Patatas Bravas", "Würzig gebratene Kartoffeln mit Aioli", "Knusprig gebratene Kartoffelwürfel mit hausgemachter Aioli und scharfer Bravas-Sauce", "8,50", "Vorspeisen", "Madrid", "Eier", "", "Frittiert und gebacken", "Kartoffeln, Tomaten, Aioli, Paprika", 0, 1, 1),
+            ("Paella Valenciana", "Original Paella mit Huhn und grünen Bohnen", "Die klassische Paella aus Valencia mit echtem Safran, Huhn und grünen Bohnen", "24,90", "Paella", "Valencia", "", "", "In der Paellera über Feuer", "Bomba-Reis, Huhn, grüne Bohnen, Safran", 0, 0, 1),
+            ("Jamón Ibérico", "Hauchdünn geschnittener iberischer Schinken", "24 Monate gereifter Jamón Ibérico serviert mit Manchego-Käse", "16,90", "Vorspeisen", "Extremadura", "Milch", "", "24 Monate luftgetrocknet", "Iberischer Schinken, Manchego", 0, 0, 1),
+            ("Sangría de la Casa", "Hausgemachte Sangría mit Früchten", "Erfrischende Sangría mit Rotwein, Orangen und Äpfeln", "6,90", "Getränke", "Spanien", "Sulfite", "", "24h ziehen lassen", "Rotwein, Orangen, Äpfel, Brandy", 1, 1, 1)
+        ]
         
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id VARCHAR(36) PRIMARY KEY,
-                username VARCHAR(100) UNIQUE NOT NULL,
-                email VARCHAR(255) NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                role ENUM('admin', 'editor', 'viewer') DEFAULT 'viewer',
-                is_active BOOLEAN DEFAULT TRUE
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS contact_messages (
-                id VARCHAR(36) PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                email VARCHAR(255) NOT NULL,
-                phone VARCHAR(50),
-                subject VARCHAR(255),
-                message TEXT NOT NULL,
-                date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_read BOOLEAN DEFAULT FALSE
-            )
-        """)
-        
-        # Check if admin user exists
-        cursor.execute("SELECT COUNT(*) as count FROM users WHERE username = 'admin'")
-        result = cursor.fetchone()
-        
-        if result['count'] == 0:
-            admin_hash = pwd_context.hash("jimmy2024")
-            cursor.execute("""
-                INSERT INTO users (id, username, email, password_hash, role)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (str(uuid.uuid4()), "admin", "admin@jimmys-tapasbar.de", admin_hash, "admin"))
+        for i, (name, desc, detailed, price, cat, origin, allergens, additives, prep, ingredients, vegan, vegetarian, gluten) in enumerate(menu_items):
+            await cursor.execute("""
+                INSERT INTO menu_items (id, name, description, detailed_description, price, category, origin, allergens, additives, preparation_method, ingredients, vegan, vegetarian, glutenfree, order_index, is_active)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (str(uuid.uuid4()), name, desc, detailed, price, cat, origin, allergens, additives, prep, ingredients, vegan, vegetarian, gluten, i+1, True))
+
+# Initialize database with sample data
+async def init_database() -> bool:
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
         
-        # Check if menu items exist
-        cursor.execute("SELECT COUNT(*) as count FROM menu_items")
-        result = cursor.fetchone()
+        # Fast path: schema current and seed data present - nothing to do
+        state = await read_boot_state(cursor)
+        if state and state['version'] == SCHEMA_VERSION and state['has_admin'] and state['has_menu']:
+            print(f"✅ MySQL schema is current (version {SCHEMA_VERSION})")
+            return True
         
-        if result['count'] == 0:
-            # Add sample menu items
-            menu_items = [
-                ("Gambas al Ajillo", "Klassische spanische Knoblauchgarnelen", "Frische Garnelen in bestem Olivenöl mit viel Knoblauch, Chili und Petersilie", "12,90", "Vorspeisen", "Andalusien", "Krustentiere", "", "In der Pfanne gebraten", "Garnelen, Olivenöl, Knoblauch, Chili, Petersilie", 0, 0, 1),
-                ("Patatas Bravas", "Würzig gebratene Kartoffeln mit Aioli", "Knusprig gebratene Kartoffelwürfel mit hausgemachter Aioli und scharfer Bravas-Sauce", "8,50", "Vorspeisen", "Madrid", "Eier", "", "Frittiert und gebacken", "Kartoffeln, Tomaten, Aioli, Paprika", 0, 1, 1),
-                ("Paella Valenciana", "Original Paella mit Huhn und grünen Bohnen", "Die klassische Paella aus Valencia mit echtem Safran, Huhn und grünen Bohnen", "24,90", "Paella", "Valencia", "", "", "In der Paellera über Feuer", "Bomba-Reis, Huhn, grüne Bohnen, Safran", 0, 0, 1),
-                ("Jamón Ibérico", "Hauchdünn geschnittener iberischer Schinken", "24 Monate gereifter Jamón Ibérico serviert mit Manchego-Käse", "16,90", "Vorspeisen", "Extremadura", "Milch", "", "24 Monate luftgetrocknet", "Iberischer Schinken, Manchego", 0, 0, 1),
-                ("Sangría de la Casa", "Hausgemachte Sangría mit Früchten", "Erfrischende Sangría mit Rotwein, Orangen und Äpfeln", "6,90", "Getränke", "Spanien", "Sulfite", "", "24h ziehen lassen", "Rotwein, Orangen, Äpfel, Brandy", 1, 1, 1)
-            ]
-            
-            for i, (name, desc, detailed, price, cat, origin, allergens, additives, prep, ingredients, vegan, vegetarian, gluten) in enumerate(menu_items):
-                cursor.execute("""
-                    INSERT INTO menu_items (id, name, description, detailed_description, price, category, origin, allergens, additives, preparation_method, ingredients, vegan, vegetarian, glutenfree, order_index, is_active)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """, (str(uuid.uuid4()), name, desc, detailed, price, cat, origin, allergens, additives, prep, ingredients, vegan, vegetarian, gluten, i+1, True))
+        # Serialize concurrent startups (several workers booting at once) so
+        # migrations run once and the seed data is not inserted twice
+        for attempt in range(1, SCHEMA_LOCK_ATTEMPTS + 1):
+            await cursor.execute("SELECT GET_LOCK('jimmys_schema_migrations', %s) AS locked", (SCHEMA_LOCK_TIMEOUT,))
+            if (await cursor.fetchone())['locked'] == 1:
+                break
+            # Still held by a slow worker; if it finished the job meanwhile we are done too
+            state = await read_boot_state(cursor)
+            if state and state['version'] == SCHEMA_VERSION and state['has_admin'] and state['has_menu']:
+                print(f"✅ MySQL schema is current (version {SCHEMA_VERSION}, migrated by another worker)")
+                return True
+            print(f"⏳ Schema migration lock busy (attempt {attempt}/{SCHEMA_LOCK_ATTEMPTS})")
+        else:
+            raise RuntimeError("Could not acquire the schema migration lock")
+        try:
+            await seed_database(cursor)
+        finally:
+            await cursor.execute("SELECT RELEASE_LOCK('jimmys_schema_migrations')")
         
-        conn.commit()
+        await conn.commit()
         print("✅ MySQL Database initialized successfully")
+        return True
         
     except Exception as e:
         print(f"❌ Database initialization failed: {e}")
+        return False
     finally:
-        conn.close()
+        mysql_pool.release(conn)
+
+# Filled in by startup_event; GET /api/health/ready reports it
+boot_state = {"ready": False, "database_initialized": False, "timings_ms": {}}
 
 @app.on_event("startup")
 async def startup_event():
-    init_database()
+    timings = boot_state["timings_ms"]
+    started = time.perf_counter()
+    step_started = started
+    
+    def mark(step: str):
+        nonlocal step_started
+        now = time.perf_counter()
+        timings[step] = round((now - step_started) * 1000, 1)
+        step_started = now
+    
+    await init_mysql_pool()
+    mark("mysql_pool")
+    boot_state["database_initialized"] = await init_database()
+    mark("init_database")
+    await cms_registry.sync(force=True)
+    mark("cms_sync")
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    boot_state["ready"] = True
+    print(f"🚀 Startup finished in {timings['total']} ms "
+          f"({', '.join(f'{step} {ms} ms' for step, ms in timings.items() if step != 'total')})")
+
+@api_router.get("/health/ready")
+async def readiness():
+    """Readiness probe: 200 once startup finished and MySQL answers, 503 otherwise"""
+    status = {**boot_state, "database": False}
+    if boot_state["ready"] and boot_state["database_initialized"]:
+        try:
+            conn = await get_mysql_connection()
+            try:
+                cursor = await conn.cursor()
+                await cursor.execute("SELECT 1")
+                status["database"] = True
+            finally:
+                mysql_pool.release(conn)
+        except Exception:
+            pass
+    return Response(content=encode_json(status), media_type="application/json",
+                    status_code=200 if status["database"] else 503, headers={"Cache-Control": "no-store"})
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_mysql_pool()
+    password_hasher.executor.shutdown(wait=False)
+    image_pipeline.executor.shutdown(wait=False)
 
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
 @api_router.get("/cms/eu-compliance")
-async def get_eu_compliance():
+async def get_eu_compliance(request: Request):
     """Get EU compliance settings"""
-    return {
-        "gdpr_enabled": True,
-        "cookie_consent_required": True,
-        "data_retention_period": 730,
-        "privacy_policy_version": "2.0",
-        "last_updated": "2024-12-19"
-    }
+    return await cms_response(request, "eu-compliance")
 
 @api_router.put("/cms/eu-compliance")
 async def update_eu_compliance(settings: dict, current_user: User = Depends(get_current_user)):
     """Update EU compliance settings"""
-    # In production, save to database
-    return {"message": "EU compliance settings updated successfully", "data": settings}
+    version = await cms_registry.save("eu-compliance", settings, current_user.username)
+    return {"message": "EU compliance settings updated successfully", "data": settings, "version": version}
 
 @api_router.get("/cms/cookie-settings")
-async def get_cookie_settings():
+async def get_cookie_settings(request: Request):
     """Get cookie management settings"""
-    return {
-        "cookieSettings": {
-            "essential_cookies": {"enabled": True, "description": "Technisch notwendige Cookies"},
-            "analytics_cookies": {"enabled": False, "description": "Analyse-Cookies"},
-            "marketing_cookies": {"enabled": False, "description": "Marketing-Cookies"}
-        },
-        "bannerSettings": {
-            "banner_title": "Diese Website verwendet Cookies",
-            "banner_text": "Wir verwenden Cookies für beste Nutzererfahrung",
-            "accept_button_text": "Alle akzeptieren"
-        }
-    }
+    return await cms_response(request, "cookie-settings")
 
 @api_router.put("/cms/cookie-settings")
 async def update_cookie_settings(settings: dict, current_user: User = Depends(get_current_user)):
     """Update cookie management settings"""
-    # In production, save to database
-    return {"message": "Cookie settings updated successfully", "data": settings}
+    version = await cms_registry.save("cookie-settings", settings, current_user.username)
+    return {"message": "Cookie settings updated successfully", "data": settings, "version": version}
 
 
 @api_router.get("/users")
 async def get_users(current_user: User = Depends(get_current_user)):
     """Get all users for admin management"""
+    conn = await get_mysql_connection()
     try:
-        conn = get_mysql_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, username, email, role, created_at, last_login FROM users")
-        users = cursor.fetchall()
-        conn.close()
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT id, username, email, role, created_at, last_login FROM users")
+        users = await cursor.fetchall()
         return users
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        mysql_pool.release(conn)
 
 @api_router.post("/users")
 async def create_user(user_data: dict, current_user: User = Depends(get_current_user)):
     """Create a new user"""
+    # Hash the password before taking a database connection from the pool
+    hashed_password = await get_password_hash(user_data["password"])
+    
+    conn = await get_mysql_connection()
     try:
-        conn = get_mysql_connection()
-        cursor = conn.cursor()
-        
-        # Hash the password
-        hashed_password = get_password_hash(user_data["password"])
-        
-        cursor.execute("""
+        cursor = await conn.cursor()
+        await cursor.execute("""
             INSERT INTO users (id, username, email, password_hash, role) 
             VALUES (%s, %s, %s, %s, %s)
         """, (
@@ -755,71 +1971,567 @@ async def create_user(user_data: dict, current_user: User = Depends(get_current_
             hashed_password,
             user_data["role"]
         ))
-        conn.commit()
-        conn.close()
+        await conn.commit()
         return {"message": "User created successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
+    finally:
+        mysql_pool.release(conn)
 
 @api_router.put("/users/{user_id}")
 async def update_user(user_id: str, user_data: dict, current_user: User = Depends(get_current_user)):
     """Update a user"""
+    hashed_password = None
+    if "password" in user_data and user_data["password"]:
+        hashed_password = await get_password_hash(user_data["password"])
+    
+    conn = await get_mysql_connection()
     try:
-        conn = get_mysql_connection()
-        cursor = conn.cursor()
+        cursor = await conn.cursor()
         
-        if "password" in user_data and user_data["password"]:
-            hashed_password = get_password_hash(user_data["password"])
-            cursor.execute("""
+        if hashed_password:
+            await cursor.execute("""
                 UPDATE users SET username=%s, email=%s, password_hash=%s, role=%s 
                 WHERE id=%s
             """, (user_data["username"], user_data["email"], hashed_password, user_data["role"], user_id))
         else:
-            cursor.execute("""
+            await cursor.execute("""
                 UPDATE users SET username=%s, email=%s, role=%s 
                 WHERE id=%s
             """, (user_data["username"], user_data["email"], user_data["role"], user_id))
         
-        conn.commit()
-        conn.close()
+        await principal_cache.invalidate(cursor, user_id)
+        await conn.commit()
         return {"message": "User updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating user: {str(e)}")
+    finally:
+        mysql_pool.release(conn)
 
 @api_router.delete("/users/{user_id}")
 async def delete_user(user_id: str, current_user: User = Depends(get_current_user)):
     """Delete a user"""
+    conn = await get_mysql_connection()
     try:
-        conn = get_mysql_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM users WHERE id=%s", (user_id,))
-        conn.commit()
-        conn.close()
+        cursor = await conn.cursor()
+        await cursor.execute("DELETE FROM users WHERE id=%s", (user_id,))
+        await principal_cache.invalidate(cursor, user_id)
+        await conn.commit()
         return {"message": "User deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting user: {str(e)}")
+    finally:
+        mysql_pool.release(conn)
+
+
+# Database backups
+# mysqldump runs as an asyncio subprocess whose stdout is gzip-compressed
+# straight to disk, so the API keeps serving while a dump is produced.
+# Each dump is tracked as a BackupJob, and downloads can follow a dump
+# that is still being written.
+BACKUP_DIR = Path(os.environ.get('BACKUP_DIR', '/app/backups'))
+BACKUP_CHUNK_SIZE = 64 * 1024
+BACKUP_SUFFIXES = (".sql", ".sql.gz")
+BACKUP_JOBS_KEPT = 50
+# Runtime state is never restored: cache versions are rebuilt after a restore, and
+# restored backup_jobs rows would bring back "running" jobs of processes long gone
+BACKUP_IGNORED_TABLES = ("cache_versions", "backup_jobs")
+
+def mysql_database() -> str:
+    return os.environ.get('MYSQL_DATABASE', 'jimmys_tapas_bar')
+
+def mysql_cli_args() -> List[str]:
+    """Connection options for the mysql/mysqldump command line tools."""
+    args = [f"--user={os.environ.get('MYSQL_USER', 'root')}"]
+    if os.path.exists(MYSQL_SOCKET):
+        args.append(f"--socket={MYSQL_SOCKET}")
+    else:
+        args += [f"--host={os.environ.get('MYSQL_HOST', 'localhost')}",
+                 f"--port={os.environ.get('MYSQL_PORT', 3306)}"]
+    return args
+
+def mysql_cli_env() -> dict:
+    # Pass the password via the environment so it never shows up in ps
+    return {**os.environ, "MYSQL_PWD": os.environ.get('MYSQL_PASSWORD', '')}
+
+def backup_path(filename: str) -> Path:
+    if os.path.basename(filename) != filename or not filename.endswith(BACKUP_SUFFIXES):
+        raise HTTPException(status_code=400, detail="Invalid backup filename")
+    return BACKUP_DIR / filename
+
+# With several uvicorn workers a job runs in one process but may be polled,
+# downloaded or blocked on (restore) through any of them, so its state is
+# mirrored into the backup_jobs table. Rows of jobs whose process stopped
+# updating them (a killed worker) count as failed after a while.
+BACKUP_JOB_PERSIST_INTERVAL = 1.0
+BACKUP_JOB_STALE_AFTER = 120
+
+class BackupJob:
+    def __init__(self, filename: str, estimated_bytes: int):
+        self.id = str(uuid.uuid4())
+        self.filename = filename
+        self.status = "running"
+        self.started_at = datetime.utcnow()
+        self.finished_at = None
+        self.dump_bytes = 0
+        self.written_bytes = 0
+        self.estimated_bytes = estimated_bytes
+        self.error = None
+        self.task = None
+        self.changed = asyncio.Condition()
+        self.remote = False  # loaded from backup_jobs, running in another worker
+        self._persisted_at = 0.0
+
+    @classmethod
+    def from_row(cls, row: dict) -> "BackupJob":
+        job = cls(row['filename'], row['estimated_bytes'])
+        job.id = row['id']
+        job.remote = True
+        job.load_row(row)
+        return job
+
+    def load_row(self, row: dict):
+        self.status = row['status']
+        self.error = row['error']
+        if self.status == "running" and row['idle_seconds'] > BACKUP_JOB_STALE_AFTER:
+            self.status = "failed"
+            self.error = "Backup worker stopped responding"
+        self.started_at = row['started_at']
+        self.finished_at = row['finished_at']
+        self.dump_bytes = row['dump_bytes']
+        self.written_bytes = row['written_bytes']
+
+    @property
+    def done(self) -> bool:
+        return self.status != "running"
+
+    async def notify(self):
+        async with self.changed:
+            self.changed.notify_all()
+        if self.done or time.monotonic() - self._persisted_at >= BACKUP_JOB_PERSIST_INTERVAL:
+            await self.persist()
+
+    async def persist(self):
+        self._persisted_at = time.monotonic()
+        try:
+            conn = await get_mysql_connection()
+            try:
+                cursor = await conn.cursor()
+                await cursor.execute("""
+                    REPLACE INTO backup_jobs (id, filename, status, dump_bytes, written_bytes,
+                                             estimated_bytes, started_at, finished_at, error, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, UTC_TIMESTAMP())
+                """, (self.id, self.filename, self.status, self.dump_bytes, self.written_bytes,
+                      self.estimated_bytes, self.started_at, self.finished_at, self.error))
+            finally:
+                mysql_pool.release(conn)
+        except Exception as e:
+            # Only other workers lose sight of the job; this one keeps tracking it
+            print(f"⚠️ Could not record backup job {self.id}: {e}")
+
+    async def wait_changed(self, timeout: float):
+        """Wait up to timeout seconds for progress."""
+        if self.remote:
+            await asyncio.sleep(timeout)
+            row = await load_backup_job_row("id = %s", (self.id,))
+            if row:
+                self.load_row(row)
+            else:
+                self.status, self.error = "failed", "Backup job disappeared"
+            return
+        async with self.changed:
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def to_dict(self) -> dict:
+        if self.status == "completed":
+            progress = 100
+        elif self.estimated_bytes:
+            # Table data sizes only approximate the SQL text size
+            progress = min(99, self.dump_bytes * 100 // self.estimated_bytes)
+        else:
+            progress = None
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "progress": progress,
+            "dump_bytes": self.dump_bytes,
+            "written_bytes": self.written_bytes,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+        }
+
+backup_jobs = OrderedDict()  # job id -> BackupJob started by this worker, oldest first
+
+def register_backup_job(job: BackupJob):
+    backup_jobs[job.id] = job
+    for job_id in list(backup_jobs):
+        if len(backup_jobs) <= BACKUP_JOBS_KEPT:
+            break
+        if backup_jobs[job_id].done:
+            del backup_jobs[job_id]
+
+BACKUP_JOB_COLUMNS = """id, filename, status, dump_bytes, written_bytes, estimated_bytes, started_at,
+    finished_at, error, TIMESTAMPDIFF(SECOND, updated_at, UTC_TIMESTAMP()) AS idle_seconds"""
+
+async def load_backup_job_row(where: str, params: tuple) -> Optional[dict]:
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        await cursor.execute(f"SELECT {BACKUP_JOB_COLUMNS} FROM backup_jobs WHERE {where} "
+                             f"ORDER BY started_at DESC LIMIT 1", params)
+        return await cursor.fetchone()
+    finally:
+        mysql_pool.release(conn)
+
+async def list_backup_jobs() -> List[BackupJob]:
+    """Recent jobs of all workers, newest first; this worker's own state wins."""
+    jobs = {}
+    try:
+        conn = await get_mysql_connection()
+        try:
+            cursor = await conn.cursor()
+            await cursor.execute(f"SELECT {BACKUP_JOB_COLUMNS} FROM backup_jobs "
+                                 f"ORDER BY started_at DESC LIMIT %s", (BACKUP_JOBS_KEPT,))
+            for row in await cursor.fetchall():
+                jobs[row['id']] = BackupJob.from_row(row)
+        finally:
+            mysql_pool.release(conn)
+    except Exception as e:
+        print(f"⚠️ Could not load backup jobs: {e}")
+    jobs.update(backup_jobs)
+    return sorted(jobs.values(), key=lambda job: job.started_at, reverse=True)
+
+async def find_backup_job(job_id: str) -> Optional[BackupJob]:
+    if job_id in backup_jobs:
+        return backup_jobs[job_id]
+    row = await load_backup_job_row("id = %s", (job_id,))
+    return BackupJob.from_row(row) if row else None
+
+async def running_backup_job(filename: str) -> Optional[BackupJob]:
+    for job in backup_jobs.values():
+        if job.filename == filename and not job.done:
+            return job
+    row = await load_backup_job_row("filename = %s AND status = 'running'", (filename,))
+    if row:
+        job = BackupJob.from_row(row)
+        if not job.done:
+            return job
+    return None
+
+async def estimate_dump_size() -> int:
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        await cursor.execute("""
+            SELECT COALESCE(SUM(data_length), 0) AS size FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE()
+        """)
+        return int((await cursor.fetchone())['size'])
+    finally:
+        mysql_pool.release(conn)
+
+class BackupWriter:
+    """Gzip-compresses SQL text into a backup file and keeps the job's counters current."""
+    def __init__(self, job: BackupJob, out):
+        self.job = job
+        self.out = out
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+
+    async def write(self, chunk: bytes):
+        self.job.dump_bytes += len(chunk)
+        data = self.compressor.compress(chunk)
+        if data:
+            self.out.write(data)
+            self.out.flush()
+            self.job.written_bytes += len(data)
+            await self.job.notify()
+
+    def close(self):
+        data = self.compressor.flush()
+        self.out.write(data)
+        self.job.written_bytes += len(data)
+
+async def write_mysqldump(writer: BackupWriter, dump_args: List[str]):
+    proc = await asyncio.create_subprocess_exec(
+        "mysqldump", *mysql_cli_args(), *dump_args,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, env=mysql_cli_env()
+    )
+    try:
+        stderr_task = asyncio.create_task(proc.stderr.read())
+        while True:
+            chunk = await proc.stdout.read(BACKUP_CHUNK_SIZE)
+            if not chunk:
+                break
+            await writer.write(chunk)
+        returncode = await proc.wait()
+        stderr = (await stderr_task).decode("utf-8", errors="replace").strip()
+        if returncode != 0:
+            raise RuntimeError(stderr or f"mysqldump exited with status {returncode}")
+    finally:
+        if proc.returncode is None:
+            proc.kill()
 
+async def run_backup_job(job: BackupJob, path: Path, produce, manifest: dict):
+    """Run produce(writer) into path, updating job as it goes.
+
+    The manifest is written next to the file only once the dump is complete,
+    so a half-written dump can never serve as the base of a differential.
+    """
+    try:
+        with open(path, "wb") as out:
+            writer = BackupWriter(job, out)
+            await produce(writer)
+            writer.close()
+        manifest_path(path).write_text(json.dumps(manifest))
+        job.status = "completed"
+    except (Exception, asyncio.CancelledError) as e:
+        job.status = "failed"
+        job.error = str(e) or type(e).__name__
+        path.unlink(missing_ok=True)
+        print(f"❌ Backup {job.filename} failed: {job.error}")
+        if isinstance(e, asyncio.CancelledError):
+            raise
+    finally:
+        job.finished_at = datetime.utcnow()
+        await job.notify()
+
+async def start_backup_job(filename: str, produce, manifest: dict, estimated_bytes: int) -> BackupJob:
+    BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+    job = BackupJob(filename, estimated_bytes)
+    register_backup_job(job)
+    # Create the file up front so a download can start following it right away
+    (BACKUP_DIR / filename).touch()
+    await job.persist()
+    job.task = asyncio.create_task(run_backup_job(job, BACKUP_DIR / filename, produce, manifest))
+    return job
+
+# Differential backups: a "full" backup is a mysqldump base snapshot, a
+# "differential" one holds every row changed since its base (REPLACE INTO)
+# plus the primary keys that still exist, so deletes replay as well.
+# Each backup file gets a <filename>.json manifest describing it.
+# The base's snapshot_at is the database's NOW(), and so are the
+# ON UPDATE CURRENT_TIMESTAMP values. Some rows (content_sections) get their
+# updated_at from the application in UTC instead, so the cutoff is moved back
+# by the session's current UTC offset, read from the database when the
+# differential is written. The margin covers a DST switch between base and
+# differential (the offset is measured now, not at the base); re-capturing a
+# row is harmless, missing one is not.
+BACKUP_CHANGE_MARGIN = timedelta(hours=1)
+BACKUP_SKIPPED_TABLES = BACKUP_IGNORED_TABLES + ("schema_migrations",)
+BACKUP_ROWS_PER_STATEMENT = 500
+
+def manifest_path(path: Path) -> Path:
+    return path.with_name(path.name + ".json")
+
+def read_backup_manifest(filename: str) -> dict:
+    try:
+        return json.loads(manifest_path(BACKUP_DIR / filename).read_text())
+    except (OSError, ValueError):
+        # Plain dumps from before manifests existed
+        return {"kind": "full"}
+
+def latest_full_backup() -> Optional[str]:
+    candidates = []
+    if BACKUP_DIR.exists():
+        for file in os.listdir(BACKUP_DIR):
+            if (file.endswith(BACKUP_SUFFIXES) and manifest_path(BACKUP_DIR / file).exists()
+                    and read_backup_manifest(file).get("kind") == "full"):
+                candidates.append(file)
+    return max(candidates) if candidates else None
+
+def restore_chain(filename: str) -> List[str]:
+    """The files to replay, in order, to restore filename: its base and every delta up to it."""
+    manifest = read_backup_manifest(filename)
+    if manifest.get("kind") != "differential":
+        return [filename]
+    base = manifest["base"]
+    if not (BACKUP_DIR / base).exists():
+        raise HTTPException(status_code=409, detail=f"Base backup {base} is missing")
+    deltas = sorted(
+        file for file in os.listdir(BACKUP_DIR)
+        if file.endswith(BACKUP_SUFFIXES) and file <= filename
+        and read_backup_manifest(file).get("base") == base
+    )
+    return [base] + deltas
+
+async def database_now(cursor) -> str:
+    await cursor.execute("SELECT NOW() AS now")
+    return (await cursor.fetchone())['now'].isoformat(sep=" ")
+
+async def differential_tables(cursor) -> List[dict]:
+    await cursor.execute("""
+        SELECT c.TABLE_NAME AS name,
+               MAX(CASE WHEN c.COLUMN_KEY = 'PRI' THEN c.COLUMN_NAME END) AS key_column,
+               SUM(c.COLUMN_KEY = 'PRI') AS key_columns,
+               SUM(c.COLUMN_NAME = 'updated_at') AS tracked
+        FROM information_schema.COLUMNS c
+        JOIN information_schema.TABLES t
+          ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+        WHERE c.TABLE_SCHEMA = DATABASE() AND t.TABLE_TYPE = 'BASE TABLE'
+        GROUP BY c.TABLE_NAME
+        ORDER BY c.TABLE_NAME
+    """)
+    return [table for table in await cursor.fetchall() if table['name'] not in BACKUP_SKIPPED_TABLES]
+
+async def write_rows(writer: BackupWriter, conn, cursor, table: str):
+    """Write the rows of the last executed (unbuffered) query as REPLACE statements."""
+    columns = None
+    while True:
+        rows = await cursor.fetchmany(BACKUP_ROWS_PER_STATEMENT)
+        if not rows:
+            break
+        if columns is None:
+            columns = list(rows[0].keys())
+            column_list = ", ".join(f"`{column}`" for column in columns)
+        values = ",\n".join(
+            "(" + ", ".join(conn.escape(row[column]) for column in columns) + ")" for row in rows
+        )
+        await writer.write(f"REPLACE INTO `{table}` ({column_list}) VALUES\n{values};\n".encode("utf-8"))
+
+async def write_key_prune(writer: BackupWriter, conn, cursor, table: str, key: str):
+    """Write statements deleting every row whose key is not in the last executed query."""
+    await writer.write(b"CREATE TEMPORARY TABLE _backup_keys (k VARCHAR(255) PRIMARY KEY);\n")
+    while True:
+        rows = await cursor.fetchmany(BACKUP_ROWS_PER_STATEMENT)
+        if not rows:
+            break
+        values = ", ".join(f"({conn.escape(str(row['k']))})" for row in rows)
+        await writer.write(f"INSERT INTO _backup_keys VALUES {values};\n".encode("utf-8"))
+    await writer.write(
+        f"DELETE FROM `{table}` WHERE `{key}` NOT IN (SELECT k FROM _backup_keys);\n"
+        "DROP TEMPORARY TABLE _backup_keys;\n".encode("utf-8")
+    )
+
+async def write_differential_dump(writer: BackupWriter, since: str):
+    """Write the rows changed since a base snapshot as a replayable SQL script."""
+    conn = await get_mysql_connection()
+    stream = None
+    try:
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT TIMESTAMPDIFF(SECOND, UTC_TIMESTAMP(), NOW()) AS utc_offset")
+        utc_offset = timedelta(seconds=max((await cursor.fetchone())['utc_offset'], 0))
+        cutoff = datetime.fromisoformat(since) - utc_offset - BACKUP_CHANGE_MARGIN
+        tables = await differential_tables(cursor)
+        # One consistent snapshot, like mysqldump --single-transaction
+        await cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        stream = await conn.cursor(aiomysql.SSDictCursor)
+        await writer.write(b"SET NAMES utf8mb4;\nSET FOREIGN_KEY_CHECKS = 0;\n")
+        for table in tables:
+            name, key = table['name'], table['key_column']
+            await writer.write(f"\n-- {name}\n".encode("utf-8"))
+            if table['key_columns'] != 1:
+                # Without a single-column key deletes cannot be tracked; copy the table
+                await writer.write(f"DELETE FROM `{name}`;\n".encode("utf-8"))
+                await stream.execute(f"SELECT * FROM `{name}`")
+                await write_rows(writer, conn, stream, name)
+                continue
+            if table['tracked']:
+                await stream.execute(f"SELECT * FROM `{name}` WHERE updated_at >= %s OR updated_at IS NULL",
+                                     (cutoff,))
+            else:
+                await stream.execute(f"SELECT * FROM `{name}`")
+            await write_rows(writer, conn, stream, name)
+            await stream.execute(f"SELECT `{key}` AS k FROM `{name}`")
+            await write_key_prune(writer, conn, stream, name, key)
+        await writer.write(b"SET FOREIGN_KEY_CHECKS = 1;\n")
+        await stream.close()
+        stream = None
+        await conn.commit()
+    except BaseException:
+        # Never hand the pool a connection with an open snapshot or unread streamed rows
+        try:
+            if stream is not None:
+                await stream.close()
+            await conn.rollback()
+        except BaseException:
+            conn.close()  # release() drops closed connections from the pool
+        raise
+    finally:
+        mysql_pool.release(conn)
+
+async def stream_backup_file(path: Path, job: Optional[BackupJob]):
+    """Yield a backup file, following it while its dump job is still writing."""
+    with open(path, "rb") as backup_file:
+        while True:
+            # Check before reading so the bytes written just before completion are not lost
+            finished = job is None or job.done
+            chunk = backup_file.read(BACKUP_CHUNK_SIZE)
+            if chunk:
+                yield chunk
+                continue
+            if finished:
+                break
+            await job.wait_changed(1)
+
+async def restore_dump(path: Path):
+    """Feed a (possibly gzip-compressed) SQL dump into the mysql client."""
+    proc = await asyncio.create_subprocess_exec(
+        "mysql", *mysql_cli_args(), mysql_database(),
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE, env=mysql_cli_env()
+    )
+    stderr_task = asyncio.create_task(proc.stderr.read())
+    decompressor = zlib.decompressobj(31) if path.name.endswith(".gz") else None
+    try:
+        with open(path, "rb") as backup_file:
+            while True:
+                chunk = backup_file.read(BACKUP_CHUNK_SIZE)
+                if not chunk:
+                    break
+                proc.stdin.write(decompressor.decompress(chunk) if decompressor else chunk)
+                await proc.stdin.drain()
+            if decompressor:
+                proc.stdin.write(decompressor.flush())
+                await proc.stdin.drain()
+        proc.stdin.close()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # mysql exited early; its stderr says why
+    returncode = await proc.wait()
+    stderr = (await stderr_task).decode("utf-8", errors="replace").strip()
+    if returncode != 0:
+        raise RuntimeError(stderr or f"mysql exited with status {returncode}")
+
+async def invalidate_all_caches():
+    """Make every worker drop its caches after the database changed underneath them."""
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor()
+        await menu_cache.invalidate(cursor)
+        await menu_category_cache.invalidate_all(cursor)
+        await review_stats_cache.invalidate(cursor)
+        await bump_cache_version(cursor, "cms")
+        await bump_cache_version(cursor, "users")
+    finally:
+        mysql_pool.release(conn)
+    principal_cache.entries.clear()
+    await cms_registry.sync(force=True)
 
 @api_router.get("/admin/backup/list")
 async def get_backup_list(current_user: User = Depends(get_current_user)):
     """Get list of available backups"""
-    import os
-    from datetime import datetime
-    
-    backup_dir = "/app/backups"
     backups = []
     
     try:
-        if os.path.exists(backup_dir):
-            for file in os.listdir(backup_dir):
-                if file.endswith(".sql"):
-                    file_path = os.path.join(backup_dir, file)
-                    stat = os.stat(file_path)
+        running = {job.filename for job in await list_backup_jobs() if not job.done}
+        if BACKUP_DIR.exists():
+            for file in os.listdir(BACKUP_DIR):
+                if file.endswith(BACKUP_SUFFIXES):
+                    stat = os.stat(BACKUP_DIR / file)
+                    job = file in running
+                    manifest = read_backup_manifest(file)
                     backups.append({
                         "filename": file,
                         "created": datetime.fromtimestamp(stat.st_ctime).isoformat(),
                         "size": stat.st_size,
-                        "type": "mysql"
+                        "type": "mysql",
+                        "kind": manifest.get("kind", "full"),
+                        "base": manifest.get("base"),
+                        "status": "running" if job else "completed"
                     })
         
         backups.sort(key=lambda x: x["created"], reverse=True)
@@ -828,46 +2540,82 @@ async def get_backup_list(current_user: User = Depends(get_current_user)):
         return []
 
 @api_router.post("/admin/backup/create")
-async def create_backup(current_user: User = Depends(get_current_user)):
-    """Create a new database backup"""
-    import subprocess
-    import os
-    from datetime import datetime
-    
+async def create_backup(mode: str = "full", current_user: User = Depends(get_current_user)):
+    """Start a full or differential database backup in the background"""
+    if mode not in ("full", "differential"):
+        raise HTTPException(status_code=400, detail="mode must be 'full' or 'differential'")
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    conn = await get_mysql_connection()
     try:
-        backup_dir = "/app/backups"
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_file = f"{backup_dir}/backup_{timestamp}.sql"
-        
-        # Create MySQL backup
-        cmd = f"mysqldump jimmys_tapas_bar > {backup_file}"
-        subprocess.run(cmd, shell=True, check=True)
-        
-        return {"message": "Backup created successfully", "filename": f"backup_{timestamp}.sql"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Backup failed: {str(e)}")
+        cursor = await conn.cursor()
+        snapshot_at = await database_now(cursor)
+    finally:
+        mysql_pool.release(conn)
+    
+    if mode == "full":
+        filename = f"backup_{timestamp}.sql.gz"
+        database = mysql_database()
+        dump_args = ["--single-transaction", "--quick",
+                     *[f"--ignore-table={database}.{table}" for table in BACKUP_IGNORED_TABLES],
+                     database]
+        job = await start_backup_job(filename, lambda writer: write_mysqldump(writer, dump_args),
+                                     {"kind": "full", "snapshot_at": snapshot_at},
+                                     await estimate_dump_size())
+    else:
+        base = latest_full_backup()
+        if base is None:
+            raise HTTPException(status_code=409, detail="Create a full backup first")
+        since = read_backup_manifest(base)["snapshot_at"]
+        filename = f"backup_{timestamp}.diff.sql.gz"
+        job = await start_backup_job(filename, lambda writer: write_differential_dump(writer, since),
+                                     {"kind": "differential", "base": base, "since": since,
+                                      "snapshot_at": snapshot_at}, 0)
+    return {"message": "Backup started", "filename": filename, "mode": mode, "job": job.to_dict()}
+
+@api_router.get("/admin/backup/jobs")
+async def get_backup_jobs(current_user: User = Depends(get_current_user)):
+    """Get recent backup jobs, newest first"""
+    return [job.to_dict() for job in await list_backup_jobs()]
+
+@api_router.get("/admin/backup/jobs/{job_id}")
+async def get_backup_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Get the status and progress of a backup job"""
+    job = await find_backup_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Backup job not found")
+    return job.to_dict()
+
+@api_router.get("/admin/backup/download/{filename}")
+async def download_backup(filename: str, current_user: User = Depends(get_current_user)):
+    """Download a backup, streaming it while it is still being produced"""
+    path = backup_path(filename)
+    job = await running_backup_job(filename)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Backup file not found")
+    media_type = "application/gzip" if filename.endswith(".gz") else "application/sql"
+    return StreamingResponse(stream_backup_file(path, job), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 @api_router.post("/admin/backup/restore")
 async def restore_backup(filename: str, current_user: User = Depends(get_current_user)):
     """Restore from backup"""
-    import subprocess
-    import os
+    path = backup_path(filename)
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Backup file not found")
+    chain = restore_chain(filename)
+    for file in chain:
+        if await running_backup_job(file):
+            raise HTTPException(status_code=409, detail=f"Backup {file} is still being created")
     
+    # Differential backups replay on top of their base, oldest first
     try:
-        backup_file = f"/app/backups/{filename}"
-        
-        if not os.path.exists(backup_file):
-            raise HTTPException(status_code=404, detail="Backup file not found")
-        
-        # Restore MySQL backup
-        cmd = f"mysql jimmys_tapas_bar < {backup_file}"
-        subprocess.run(cmd, shell=True, check=True)
-        
-        return {"message": "Backup restored successfully"}
+        for file in chain:
+            await restore_dump(BACKUP_DIR / file)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Restore failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Restore failed at {file}: {str(e)}")
+    finally:
+        await invalidate_all_caches()
+    return {"message": "Backup restored successfully", "restored": chain}
 
 @api_router.get("/admin/system/info")
 async def get_system_info(current_user: User = Depends(get_current_user)):
@@ -896,6 +2644,11 @@ async def get_system_info(current_user: User = Depends(get_current_user)):
             "diskSpace": "2.5 GB used / 10 GB available"
         }
 
+@api_router.get("/admin/system/password-hashing")
+async def get_password_hashing_metrics(current_user: User = Depends(get_current_user)):
+    """Get password hashing pool metrics"""
+    return password_hasher.metrics()
+
 @api_router.get("/admin/database/config")
 async def get_database_config(current_user: User = Depends(get_current_user)):
     """Get database configuration"""
@@ -907,3 +2660,13 @@ async def get_database_config(current_user: User = Depends(get_current_user)):
         "ssl": False,
         "charset": "utf8mb4"
     }
+
+# Routes are registered above, so include the router last
+app.include_router(api_router)
+
+# Fallback for setups without nginx in front; nginx serves these itself
+app.mount(UPLOAD_URL_PREFIX, StaticFiles(directory=UPLOAD_DIR, check_dir=False), name="uploads")
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8001)
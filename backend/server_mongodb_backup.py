@@ -1,10 +1,16 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
 import os
+import io
+import asyncio
+import json
 import logging
+import zipfile
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
@@ -14,6 +20,9 @@ import jwt
 from passlib.context import CryptContext
 import base64
 from enum import Enum
+from newsletter_sender import run_campaign, interrupted_campaign_ids, request_stop
+from newsletter_render import (NewsletterTemplateError, compile_template, verify_unsubscribe_token, is_valid_email,
+                               clean_subscriber_name)
 
 
 ROOT_DIR = Path(__file__).parent
@@ -1212,6 +1221,7 @@ async def get_newsletter_template(template_id: str, current_user: User = Depends
 @api_router.put("/admin/newsletter/templates/{template_id}")
 async def update_newsletter_template(template_id: str, template_data: dict, current_user: User = Depends(get_admin_user)):
     try:
+        compile_template(template_data.get('subject', ''), template_data.get('content', ''))
         template_data['updated_at'] = datetime.utcnow()
         template_data['updated_by'] = current_user.username
         
@@ -1224,6 +1234,8 @@ async def update_newsletter_template(template_id: str, template_data: dict, curr
             raise HTTPException(status_code=404, detail="Newsletter-Vorlage nicht gefunden")
         
         return {"message": "Newsletter-Vorlage erfolgreich aktualisiert"}
+    except NewsletterTemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Fehler beim Aktualisieren der Newsletter-Vorlage")
 
@@ -1312,7 +1324,8 @@ async def subscribe_newsletter(subscriber_data: dict):
     try:
         # Basic validation
         email = subscriber_data.get('email', '').strip().lower()
-        if not email or '@' not in email:
+        # Name and address go into mail headers later; CR/LF would inject headers
+        if not is_valid_email(email):
             raise HTTPException(status_code=400, detail="Gültige E-Mail-Adresse erforderlich")
         
         # Check if already subscribed
@@ -1323,7 +1336,7 @@ async def subscribe_newsletter(subscriber_data: dict):
         # Create new subscriber
         subscriber = NewsletterSubscriber(
             email=email,
-            name=subscriber_data.get('name', ''),
+            name=clean_subscriber_name(subscriber_data.get('name')),
             ip_address=subscriber_data.get('ip_address'),
             user_agent=subscriber_data.get('user_agent')
         )
@@ -1344,6 +1357,8 @@ async def subscribe_newsletter(subscriber_data: dict):
         
         return {"message": "Erfolgreich für Newsletter angemeldet!"}
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail="Fehler bei Newsletter-Anmeldung")
 
@@ -1367,6 +1382,18 @@ async def unsubscribe_newsletter(email_data: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail="Fehler bei Newsletter-Abmeldung")
 
+# Link from {{unsubscribe_url}} and the List-Unsubscribe header (POST = one-click)
+@api_router.api_route("/newsletter/unsubscribe/{token}", methods=["GET", "POST"])
+async def unsubscribe_newsletter_token(token: str):
+    subscriber_id = verify_unsubscribe_token(token)
+    if subscriber_id is None:
+        raise HTTPException(status_code=404, detail="Ungültiger Abmeldelink")
+    await db.newsletter_subscribers.update_one(
+        {"id": subscriber_id, "subscribed": True},
+        {"$set": {"subscribed": False, "unsubscribe_date": datetime.utcnow()}}
+    )
+    return {"message": "Erfolgreich vom Newsletter abgemeldet"}
+
 # Admin Newsletter endpoints
 @api_router.get("/admin/newsletter/subscribers")
 async def get_newsletter_subscribers(current_user: User = Depends(get_admin_user)):
@@ -1459,9 +1486,13 @@ async def create_newsletter_template(template_data: dict, current_user: User = D
             content=template_data.get('content', ''),
             created_by=current_user.username
         )
+        # Placeholders are checked here so a campaign cannot fail on them later
+        compile_template(template.subject, template.content)
         
         await db.newsletter_templates.insert_one(template.dict())
         return {"message": "Newsletter-Vorlage erfolgreich erstellt", "template": template.dict()}
+    except NewsletterTemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Fehler beim Erstellen der Newsletter-Vorlage")
 
@@ -1492,11 +1523,85 @@ async def create_newsletter_campaign(campaign_data: dict, current_user: User = D
             created_by=current_user.username
         )
         
+        compile_template(campaign.subject, campaign.content)
+        
         await db.newsletter_campaigns.insert_one(campaign.dict())
         return {"message": "Newsletter-Kampagne erfolgreich erstellt", "campaign": campaign.dict()}
+    except NewsletterTemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Fehler beim Erstellen der Newsletter-Kampagne")
 
+# Campaign delivery runs in the background (newsletter_sender.py); progress,
+# stats and the resume checkpoint are kept on the campaign document
+# campaign_id -> running task, or None while a /send request is still checking
+campaign_tasks = {}
+
+def campaign_task_done(campaign_id: str, task: asyncio.Task):
+    # A newer task may have taken the slot already
+    if campaign_tasks.get(campaign_id) is task:
+        del campaign_tasks[campaign_id]
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Newsletter campaign {campaign_id} failed: {task.exception()}")
+
+def start_campaign_task(campaign_id: str, resume: bool = False) -> asyncio.Task:
+    task = asyncio.create_task(run_campaign(db, campaign_id, resume))
+    campaign_tasks[campaign_id] = task
+    task.add_done_callback(lambda done: campaign_task_done(campaign_id, done))
+    return task
+
+@api_router.post("/admin/newsletter/campaigns/{campaign_id}/send")
+async def send_newsletter_campaign(campaign_id: str, current_user: User = Depends(get_admin_user)):
+    # Reserve the slot before the first await, so a concurrent request sees it
+    if campaign_id in campaign_tasks:
+        raise HTTPException(status_code=409, detail="Newsletter-Kampagne wird bereits versendet")
+    campaign_tasks[campaign_id] = None
+    try:
+        campaign = await db.newsletter_campaigns.find_one({"id": campaign_id}, {"status": 1, "lease_until": 1})
+        if not campaign:
+            raise HTTPException(status_code=404, detail="Newsletter-Kampagne nicht gefunden")
+        if campaign["status"] == "sent":
+            raise HTTPException(status_code=409, detail="Newsletter-Kampagne wurde bereits versendet")
+        lease_until = campaign.get("lease_until")
+        if campaign["status"] == "sending" and lease_until and lease_until > datetime.utcnow():
+            raise HTTPException(status_code=409, detail="Newsletter-Kampagne wird bereits versendet")
+        if not await db.smtp_config.find_one({"from_email": {"$nin": [None, ""]}}, {"_id": 1}):
+            raise HTTPException(status_code=400, detail="Bitte zuerst die SMTP-Konfiguration speichern")
+    except BaseException:
+        campaign_tasks.pop(campaign_id, None)
+        raise
+    start_campaign_task(campaign_id)
+    return {"message": "Versand der Newsletter-Kampagne gestartet", "campaign_id": campaign_id}
+
+@api_router.post("/admin/newsletter/campaigns/{campaign_id}/stop")
+async def stop_newsletter_campaign(campaign_id: str, current_user: User = Depends(get_admin_user)):
+    # Not cancelled mid-batch: the run, in whichever worker, stops once its current batch
+    # is checkpointed. "stopped" is not resumed automatically; sending again continues
+    # after the checkpoint
+    outcome = await request_stop(db, campaign_id)
+    if outcome is None:
+        raise HTTPException(status_code=409, detail="Newsletter-Kampagne wird nicht versendet")
+    if outcome == "stopping":
+        return {"message": "Versand der Newsletter-Kampagne wird nach dem laufenden Block angehalten",
+                "status": "stopping"}
+    return {"message": "Versand der Newsletter-Kampagne angehalten", "status": "stopped"}
+
+@api_router.get("/admin/newsletter/campaigns/{campaign_id}/deliveries")
+async def get_newsletter_deliveries(campaign_id: str, current_user: User = Depends(get_admin_user)):
+    campaign = await db.newsletter_campaigns.find_one(
+        {"id": campaign_id}, {"_id": 0, "status": 1, "recipients_count": 1, "sent_count": 1, "stats": 1, "error": 1})
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Newsletter-Kampagne nicht gefunden")
+    counts = {row["_id"]: row["count"] async for row in db.newsletter_deliveries.aggregate([
+        {"$match": {"campaign_id": campaign_id}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+    ])}
+    failed = []
+    async for delivery in db.newsletter_deliveries.find(
+            {"campaign_id": campaign_id, "status": "failed"}, {"_id": 0, "email": 1, "error": 1, "attempts": 1}).limit(100):
+        failed.append(delivery)
+    return {**campaign, "deliveries": counts, "failed": failed}
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -1511,75 +1616,107 @@ app.add_middleware(
 async def options_route(path: str):
     return {"detail": "OK"}
 
+# Backups are streamed: documents are read from MongoDB in batches and
+# encoded one at a time straight into the response (or a zip stream), so
+# memory use stays flat no matter how large the collections - and the image
+# data URLs stored in them - get.
+BACKUP_BATCH_SIZE = 200
+BACKUP_CHUNK_SIZE = 64 * 1024
+
+class BackupJSONEncoder(json.JSONEncoder):
+    """JSON encoder for MongoDB documents (datetime and ObjectId at any depth)"""
+    def default(self, obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        return super().default(obj)
+
+backup_encoder = BackupJSONEncoder(ensure_ascii=False)
+
+async def iter_backup_json(collections: List[str], backup_info: dict):
+    """Yield a database export as UTF-8 JSON chunks.
+
+    backup_info is emitted last so it can carry the final document count;
+    total_documents is also stored back into backup_info for the caller.
+    """
+    total_documents = 0
+    parts = ['{"data": {']
+    size = len(parts[0])
+    for index, collection_name in enumerate(collections):
+        parts.append(("," if index else "") + f"\n{backup_encoder.encode(collection_name)}: [")
+        first = True
+        async for doc in db[collection_name].find({}).batch_size(BACKUP_BATCH_SIZE):
+            encoded = ("" if first else ",") + "\n" + backup_encoder.encode(doc)
+            first = False
+            total_documents += 1
+            parts.append(encoded)
+            size += len(encoded)
+            if size >= BACKUP_CHUNK_SIZE:
+                yield "".join(parts).encode("utf-8")
+                parts, size = [], 0
+        parts.append("]")
+    backup_info["total_documents"] = total_documents
+    parts.append(f'\n}}, "backup_info": {backup_encoder.encode(backup_info)}}}\n')
+    yield "".join(parts).encode("utf-8")
+
+class ZipStreamBuffer(io.RawIOBase):
+    """Unseekable sink for zipfile; the bytes written so far are taken with drain()"""
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+async def save_backup_metadata(metadata: dict):
+    # Store in database for backup list
+    await db["system_backups"].insert_one(metadata)
+
 @api_router.post("/admin/backup/database")
 async def create_database_backup(current_user: User = Depends(get_admin_user)):
     """Create and download database backup"""
     try:
-        import json
-        from datetime import datetime
-        from bson import ObjectId
-        
-        # Custom JSON encoder for datetime and ObjectId
-        class CustomJSONEncoder(json.JSONEncoder):
-            def default(self, obj):
-                if isinstance(obj, datetime):
-                    return obj.isoformat()
-                if isinstance(obj, ObjectId):
-                    return str(obj)
-                return super().default(obj)
-        
         # Get all collections
         collections = await db.list_collection_names()
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        backup_data = {
-            "backup_info": {
-                "created_at": datetime.now().isoformat(),
-                "created_by": current_user.username,
-                "version": "1.0",
-                "type": "database",
-                "collections_count": len(collections)
-            },
-            "data": {}
-        }
-        
-        total_documents = 0
-        # Export each collection
-        for collection_name in collections:
-            collection = db[collection_name]
-            documents = await collection.find({}).to_list(length=None)
-            
-            # Convert ObjectId and datetime objects for JSON serialization
-            serialized_documents = []
-            for doc in documents:
-                serialized_doc = {}
-                for key, value in doc.items():
-                    if isinstance(value, ObjectId):
-                        serialized_doc[key] = str(value)
-                    elif isinstance(value, datetime):
-                        serialized_doc[key] = value.isoformat()
-                    elif isinstance(value, dict):
-                        serialized_doc[key] = convert_nested_datetime(value)
-                    elif isinstance(value, list):
-                        serialized_doc[key] = convert_list_datetime(value)
-                    else:
-                        serialized_doc[key] = value
-                
-                serialized_documents.append(serialized_doc)
-            
-            backup_data["data"][collection_name] = serialized_documents
-            total_documents += len(serialized_documents)
-        
-        backup_data["backup_info"]["total_documents"] = total_documents
-        
-        # Create JSON backup with custom encoder
-        backup_json = json.dumps(backup_data, indent=2, ensure_ascii=False, cls=CustomJSONEncoder)
-        backup_size = len(backup_json.encode('utf-8'))
-        
-        # Save backup metadata
-        filename = f"database-backup-{timestamp}.json"
-        backup_metadata = {
-            "id": f"db_{timestamp}",
+    except Exception as e:
+        print(f"Database backup error details: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Backup creation failed: {str(e)}")
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"database-backup-{timestamp}.json"
+    backup_id = f"db_{timestamp}"
+    backup_info = {
+        "created_at": datetime.now().isoformat(),
+        "created_by": current_user.username,
+        "version": "1.0",
+        "type": "database",
+        "collections_count": len(collections)
+    }
+    
+    async def generate():
+        backup_size = 0
+        try:
+            async for chunk in iter_backup_json(collections, backup_info):
+                backup_size += len(chunk)
+                yield chunk
+        except Exception as e:
+            # Headers are already sent; the client sees a truncated download
+            print(f"Database backup error details: {str(e)}")
+            raise
+        await save_backup_metadata({
+            "id": backup_id,
             "filename": filename,
             "type": "database",
             "created_at": datetime.now(),
@@ -1587,64 +1724,19 @@ async def create_database_backup(current_user: User = Depends(get_admin_user)):
             "size_bytes": backup_size,
             "size_human": format_bytes(backup_size),
             "collections_count": len(collections),
-            "total_documents": total_documents,
+            "total_documents": backup_info["total_documents"],
             "includes_media": False
-        }
-        
-        # Store in database for backup list
-        backups_collection = db["system_backups"]
-        await backups_collection.insert_one(backup_metadata)
-        
-        # Return as downloadable file
-        from fastapi.responses import Response
-        
-        return Response(
-            content=backup_json,
-            media_type="application/json",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}",
-                "X-Backup-ID": backup_metadata["id"],
-                "X-Backup-Size": str(backup_size)
-            }
-        )
-        
-    except Exception as e:
-        print(f"Database backup error details: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Backup creation failed: {str(e)}")
-
-def convert_nested_datetime(data):
-    """Convert datetime objects in nested dictionaries"""
-    if not isinstance(data, dict):
-        return data
+        })
     
-    result = {}
-    for key, value in data.items():
-        if isinstance(value, datetime):
-            result[key] = value.isoformat()
-        elif isinstance(value, dict):
-            result[key] = convert_nested_datetime(value)
-        elif isinstance(value, list):
-            result[key] = convert_list_datetime(value)
-        else:
-            result[key] = value
-    return result
-
-def convert_list_datetime(data):
-    """Convert datetime objects in lists"""
-    if not isinstance(data, list):
-        return data
-    
-    result = []
-    for item in data:
-        if isinstance(item, datetime):
-            result.append(item.isoformat())
-        elif isinstance(item, dict):
-            result.append(convert_nested_datetime(item))
-        elif isinstance(item, list):
-            result.append(convert_list_datetime(item))
-        else:
-            result.append(item)
-    return result
+    # Return as downloadable file
+    return StreamingResponse(
+        generate(),
+        media_type="application/json",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Backup-ID": backup_id
+        }
+    )
 
 def format_bytes(size):
     """Convert bytes to human readable format"""
@@ -1654,82 +1746,14 @@ def format_bytes(size):
         size /= 1024.0
     return f"{size:.1f} PB"
 
-@api_router.post("/admin/backup/full")
-async def create_full_backup(current_user: User = Depends(get_admin_user)):
-    """Create and download full backup (database + files)"""
-    try:
-        import json
-        import zipfile
-        import io
-        from datetime import datetime
-        from bson import ObjectId
-        
-        # Custom JSON encoder for datetime and ObjectId
-        class CustomJSONEncoder(json.JSONEncoder):
-            def default(self, obj):
-                if isinstance(obj, datetime):
-                    return obj.isoformat()
-                if isinstance(obj, ObjectId):
-                    return str(obj)
-                return super().default(obj)
-        
-        # Create in-memory zip file
-        zip_buffer = io.BytesIO()
-        
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            # Add database backup
-            collections = await db.list_collection_names()
-            backup_data = {
-                "backup_info": {
-                    "created_at": datetime.now().isoformat(),
-                    "created_by": current_user.username,
-                    "version": "1.0",
-                    "type": "full",
-                    "collections_count": len(collections)
-                },
-                "data": {}
-            }
-            
-            total_documents = 0
-            for collection_name in collections:
-                collection = db[collection_name]
-                documents = await collection.find({}).to_list(length=None)
-                
-                # Convert ObjectId and datetime objects for JSON serialization
-                serialized_documents = []
-                for doc in documents:
-                    serialized_doc = {}
-                    for key, value in doc.items():
-                        if isinstance(value, ObjectId):
-                            serialized_doc[key] = str(value)
-                        elif isinstance(value, datetime):
-                            serialized_doc[key] = value.isoformat()
-                        elif isinstance(value, dict):
-                            serialized_doc[key] = convert_nested_datetime(value)
-                        elif isinstance(value, list):
-                            serialized_doc[key] = convert_list_datetime(value)
-                        else:
-                            serialized_doc[key] = value
-                    
-                    serialized_documents.append(serialized_doc)
-                
-                backup_data["data"][collection_name] = serialized_documents
-                total_documents += len(serialized_documents)
-            
-            backup_data["backup_info"]["total_documents"] = total_documents
-            
-            # Add database.json to zip
-            database_json = json.dumps(backup_data, indent=2, ensure_ascii=False, cls=CustomJSONEncoder)
-            zip_file.writestr("database.json", database_json)
-            
-            # Add a detailed readme file
-            readme_content = f"""Jimmy's Tapas Bar - Vollständiges System-Backup
+def full_backup_readme(username: str, collections_count: int, total_documents: int) -> str:
+    return f"""Jimmy's Tapas Bar - Vollständiges System-Backup
 
 === BACKUP-INFORMATIONEN ===
 Typ: Vollständiges Backup (Datenbank + Medien)
 Erstellt am: {datetime.now().strftime('%d.%m.%Y um %H:%M:%S')}
-Erstellt von: {current_user.username}
-Collections: {len(collections)}
+Erstellt von: {username}
+Collections: {collections_count}
 Dokumente: {total_documents}
 
 === INHALT ===
@@ -1763,28 +1787,64 @@ Bei Problemen mit der Wiederherstellung wenden Sie sich an:
 
 Erstellt mit Jimmy's Tapas Bar CMS v1.0
 """
-            zip_file.writestr("README.txt", readme_content)
-            
-            # Add system configuration info
-            system_info = {
-                "backup_created": datetime.now().isoformat(),
-                "cms_version": "1.0",
-                "collections": list(collections),
-                "total_documents": total_documents,
-                "created_by": current_user.username
-            }
-            zip_file.writestr("system_info.json", json.dumps(system_info, indent=2))
-        
-        zip_buffer.seek(0)
-        zip_content = zip_buffer.getvalue()
-        zip_size = len(zip_content)
-        
-        # Save backup metadata
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"full-backup-{timestamp}.zip"
-        
-        backup_metadata = {
-            "id": f"full_{timestamp}",
+
+@api_router.post("/admin/backup/full")
+async def create_full_backup(current_user: User = Depends(get_admin_user)):
+    """Create and download full backup (database + files)"""
+    try:
+        collections = await db.list_collection_names()
+    except Exception as e:
+        print(f"Full backup error details: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Full backup creation failed: {str(e)}")
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"full-backup-{timestamp}.zip"
+    backup_id = f"full_{timestamp}"
+    backup_info = {
+        "created_at": datetime.now().isoformat(),
+        "created_by": current_user.username,
+        "version": "1.0",
+        "type": "full",
+        "collections_count": len(collections)
+    }
+    
+    async def generate():
+        zip_size = 0
+        buffer = ZipStreamBuffer()
+        try:
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                # Add database backup; force_zip64 because the final size is not known up front
+                with zip_file.open("database.json", "w", force_zip64=True) as entry:
+                    async for chunk in iter_backup_json(collections, backup_info):
+                        entry.write(chunk)
+                        if buffer.size >= BACKUP_CHUNK_SIZE:
+                            data = buffer.drain()
+                            zip_size += len(data)
+                            yield data
+                
+                total_documents = backup_info["total_documents"]
+                zip_file.writestr("README.txt", full_backup_readme(
+                    current_user.username, len(collections), total_documents))
+                
+                # Add system configuration info
+                system_info = {
+                    "backup_created": datetime.now().isoformat(),
+                    "cms_version": "1.0",
+                    "collections": list(collections),
+                    "total_documents": total_documents,
+                    "created_by": current_user.username
+                }
+                zip_file.writestr("system_info.json", json.dumps(system_info, indent=2))
+            data = buffer.drain()
+            zip_size += len(data)
+            yield data
+        except Exception as e:
+            # Headers are already sent; the client sees a truncated download
+            print(f"Full backup error details: {str(e)}")
+            raise
+        
+        await save_backup_metadata({
+            "id": backup_id,
             "filename": filename,
             "type": "full",
             "created_at": datetime.now(),
@@ -1794,28 +1854,17 @@ Erstellt mit Jimmy's Tapas Bar CMS v1.0
             "collections_count": len(collections),
             "total_documents": total_documents,
             "includes_media": True
+        })
+    
+    # Return as downloadable zip file
+    return StreamingResponse(
+        generate(),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "X-Backup-ID": backup_id
         }
-        
-        # Store in database for backup list
-        backups_collection = db["system_backups"]
-        await backups_collection.insert_one(backup_metadata)
-        
-        # Return as downloadable zip file
-        from fastapi.responses import Response
-        
-        return Response(
-            content=zip_content,
-            media_type="application/zip",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}",
-                "X-Backup-ID": backup_metadata["id"],
-                "X-Backup-Size": str(zip_size)
-            }
-        )
-        
-    except Exception as e:
-        print(f"Full backup error details: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Full backup creation failed: {str(e)}")
+    )
 
 @api_router.get("/admin/backup/list")
 async def get_backup_list(current_user: User = Depends(get_admin_user)):
@@ -1997,7 +2046,17 @@ logger = logging.getLogger(__name__)
 @app.on_event("startup")
 async def startup_event():
     await create_default_admin()
+    # Pick up campaigns whose sending process died mid-way
+    for campaign_id in await interrupted_campaign_ids(db):
+        if campaign_id in campaign_tasks:
+            continue
+        logger.info(f"Resuming newsletter campaign {campaign_id}")
+        start_campaign_task(campaign_id, resume=True)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    tasks = [task for task in campaign_tasks.values() if task is not None]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
     client.close()
@@ -1,8 +1,10 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.staticfiles import StaticFiles
 import aiomysql
+import asyncio
 import os
 import logging
 from pathlib import Path
@@ -15,6 +17,9 @@ from passlib.context import CryptContext
 import base64
 import json
 from enum import Enum
+from bulk_ops import BulkIds, BULK_MAX_IDS, unique_ids, lock_rows, execute_for_ids, bulk_result
+from image_store import (ImageStoreError, UPLOAD_DIR, UPLOAD_URL_PREFIX, save_upload, store_image_bytes,
+                         image_pipeline, srcset_fields)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -118,7 +123,9 @@ class MenuItem(BaseModel):
     description: str
     price: str
     category: str
-    image: Optional[str] = None  # Base64 encoded
+    image: Optional[str] = None  # /api/uploads/... URL from the image store
+    image_srcset: Optional[str] = None  # Derived widths, filled in for responses
+    image_webp_srcset: Optional[str] = None
     details: Optional[str] = None
     vegan: bool = False
     vegetarian: bool = False
@@ -443,7 +450,7 @@ async def get_menu_items():
         cursor = await conn.cursor(aiomysql.DictCursor)
         await cursor.execute("SELECT * FROM menu_items WHERE is_active = TRUE ORDER BY order_index ASC, name ASC")
         items = await cursor.fetchall()
-        return [MenuItem(**item) for item in items]
+        return [MenuItem(**item, **srcset_fields(item.get("image"))) for item in items]
     finally:
         mysql_pool.release(conn)
 
@@ -560,28 +567,192 @@ async def mark_message_read(message_id: str, current_user: User = Depends(get_ed
     finally:
         mysql_pool.release(conn)
 
-# Maintenance Mode routes
-@api_router.get("/maintenance", response_model=MaintenanceMode)
-async def get_maintenance_status():
+# Bulk admin routes: one transaction and one IN (...) statement per chunk,
+# with a result for every requested id
+def bulk_request_ids(body: BulkIds) -> list:
+    ids = unique_ids(body.ids)
+    if not ids:
+        raise HTTPException(status_code=400, detail="No ids given")
+    if len(ids) > BULK_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_IDS} ids per request")
+    return ids
+
+@api_router.post("/admin/menu/items/bulk-delete")
+async def bulk_delete_menu_items(body: BulkIds, current_user: User = Depends(get_editor_user)):
+    ids = bulk_request_ids(body)
     conn = await get_mysql_connection()
     try:
+        await conn.begin()
         cursor = await conn.cursor(aiomysql.DictCursor)
-        await cursor.execute("SELECT * FROM maintenance_mode LIMIT 1")
-        maintenance = await cursor.fetchone()
-        
-        if not maintenance:
-            # Create default maintenance mode
-            default_maintenance = MaintenanceMode()
-            await cursor.execute("""
-                INSERT INTO maintenance_mode (id, is_active, message)
-                VALUES (%s, %s, %s)
-            """, (str(uuid.uuid4()), default_maintenance.is_active, default_maintenance.message))
-            return default_maintenance
-        
-        return MaintenanceMode(**maintenance)
+        found = await lock_rows(cursor, "menu_items", "is_active", ids)
+        active = [item_id for item_id, item in found.items() if item['is_active']]
+        # Soft delete, like delete_menu_item
+        await execute_for_ids(cursor, "UPDATE menu_items SET is_active = FALSE, updated_at = %s WHERE id IN ({ids})",
+                              active, (datetime.utcnow(),))
+        await conn.commit()
+        return bulk_result({
+            item_id: "not_found" if item_id not in found else
+            "deleted" if found[item_id]['is_active'] else "already_deleted"
+            for item_id in ids})
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.post("/admin/reviews/bulk-approve")
+async def bulk_approve_reviews(body: BulkIds, current_user: User = Depends(get_editor_user)):
+    ids = bulk_request_ids(body)
+    conn = await get_mysql_connection()
+    try:
+        await conn.begin()
+        cursor = await conn.cursor(aiomysql.DictCursor)
+        found = await lock_rows(cursor, "reviews", "is_approved", ids)
+        pending = [review_id for review_id, review in found.items() if not review['is_approved']]
+        await execute_for_ids(cursor, """
+            UPDATE reviews SET is_approved = TRUE, approved_by = %s, approved_at = %s WHERE id IN ({ids})
+        """, pending, (current_user.username, datetime.utcnow()))
+        await conn.commit()
+        return bulk_result({
+            review_id: "not_found" if review_id not in found else
+            "already_approved" if found[review_id]['is_approved'] else "approved"
+            for review_id in ids})
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.post("/admin/reviews/bulk-delete")
+async def bulk_delete_reviews(body: BulkIds, current_user: User = Depends(get_editor_user)):
+    ids = bulk_request_ids(body)
+    conn = await get_mysql_connection()
+    try:
+        await conn.begin()
+        cursor = await conn.cursor(aiomysql.DictCursor)
+        found = await lock_rows(cursor, "reviews", "is_approved", ids)
+        await execute_for_ids(cursor, "DELETE FROM reviews WHERE id IN ({ids})", list(found))
+        await conn.commit()
+        return bulk_result({review_id: "deleted" if review_id in found else "not_found" for review_id in ids})
+    except Exception:
+        await conn.rollback()
+        raise
     finally:
         mysql_pool.release(conn)
 
+@api_router.post("/admin/contact/bulk-read")
+async def bulk_mark_messages_read(body: BulkIds, current_user: User = Depends(get_editor_user)):
+    ids = bulk_request_ids(body)
+    conn = await get_mysql_connection()
+    try:
+        await conn.begin()
+        cursor = await conn.cursor(aiomysql.DictCursor)
+        found = await lock_rows(cursor, "contact_messages", "is_read", ids)
+        unread = [message_id for message_id, message in found.items() if not message['is_read']]
+        await execute_for_ids(cursor, "UPDATE contact_messages SET is_read = TRUE WHERE id IN ({ids})", unread)
+        await conn.commit()
+        return bulk_result({
+            message_id: "not_found" if message_id not in found else
+            "already_read" if found[message_id]['is_read'] else "marked_read"
+            for message_id in ids})
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        mysql_pool.release(conn)
+
+@api_router.post("/admin/contact/bulk-delete")
+async def bulk_delete_messages(body: BulkIds, current_user: User = Depends(get_editor_user)):
+    ids = bulk_request_ids(body)
+    conn = await get_mysql_connection()
+    try:
+        await conn.begin()
+        cursor = await conn.cursor(aiomysql.DictCursor)
+        found = await lock_rows(cursor, "contact_messages", "is_read", ids)
+        await execute_for_ids(cursor, "DELETE FROM contact_messages WHERE id IN ({ids})", list(found))
+        await conn.commit()
+        return bulk_result({message_id: "deleted" if message_id in found else "not_found" for message_id in ids})
+    except Exception:
+        await conn.rollback()
+        raise
+    finally:
+        mysql_pool.release(conn)
+
+# Maintenance mode: the flag lives in memory and is checked by a middleware
+# on every request, so public requests never wait on MySQL for it. It is
+# updated directly by update_maintenance_mode and re-read in the background
+# so that other worker processes pick up a change within a few seconds.
+MAINTENANCE_REFRESH_INTERVAL = float(os.environ.get('MAINTENANCE_REFRESH_INTERVAL', 5))
+# Still served during maintenance: login, admin API and the status endpoint itself
+MAINTENANCE_EXEMPT_PREFIXES = ("/api/auth/", "/api/admin/", "/api/maintenance")
+
+class MaintenanceState:
+    def __init__(self):
+        self.refresh_task = None
+        self.set(MaintenanceMode())
+
+    def set(self, mode: MaintenanceMode):
+        self.mode = mode
+        self.active = mode.is_active
+        # Pre-rendered once per change, not per blocked request
+        self.body = json.dumps({"detail": mode.message, "maintenance": True}).encode("utf-8")
+
+    async def load(self):
+        conn = await get_mysql_connection()
+        try:
+            cursor = await conn.cursor(aiomysql.DictCursor)
+            await cursor.execute("SELECT is_active, message, activated_by, activated_at FROM maintenance_mode LIMIT 1")
+            maintenance = await cursor.fetchone()
+            
+            if not maintenance:
+                # Create default maintenance mode
+                default_maintenance = MaintenanceMode()
+                await cursor.execute("""
+                    INSERT INTO maintenance_mode (id, is_active, message)
+                    VALUES (%s, %s, %s)
+                """, (str(uuid.uuid4()), default_maintenance.is_active, default_maintenance.message))
+                self.set(default_maintenance)
+            else:
+                self.set(MaintenanceMode(**maintenance))
+        finally:
+            mysql_pool.release(conn)
+
+    async def refresh_forever(self):
+        while True:
+            await asyncio.sleep(MAINTENANCE_REFRESH_INTERVAL)
+            try:
+                await self.load()
+            except Exception as e:
+                print(f"Could not refresh maintenance mode: {e}")
+
+maintenance_state = MaintenanceState()
+
+def has_valid_token(request: Request) -> bool:
+    """A signed, unexpired access token; the route still loads and checks the user."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub") is not None
+    except jwt.PyJWTError:
+        return False
+
+@app.middleware("http")
+async def maintenance_middleware(request: Request, call_next):
+    if maintenance_state.active:
+        path = request.url.path
+        # Requests with a valid token come from the CMS and may preview the site
+        if (path.startswith("/api/") and not path.startswith(MAINTENANCE_EXEMPT_PREFIXES)
+                and request.method != "OPTIONS" and not has_valid_token(request)):
+            return Response(content=maintenance_state.body, status_code=503, media_type="application/json",
+                            headers={"Retry-After": "300", "Cache-Control": "no-store"})
+    return await call_next(request)
+
+# Maintenance Mode routes
+@api_router.get("/maintenance", response_model=MaintenanceMode)
+async def get_maintenance_status():
+    return maintenance_state.mode
+
 @api_router.put("/admin/maintenance", response_model=MaintenanceMode)
 async def update_maintenance_mode(
     maintenance_data: MaintenanceMode, 
@@ -613,6 +784,7 @@ async def update_maintenance_mode(
             """, (maintenance_data.is_active, maintenance_data.message,
                   maintenance_data.activated_by, maintenance_data.activated_at))
         
+        maintenance_state.set(maintenance_data)
         return maintenance_data
     finally:
         mysql_pool.release(conn)
@@ -623,14 +795,47 @@ async def upload_image(
     file: UploadFile = File(...),
     current_user: User = Depends(get_editor_user)
 ):
-    # Read file content and convert to base64
-    file_content = await file.read()
-    base64_content = base64.b64encode(file_content).decode('utf-8')
-    
-    # Create data URL
-    data_url = f"data:{file.content_type};base64,{base64_content}"
-    
-    return {"image_url": data_url, "filename": file.filename}
+    try:
+        stored = await save_upload(file)
+    except ImageStoreError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    # Derivatives are built in the image pool; waiting here means the URL
+    # already has its srcset when the editor saves it into a menu item
+    variants = await image_pipeline.build(stored["image_url"])
+    return {**stored, "filename": file.filename, "variants": variants}
+
+@api_router.post("/admin/images/externalize")
+async def externalize_menu_images(current_user: User = Depends(get_admin_user)):
+    """Move base64 data URLs left in menu_items.image into the image store."""
+    conn = await get_mysql_connection()
+    try:
+        cursor = await conn.cursor(aiomysql.DictCursor)
+        await cursor.execute("SELECT id FROM menu_items WHERE image LIKE 'data:%%'")
+        item_ids = [row["id"] for row in await cursor.fetchall()]
+        converted, failed, saved_bytes = 0, [], 0
+        # One row at a time, a single data URL can be several megabytes
+        for item_id in item_ids:
+            await cursor.execute("SELECT image FROM menu_items WHERE id = %s", (item_id,))
+            row = await cursor.fetchone()
+            data_url = row["image"] if row else None
+            if not data_url or not data_url.startswith("data:"):
+                continue
+            try:
+                header, encoded = data_url.split(",", 1)
+                if not header.endswith(";base64"):
+                    raise ValueError("Not a base64 data URL")
+                stored = await asyncio.to_thread(store_image_bytes, base64.b64decode(encoded))
+            except ValueError as e:  # includes ImageStoreError and binascii.Error
+                failed.append({"id": item_id, "error": str(e)})
+                continue
+            await cursor.execute("UPDATE menu_items SET image = %s, updated_at = %s WHERE id = %s",
+                                 (stored["image_url"], datetime.utcnow(), item_id))
+            image_pipeline.ensure(stored["sha256"], Path(stored["image_url"]).suffix)
+            converted += 1
+            saved_bytes += len(data_url) - len(stored["image_url"])
+        return {"converted": converted, "failed": failed, "saved": format_bytes(saved_bytes)}
+    finally:
+        mysql_pool.release(conn)
 
 # Helper function for byte formatting
 def format_bytes(bytes_count):
@@ -658,16 +863,27 @@ async def options_route(path: str):
 # Include the API router
 app.include_router(api_router)
 
+# Fallback for setups without nginx in front; nginx serves these itself
+app.mount(UPLOAD_URL_PREFIX, StaticFiles(directory=UPLOAD_DIR, check_dir=False), name="uploads")
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     await init_mysql_pool()
     await create_default_admin()
+    try:
+        await maintenance_state.load()
+    except Exception as e:
+        print(f"Could not load maintenance mode: {e}")
+    maintenance_state.refresh_task = asyncio.create_task(maintenance_state.refresh_forever())
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     global mysql_pool
+    if maintenance_state.refresh_task:
+        maintenance_state.refresh_task.cancel()
+    image_pipeline.executor.shutdown(wait=False)
     if mysql_pool:
         mysql_pool.close()
         await mysql_pool.wait_closed()
\ No newline at end of file
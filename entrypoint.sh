@@ -4,18 +4,32 @@ set -e
 # Start the FastAPI backend
 cd /backend || { echo "Backend directory not found"; exit 1; }
 
-echo "Starting FastAPI backend"
+# One uvicorn worker per core unless WEB_CONCURRENCY says otherwise.
+# Workers share state only through MySQL (cache_versions, backup_jobs).
+WEB_CONCURRENCY=${WEB_CONCURRENCY:-$(nproc 2>/dev/null || echo 1)}
+
+echo "Starting FastAPI backend with $WEB_CONCURRENCY worker(s)"
 # Start Uvicorn with proper host binding
-uvicorn server:app --host 0.0.0.0 --port 8001 &
+uvicorn server:app --host 0.0.0.0 --port 8001 --workers "$WEB_CONCURRENCY" &
 BACKEND_PID=$!
 
-echo "Waiting for backend to start..."
-sleep 30
-
-if ! kill -0 $BACKEND_PID 2>/dev/null; then
-    echo "Backend failed to start at initialization, exiting"
-    exit 1
-fi
+# Poll the readiness probe instead of sleeping a fixed time
+READY_URL="http://127.0.0.1:8001/api/health/ready"
+READY_TIMEOUT=${READY_TIMEOUT:-60}
+echo "Waiting for backend to become ready (up to ${READY_TIMEOUT}s)..."
+START_TIME=$(date +%s)
+until wget -q -O /dev/null "$READY_URL" 2>/dev/null; do
+    if ! kill -0 $BACKEND_PID 2>/dev/null; then
+        echo "Backend failed to start at initialization, exiting"
+        exit 1
+    fi
+    if [ $(( $(date +%s) - START_TIME )) -ge "$READY_TIMEOUT" ]; then
+        echo "Backend not ready after ${READY_TIMEOUT}s, starting nginx anyway"
+        break
+    fi
+    sleep 0.5
+done
+echo "Waited $(( $(date +%s) - START_TIME ))s for the backend"
 
 # Start Nginx
 nginx -g 'daemon off;' &
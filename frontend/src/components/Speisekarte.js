@@ -45,22 +45,36 @@ const Speisekarte = () => {
   const [selectedCategory, setSelectedCategory] = useState('Alle Kategorien');
   const [hoveredItem, setHoveredItem] = useState(null);
 
-  // Load menu items from backend
+  // Load menu items from backend: the first category is shown right away,
+  // the remaining categories are fetched in parallel behind it
   useEffect(() => {
+    let cancelled = false;
+    const loadCategory = async (name) => {
+      const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/menu/categories/${encodeURIComponent(name)}`);
+      return response.ok ? (await response.json()).items : [];
+    };
     const loadMenuItems = async () => {
       try {
-        const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/menu/items`);
+        const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/menu/categories`);
         if (response.ok) {
-          const data = await response.json();
-          setMenuItems(data);
+          const categories = await response.json();
+          if (categories.length > 0) {
+            const firstItems = await loadCategory(categories[0].name);
+            if (cancelled) return;
+            setMenuItems(firstItems);
+            setLoading(false);
+            const rest = await Promise.all(categories.slice(1).map(category => loadCategory(category.name)));
+            if (!cancelled) setMenuItems(items => [...items, ...rest.flat()]);
+          }
         }
       } catch (error) {
         console.error('Error loading menu items:', error);
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
     };
     loadMenuItems();
+    return () => { cancelled = true; };
   }, []);
 
   if (loading) {
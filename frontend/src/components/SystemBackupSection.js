@@ -155,12 +155,12 @@ const SystemBackupSection = () => {
 
       if (response.ok) {
         const contentDisposition = response.headers.get('Content-Disposition');
-        const backupSize = response.headers.get('X-Backup-Size');
         
         const filename = contentDisposition ? 
           contentDisposition.split('filename=')[1].replace(/"/g, '') : 
           `mysql-backup-${new Date().toISOString().split('T')[0]}.sql`;
 
+        // The export is streamed without a size header; count what arrived
         const blob = await response.blob();
         const url = window.URL.createObjectURL(blob);
         const a = document.createElement('a');
@@ -173,7 +173,7 @@ const SystemBackupSection = () => {
         
         setMessage(`✅ MySQL Datenbank-Backup erfolgreich erstellt! 
                    📁 Datei: ${filename}
-                   📊 Größe: ${formatBytes(parseInt(backupSize || '0'))}
+                   📊 Größe: ${formatBytes(blob.size)}
                    🗄️ Format: MySQL SQL-Dump`);
         
         loadBackupStatus();
@@ -206,12 +206,12 @@ const SystemBackupSection = () => {
 
       if (response.ok) {
         const contentDisposition = response.headers.get('Content-Disposition');
-        const backupSize = response.headers.get('X-Backup-Size');
         
         const filename = contentDisposition ? 
           contentDisposition.split('filename=')[1].replace(/"/g, '') : 
           `full-backup-mysql-${new Date().toISOString().split('T')[0]}.zip`;
 
+        // The export is streamed without a size header; count what arrived
         const blob = await response.blob();
         const url = window.URL.createObjectURL(blob);
         const a = document.createElement('a');
@@ -224,7 +224,7 @@ const SystemBackupSection = () => {
         
         setMessage(`✅ Vollständiges MySQL Backup erfolgreich erstellt! 
                    📁 Datei: ${filename}
-                   📊 Größe: ${formatBytes(parseInt(backupSize || '0'))}
+                   📊 Größe: ${formatBytes(blob.size)}
                    💾 Enthält: MySQL Datenbank + Mediendateien`);
         
         loadBackupStatus();
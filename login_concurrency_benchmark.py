@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark: public request latency while admins log in.
+
+Fires a steady stream of GET /api/menu/items requests, first on their own and
+then while a burst of concurrent POST /api/auth/login calls is running. With
+bcrypt on the event loop every login stalls all public requests for
+100-300 ms; with the password hashing pool the two latency profiles should
+stay close.
+
+Usage: python3 login_concurrency_benchmark.py [logins] [public_requests]
+"""
+import os
+import sys
+import time
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv("/app/frontend/.env")
+BACKEND_URL = os.environ.get("REACT_APP_BACKEND_URL", "http://localhost:8001")
+API_BASE_URL = f"{BACKEND_URL}/api"
+
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+PUBLIC_REQUESTS = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+CREDENTIALS = {"username": "admin", "password": "jimmy2024"}
+
+
+def timed_get(session, path):
+    started = time.perf_counter()
+    response = session.get(f"{API_BASE_URL}{path}")
+    response.raise_for_status()
+    return (time.perf_counter() - started) * 1000
+
+
+def login():
+    started = time.perf_counter()
+    response = requests.post(f"{API_BASE_URL}/auth/login", json=CREDENTIALS)
+    return response.status_code, (time.perf_counter() - started) * 1000
+
+
+def public_latencies(count, stop_event=None):
+    session = requests.Session()
+    latencies = []
+    for _ in range(count):
+        if stop_event is not None and stop_event.is_set():
+            break
+        latencies.append(timed_get(session, "/menu/items"))
+    return latencies
+
+
+def summarize(label, latencies):
+    if not latencies:
+        print(f"{label:<28} no samples")
+        return
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<28} n={len(latencies):<5} median={statistics.median(latencies):7.1f} ms  "
+          f"p95={p95:7.1f} ms  max={latencies[-1]:7.1f} ms")
+
+
+def main():
+    print(f"Using backend URL: {BACKEND_URL}")
+    print(f"{LOGINS} concurrent logins, {PUBLIC_REQUESTS} public requests per phase\n")
+
+    # Warm up connections and caches
+    public_latencies(10)
+
+    baseline = public_latencies(PUBLIC_REQUESTS)
+    summarize("public (idle)", baseline)
+
+    stop_event = threading.Event()
+    with ThreadPoolExecutor(max_workers=LOGINS + 1) as executor:
+        public_future = executor.submit(public_latencies, PUBLIC_REQUESTS, stop_event)
+        login_futures = [executor.submit(login) for _ in range(LOGINS)]
+        login_results = [future.result() for future in login_futures]
+        stop_event.set()
+        under_load = public_future.result()
+
+    summarize("public (during logins)", under_load)
+    summarize("login", [elapsed for _, elapsed in login_results])
+    failures = [status for status, _ in login_results if status != 200]
+    if failures:
+        print(f"\n⚠️  {len(failures)} logins did not return 200: {sorted(set(failures))}")
+
+
+if __name__ == "__main__":
+    main()
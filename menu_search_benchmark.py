@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark: menu search queries against the in-memory index.
+
+Builds backend/menu_search.py's index from a synthetic menu in the shape of
+the real one (tapas, paella, salads, drinks with German descriptions and
+Spanish names), times an incremental refresh and a mix of typical queries.
+Correctness is covered by tests/test_menu_search.py.
+
+Usage: python3 menu_search_benchmark.py [items] [queries]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from menu_search import MenuSearchIndex  # noqa: E402
+
+ITEMS = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+QUERIES = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+BASE_ITEMS = [
+    ("Gambas al Ajillo", "Klassische spanische Knoblauchgarnelen", "Garnelen, Olivenöl, Knoblauch, Chili",
+     "Inicio / Vorspeisen", "Krustentiere", (False, False, True)),
+    ("Patatas Bravas", "Würzig gebratene Kartoffeln mit Aioli", "Kartoffeln, Tomaten, Aioli, Paprika",
+     "Tapas Vegetarian", "Eier", (False, True, True)),
+    ("Paella Valenciana", "Original Paella mit Huhn und grünen Bohnen", "Bomba-Reis, Huhn, grüne Bohnen, Safran",
+     "Paella", "", (False, False, True)),
+    ("Jamón Ibérico", "Hauchdünn geschnittener iberischer Schinken", "Iberischer Schinken, Manchego",
+     "Inicio / Vorspeisen", "Milch", (False, False, True)),
+    ("Ensalada Mixta", "Gemischter Salat mit Tomaten und Oliven", "Salat, Tomaten, Gurke, Oliven",
+     "Salate", "", (True, True, True)),
+    ("Crema Catalana", "Katalanische Crème brûlée", "Sahne, Eigelb, Zucker, Zimt",
+     "Dessert", "Milch, Eier", (False, True, True)),
+    ("Sangría de la Casa", "Hausgemachte Sangría mit Früchten", "Rotwein, Orangen, Äpfel, Brandy",
+     "Getränke", "Sulfite", (True, True, True)),
+    ("Croquetas de Jamón", "Cremige Schinkenkroketten", "Schinken, Milch, Mehl, Paniermehl",
+     "Tapas de Carne", "Gluten; Milch", (False, False, False)),
+]
+QUERY_MIX = ["jamon", "Jamón Ibérico", "garnelen", "tom", "kartoffeln aioli", "paella", "sch",
+             "knoblauch", "salat", "iberico schinken", "x", "croq", "sangria", "crème brûlée"]
+
+
+def synthetic_menu():
+    items = []
+    for i in range(ITEMS):
+        name, description, ingredients, category, allergens, (vegan, vegetarian, glutenfree) = \
+            BASE_ITEMS[i % len(BASE_ITEMS)]
+        suffix = "" if i < len(BASE_ITEMS) else f" Nr. {i}"
+        items.append({"id": f"item-{i}", "name": name + suffix, "description": description,
+                      "detailed_description": description + " - " + ingredients, "ingredients": ingredients,
+                      "category": category, "allergens": allergens, "origin": "Spanien", "price": "9,90",
+                      "vegan": vegan, "vegetarian": vegetarian, "glutenfree": glutenfree, "order_index": i})
+    return items
+
+
+def main():
+    index = MenuSearchIndex()
+    menu = synthetic_menu()
+    started = time.perf_counter()
+    index.refresh(menu)
+    print(f"index build  {len(menu)} items, {len(index.postings)} terms in "
+          f"{(time.perf_counter() - started) * 1000:.1f} ms")
+
+    # Incremental: one changed item is the only one re-indexed
+    menu[0] = {**menu[0], "name": "Gambas Pil Pil"}
+    started = time.perf_counter()
+    changes = index.refresh(menu)
+    print(f"refresh      {changes} in {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    random.seed(1)
+    queries = [(random.choice(QUERY_MIX), random.random() < 0.3, random.random() < 0.2) for _ in range(QUERIES)]
+    index.prefix_cache.clear()
+    timings = []
+    for query, vegetarian, exclude_milk in queries:
+        started = time.perf_counter()
+        index.search(query, vegetarian=vegetarian, exclude_allergens=["Milch"] if exclude_milk else ())
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f"{QUERIES} queries: p50 {timings[len(timings) // 2] * 1e6:.1f} µs, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.1f} µs, max {timings[-1] * 1e6:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: rendering newsletter messages for a large subscriber list.
+
+Renders the same campaign for N synthetic subscribers twice:
+  - naive:    a fresh email.message.EmailMessage per recipient, placeholders
+              substituted into the template and the whole body MIME/QP
+              encoded again for every message
+  - compiled: backend/newsletter_render.py, static parts encoded once and only
+              the per-recipient values substituted in the hot loop
+tests/test_newsletter_render.py checks the compiled output.
+
+Usage: python3 newsletter_render_benchmark.py [messages]
+"""
+import html
+import os
+import sys
+import time
+from email.message import EmailMessage
+from email.utils import formataddr
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from newsletter_render import compile_newsletter, html_to_text  # noqa: E402
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+NAMES = ["", "Anna", "Jürgen", "Sophie", "Mehmet", "Lena", "Björn", "Zoë", "Paul", "Marie"]
+CONFIG = {"from_email": "newsletter@jimmys-tapasbar.de", "from_name": "Jimmy's Tapas Bar"}
+CAMPAIGN = {
+    "id": "benchmark",
+    "subject": "{{name|Hallo}}, die neuen Sommer-Tapas sind da",
+    "content": (
+        "<h1>¡Hola {{name|liebe Gäste}}!</h1>"
+        + "<p>Ab sofort gibt es an beiden Standorten unsere neuen Sommer-Tapas: Gambas al Ajillo, "
+          "Pimientos de Padrón und hausgemachte Crema Catalana. Wir freuen uns auf Ihren Besuch "
+          "direkt an der Ostsee – reservieren Sie am besten gleich Ihren Lieblingsplatz.</p>" * 8
+        + "<p>Sie erhalten diese E-Mail an {{email}}. "
+          "<a href=\"{{unsubscribe_url}}\">Newsletter abbestellen</a></p>"
+    ),
+}
+
+
+def subscribers():
+    return [{"id": f"sub-{i:06d}", "email": f"gast{i}@example.de", "name": NAMES[i % len(NAMES)]}
+            for i in range(MESSAGES)]
+
+
+def render_naive(subscriber, unsubscribe_url):
+    values = {"name": subscriber["name"], "email": subscriber["email"], "unsubscribe_url": unsubscribe_url}
+    content = CAMPAIGN["content"]
+    subject = CAMPAIGN["subject"].replace("{{name|Hallo}}", subscriber["name"] or "Hallo")
+    content = content.replace("{{name|liebe Gäste}}", html.escape(subscriber["name"] or "liebe Gäste"))
+    for field, value in values.items():
+        content = content.replace("{{" + field + "}}", html.escape(value))
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = formataddr((CONFIG["from_name"], CONFIG["from_email"]))
+    message["To"] = formataddr((subscriber["name"], subscriber["email"]))
+    message.set_content(html_to_text(content), cte="quoted-printable")
+    message.add_alternative(content, subtype="html", cte="quoted-printable")
+    return message.as_bytes()
+
+
+def timed(label, render, people):
+    started = time.perf_counter()
+    total_bytes = 0
+    for subscriber in people:
+        total_bytes += len(render(subscriber))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {len(people)} messages in {elapsed:6.2f} s  -> {len(people) / elapsed:9.0f} messages/s  "
+          f"({elapsed / len(people) * 1e6:6.1f} µs each, {total_bytes / len(people) / 1024:.1f} KB avg)")
+    return elapsed
+
+
+def main():
+    people = subscribers()
+    renderer = compile_newsletter(CONFIG, CAMPAIGN)
+
+    started = time.perf_counter()
+    compile_newsletter(CONFIG, {**CAMPAIGN, "id": "benchmark-compile"})
+    print(f"compile    {(time.perf_counter() - started) * 1000:.1f} ms (once per campaign)\n")
+
+    # The naive path is slow; time a slice of it and extrapolate
+    naive_count = min(MESSAGES, 5000)
+    naive = timed("naive", lambda s: render_naive(s, renderer.unsubscribe_url(s)), people[:naive_count])
+    compiled = timed("compiled", renderer.render, people)
+    print(f"\nspeed-up x{naive / naive_count / (compiled / MESSAGES):.0f}; "
+          f"naive would need ~{naive / naive_count * MESSAGES:.0f} s for {MESSAGES} messages")
+
+
+if __name__ == "__main__":
+    main()
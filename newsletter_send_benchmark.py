@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark: newsletter delivery throughput against a local SMTP stand-in.
+
+Starts the minimal SMTP sink from tests/smtp_sink.py on 127.0.0.1 (accepts
+everything, refuses recipients at @invalid.example with 550) and pushes synthetic subscribers
+through the send engine in backend/newsletter_sender.py: batches, the
+persistent connection pool and per-domain throttling, exactly as a campaign
+run does, just without MongoDB. Prints messages/second.
+
+Usage: python3 newsletter_send_benchmark.py [messages] [connections] [domain_rate]
+  domain_rate 0 disables per-domain throttling
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import newsletter_sender  # noqa: E402
+from newsletter_render import compile_newsletter  # noqa: E402
+from tests.smtp_sink import SMTPSink  # noqa: E402
+
+MESSAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+CONNECTIONS = int(sys.argv[2]) if len(sys.argv) > 2 else newsletter_sender.NEWSLETTER_SMTP_CONNECTIONS
+DOMAIN_RATE = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+DOMAINS = ["gmail.com", "web.de", "gmx.de", "t-online.de", "outlook.com", "yahoo.de"]
+
+
+async def main():
+    sink = SMTPSink()
+    port = await sink.start()
+    config = {"smtp_server": "127.0.0.1", "smtp_port": port, "use_tls": False,
+              "from_email": "newsletter@jimmys-tapasbar.de", "from_name": "Jimmy's Tapas Bar"}
+    campaign = {"id": "benchmark", "subject": "Neue Tapas im Juli",
+                "content": "<h1>Hola!</h1><p>Unsere neuen Sommer-Tapas sind da.</p>" * 20}
+    subscribers = [{"id": str(i), "email": f"gast{i}@{DOMAINS[i % len(DOMAINS)]}"} for i in range(MESSAGES)]
+    # A few bad addresses to exercise the permanent-failure path
+    for subscriber in subscribers[::1000]:
+        subscriber["email"] = f"gast{subscriber['id']}@invalid.example"
+
+    print(f"{MESSAGES} messages, {CONNECTIONS} SMTP connections, "
+          f"domain rate {'off' if not DOMAIN_RATE else f'{DOMAIN_RATE}/s'}, "
+          f"batches of {newsletter_sender.NEWSLETTER_BATCH_SIZE}\n")
+    pool = newsletter_sender.SMTPPool(config, CONNECTIONS)
+    throttle = newsletter_sender.DomainThrottle(DOMAIN_RATE)
+    report = newsletter_sender.SendReport()
+    renderer = compile_newsletter(config, campaign)
+    build_seconds = 0.0
+    try:
+        for start in range(0, MESSAGES, newsletter_sender.NEWSLETTER_BATCH_SIZE):
+            batch = subscribers[start:start + newsletter_sender.NEWSLETTER_BATCH_SIZE]
+            started = time.perf_counter()
+            messages = [(subscriber["id"], subscriber["email"], renderer.render(subscriber)) for subscriber in batch]
+            build_seconds += time.perf_counter() - started
+            report.add(await newsletter_sender.deliver(pool, throttle, messages))
+        report.finish()
+    finally:
+        await pool.close()
+        await sink.stop()
+
+    stats = report.as_dict()
+    print(f"sent={stats['sent']} failed={stats['failed']} in {stats['elapsed_seconds']} s "
+          f"-> {stats['messages_per_second']} messages/s")
+    print(f"message rendering: {build_seconds:.2f} s, SMTP connections opened: {sink.connections}, "
+          f"received by sink: {sink.messages}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
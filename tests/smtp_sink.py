@@ -0,0 +1,65 @@
+"""A minimal in-process SMTP server for the newsletter tests and benchmark."""
+import asyncio
+import re
+
+RECIPIENT = re.compile(rb"<([^>]*)>")
+
+
+class SMTPSink:
+    """Just enough of RFC 5321 for smtplib.
+
+    Refuses recipients at @invalid.example with 550, answers 451 to the
+    addresses in deferrals until their count runs out, and records every
+    accepted message as (recipient, raw bytes).
+    """
+
+    def __init__(self, deferrals: dict = None):
+        self.messages = 0
+        self.connections = 0
+        self.received = []
+        self.deferrals = dict(deferrals or {})
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        recipient = None
+        writer.write(b"220 sink ESMTP\r\n")
+        while line := await reader.readline():
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                writer.write(b"250-sink\r\n250 8BITMIME\r\n")
+            elif command == b"RCPT":
+                match = RECIPIENT.search(line)
+                recipient = match.group(1).decode() if match else ""
+                if recipient.lower().endswith("@invalid.example"):
+                    writer.write(b"550 No such user\r\n")
+                elif self.deferrals.get(recipient):
+                    self.deferrals[recipient] -= 1
+                    writer.write(b"451 Try again later\r\n")
+                else:
+                    writer.write(b"250 OK\r\n")
+            elif command == b"DATA":
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                await writer.drain()
+                lines = []
+                while (data := await reader.readline()) not in (b".\r\n", b""):
+                    lines.append(data)
+                self.messages += 1
+                self.received.append((recipient, b"".join(lines)))
+                writer.write(b"250 OK queued\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 Bye\r\n")
+                await writer.drain()
+                break
+            else:  # MAIL, RSET, NOOP
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
@@ -0,0 +1,394 @@
+import asyncio
+import gzip
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+import pymysql
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+class TablesCursor:
+    def __init__(self, tables):
+        self.tables = tables
+
+    async def execute(self, statement, params=()):
+        pass
+
+    async def fetchall(self):
+        return [{"name": name, "key_column": "id", "key_columns": 1, "tracked": 1} for name in self.tables]
+
+
+def test_runtime_tables_are_left_out_of_differentials():
+    cursor = TablesCursor(["backup_jobs", "cache_versions", "content_sections", "menu_items", "schema_migrations"])
+    tables = asyncio.run(server.differential_tables(cursor))
+    assert [table["name"] for table in tables] == ["content_sections", "menu_items"]
+    # Full dumps pass these to mysqldump as --ignore-table
+    assert {"backup_jobs", "cache_versions"} <= set(server.BACKUP_IGNORED_TABLES)
+
+
+class JobsCursor:
+    """backup_jobs as a dict of rows, enough for BackupJob.persist and the job lookups."""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        if statement.startswith("REPLACE INTO backup_jobs"):
+            columns = ("id", "filename", "status", "dump_bytes", "written_bytes", "estimated_bytes",
+                       "started_at", "finished_at", "error")
+            self.db.jobs[params[0]] = {**dict(zip(columns, params)), "idle_seconds": 0}
+            self.db.writes.append(params[2])
+        elif statement.startswith("SELECT id, filename, status"):
+            rows = sorted(self.db.jobs.values(), key=lambda row: row["started_at"], reverse=True)
+            if "WHERE id = %s" in statement:
+                rows = [row for row in rows if row["id"] == params[0]]
+            elif "WHERE filename = %s AND status = 'running'" in statement:
+                rows = [row for row in rows if row["filename"] == params[0] and row["status"] == "running"]
+            self.result = [dict(row) for row in rows]
+        else:
+            raise AssertionError(statement)
+
+    async def fetchone(self):
+        return self.result[0] if self.result else None
+
+    async def fetchall(self):
+        return self.result
+
+
+class JobsDB:
+    def __init__(self):
+        self.jobs = {}
+        self.writes = []
+
+
+class Connection:
+    def __init__(self, db):
+        self.db = db
+
+    async def cursor(self):
+        return JobsCursor(self.db)
+
+
+class NoPool:
+    def release(self, conn):
+        pass
+
+
+@pytest.fixture
+def jobs(monkeypatch, tmp_path):
+    db = JobsDB()
+
+    async def connection():
+        return Connection(db)
+
+    monkeypatch.setattr(server, "get_mysql_connection", connection)
+    monkeypatch.setattr(server, "mysql_pool", NoPool())
+    monkeypatch.setattr(server, "BACKUP_DIR", tmp_path)
+    monkeypatch.setattr(server, "backup_jobs", OrderedDict())
+    return db
+
+
+def producer(chunks, delay=0.0, error=None):
+    async def produce(writer):
+        for chunk in chunks:
+            await writer.write(chunk)
+            await asyncio.sleep(delay)
+        if error:
+            raise error
+    return produce
+
+
+def test_backup_job_streams_compressed_chunks_to_disk_and_records_progress(jobs, tmp_path):
+    chunks = [bytes([index]) * 50_000 for index in range(4)]
+
+    async def test():
+        job = await server.start_backup_job("backup_1.sql.gz", producer(chunks), {"kind": "full"}, 400_000)
+        assert job.status == "running" and (tmp_path / "backup_1.sql.gz").exists()
+        assert not (tmp_path / "backup_1.sql.gz.json").exists()
+        await job.task
+        return job
+
+    job = asyncio.run(test())
+    assert gzip.decompress((tmp_path / "backup_1.sql.gz").read_bytes()) == b"".join(chunks)
+    assert json.loads((tmp_path / "backup_1.sql.gz.json").read_text()) == {"kind": "full"}
+    assert job.to_dict()["progress"] == 100
+    assert (job.dump_bytes, job.written_bytes) == (200_000, (tmp_path / "backup_1.sql.gz").stat().st_size)
+    # Registered as running first, finished state written last
+    assert jobs.writes[0] == "running" and jobs.writes[-1] == "completed"
+    assert jobs.jobs[job.id]["finished_at"] is not None
+
+
+def test_failed_backup_removes_the_partial_file(jobs, tmp_path):
+    async def test():
+        job = await server.start_backup_job("backup_2.sql.gz", producer([b"x" * 10], error=RuntimeError("disk full")),
+                                            {"kind": "full"}, 0)
+        await job.task
+        return job
+
+    job = asyncio.run(test())
+    assert (job.status, job.error) == ("failed", "disk full")
+    assert list(tmp_path.iterdir()) == []
+    assert jobs.jobs[job.id]["status"] == "failed"
+
+
+def test_download_follows_a_backup_that_is_still_being_written(jobs, tmp_path):
+    chunks = [bytes([index]) * 100_000 for index in range(5)]
+
+    async def test():
+        job = await server.start_backup_job("backup_3.sql.gz", producer(chunks, delay=0.01), {"kind": "full"}, 0)
+        assert await server.running_backup_job("backup_3.sql.gz") is job
+        received = [chunk async for chunk in server.stream_backup_file(tmp_path / "backup_3.sql.gz", job)]
+        assert job.done
+        return b"".join(received)
+
+    assert gzip.decompress(asyncio.run(test())) == b"".join(chunks)
+
+
+def test_jobs_of_other_workers_are_listed_and_stale_ones_count_as_failed(jobs):
+    started = datetime(2026, 5, 1, 3, 0)
+    for job_id, idle in (("other", 5), ("killed", server.BACKUP_JOB_STALE_AFTER + 1)):
+        jobs.jobs[job_id] = {"id": job_id, "filename": f"backup_{job_id}.sql.gz", "status": "running",
+                             "dump_bytes": 10, "written_bytes": 5, "estimated_bytes": 100, "started_at": started,
+                             "finished_at": None, "error": None, "idle_seconds": idle}
+
+    async def test():
+        listed = {job.id: job for job in await server.list_backup_jobs()}
+        return listed, await server.running_backup_job("backup_killed.sql.gz")
+
+    listed, killed = asyncio.run(test())
+    assert (listed["other"].status, listed["other"].remote) == ("running", True)
+    assert listed["other"].to_dict()["progress"] == 10
+    assert (listed["killed"].status, listed["killed"].error) == ("failed", "Backup worker stopped responding")
+    assert killed is None
+
+
+def test_only_finished_jobs_are_dropped_from_the_worker_registry(jobs, monkeypatch):
+    monkeypatch.setattr(server, "BACKUP_JOBS_KEPT", 2)
+    running = server.BackupJob("backup_a.sql.gz", 0)
+    finished = []
+    server.register_backup_job(running)
+    for name in ("b", "c"):
+        job = server.BackupJob(f"backup_{name}.sql.gz", 0)
+        job.status = "completed"
+        finished.append(job)
+        server.register_backup_job(job)
+    assert list(server.backup_jobs.values()) == [running, finished[1]]
+
+
+def write_backup(directory, filename, manifest=None):
+    (directory / filename).write_bytes(b"")
+    if manifest is not None:
+        (directory / (filename + ".json")).write_text(json.dumps(manifest))
+
+
+def test_restore_chain_replays_the_base_and_its_deltas_up_to_the_file(jobs, tmp_path):
+    write_backup(tmp_path, "backup_1.sql.gz", {"kind": "full", "snapshot_at": "2026-05-01 03:00:00"})
+    write_backup(tmp_path, "backup_2.diff.sql.gz", {"kind": "differential", "base": "backup_1.sql.gz"})
+    write_backup(tmp_path, "backup_3.sql.gz", {"kind": "full", "snapshot_at": "2026-05-03 03:00:00"})
+    write_backup(tmp_path, "backup_4.diff.sql.gz", {"kind": "differential", "base": "backup_1.sql.gz"})
+    write_backup(tmp_path, "backup_5.diff.sql.gz", {"kind": "differential", "base": "backup_3.sql.gz"})
+    write_backup(tmp_path, "backup_6.diff.sql.gz", {"kind": "differential", "base": "backup_1.sql.gz"})
+
+    assert server.restore_chain("backup_4.diff.sql.gz") == [
+        "backup_1.sql.gz", "backup_2.diff.sql.gz", "backup_4.diff.sql.gz"]
+    assert server.restore_chain("backup_5.diff.sql.gz") == ["backup_3.sql.gz", "backup_5.diff.sql.gz"]
+    assert server.restore_chain("backup_3.sql.gz") == ["backup_3.sql.gz"]
+
+    (tmp_path / "backup_3.sql.gz").unlink()
+    with pytest.raises(HTTPException) as error:
+        server.restore_chain("backup_5.diff.sql.gz")
+    assert error.value.status_code == 409
+
+
+def test_latest_full_backup_needs_a_completed_manifest(jobs, tmp_path):
+    assert server.latest_full_backup() is None
+    write_backup(tmp_path, "backup_1.sql.gz", {"kind": "full", "snapshot_at": "2026-05-01 03:00:00"})
+    write_backup(tmp_path, "backup_2.diff.sql.gz", {"kind": "differential", "base": "backup_1.sql.gz"})
+    # Still being written: no manifest yet
+    write_backup(tmp_path, "backup_3.sql.gz")
+    assert server.latest_full_backup() == "backup_1.sql.gz"
+
+
+class DiffCursor:
+    """Answers write_differential_dump from in-memory tables; fetchmany pages like SSDictCursor."""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        self.db.statements.append((statement, params))
+        if self.db.fail_on and statement.startswith(self.db.fail_on):
+            raise ConnectionError("Lost connection to MySQL server during query")
+        if statement.startswith("SELECT TIMESTAMPDIFF"):
+            self.result = [{"utc_offset": 7200}]
+        elif "FROM information_schema.COLUMNS" in statement:
+            self.result = [{"name": name, **shape} for name, shape in self.db.shapes.items()]
+        elif statement.startswith("SELECT * FROM"):
+            rows = self.db.tables[statement.split("`")[1]]
+            if "updated_at >= %s" in statement:
+                rows = [row for row in rows if row["updated_at"] is None or row["updated_at"] >= params[0]]
+            self.result = [dict(row) for row in rows]
+        elif statement.startswith("SELECT `"):
+            key, table = statement.split("`")[1], statement.split("`")[3]
+            self.result = [{"k": row[key]} for row in self.db.tables[table]]
+        else:
+            self.result = []
+
+    async def fetchone(self):
+        return self.result[0]
+
+    async def fetchall(self):
+        return self.result
+
+    async def fetchmany(self, size):
+        rows, self.result = self.result[:size], self.result[size:]
+        return rows
+
+    async def close(self):
+        self.db.events.append("close stream")
+
+
+class DiffConnection:
+    def __init__(self, db):
+        self.db = db
+
+    async def cursor(self, cursor_class=None):
+        return DiffCursor(self.db)
+
+    def escape(self, value):
+        return pymysql.converters.escape_item(value, "utf8mb4")
+
+    async def commit(self):
+        self.db.events.append("commit")
+
+    async def rollback(self):
+        self.db.events.append("rollback")
+        if self.db.rollback_fails:
+            raise ConnectionError("MySQL server has gone away")
+
+    def close(self):
+        self.db.events.append("close")
+
+
+class DiffDB:
+    def __init__(self):
+        self.statements = []
+        self.events = []
+        self.fail_on = None
+        self.rollback_fails = False
+        old, new = datetime(2026, 4, 1), datetime(2026, 5, 2)
+        self.tables = {
+            "menu_items": [{"id": "m1", "name": "Paella", "updated_at": old},
+                           {"id": "m2", "name": "Crema Catalana", "updated_at": new}],
+            "settings": [{"name": "theme", "value": "dark"}],
+            "tags": [{"item": "m1", "tag": "vegan"}],
+        }
+        self.shapes = {"menu_items": {"key_column": "id", "key_columns": 1, "tracked": 1},
+                       "settings": {"key_column": "name", "key_columns": 1, "tracked": 0},
+                       "tags": {"key_column": "item", "key_columns": 2, "tracked": 0}}
+
+
+class Writer:
+    def __init__(self):
+        self.data = b""
+
+    async def write(self, chunk):
+        self.data += chunk
+
+
+class ReleasingPool:
+    def __init__(self, db):
+        self.db = db
+
+    def release(self, conn):
+        self.db.events.append("release")
+
+
+@pytest.fixture
+def diff_db(monkeypatch):
+    db = DiffDB()
+
+    async def connection():
+        return DiffConnection(db)
+
+    monkeypatch.setattr(server, "get_mysql_connection", connection)
+    monkeypatch.setattr(server, "mysql_pool", ReleasingPool(db))
+    return db
+
+
+def test_differential_dump_holds_changed_rows_and_prunes_deleted_keys(diff_db):
+    writer = Writer()
+    asyncio.run(server.write_differential_dump(writer, "2026-05-01 05:00:00"))
+    sql = writer.data.decode("utf-8")
+
+    # The base's local snapshot time, moved to UTC and back by the safety margin
+    changed = [params for statement, params in diff_db.statements if "updated_at >= %s" in statement]
+    assert changed == [(datetime(2026, 5, 1, 2, 0),)]
+    assert "Crema Catalana" in sql and "Paella" not in sql
+    assert "DELETE FROM `menu_items` WHERE `id` NOT IN (SELECT k FROM _backup_keys);" in sql
+    assert "INSERT INTO _backup_keys VALUES ('m1'), ('m2');" in sql
+    # Untracked tables are copied whole, tables without a single key are replaced whole
+    assert "REPLACE INTO `settings` (`name`, `value`) VALUES\n('theme', 'dark');" in sql
+    assert sql.index("DELETE FROM `tags`;") < sql.index("REPLACE INTO `tags`")
+    assert diff_db.events == ["close stream", "commit", "release"]
+
+
+def test_failed_differential_dump_never_returns_an_open_snapshot_to_the_pool(diff_db):
+    diff_db.fail_on = "SELECT * FROM `settings`"
+    with pytest.raises(ConnectionError):
+        asyncio.run(server.write_differential_dump(Writer(), "2026-05-01 05:00:00"))
+    assert diff_db.events == ["close stream", "rollback", "release"]
+
+    diff_db.events.clear()
+    diff_db.rollback_fails = True
+    with pytest.raises(ConnectionError):
+        asyncio.run(server.write_differential_dump(Writer(), "2026-05-01 05:00:00"))
+    assert diff_db.events == ["close stream", "rollback", "close", "release"]
+
+
+def test_job_running_in_another_worker_is_followed_through_its_row(jobs, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "BACKUP_JOB_PERSIST_INTERVAL", 3600)
+    release = asyncio.Event()
+
+    async def produce(writer):
+        await writer.write(b"-- dump\n" * 1000)
+        await release.wait()
+
+    async def test():
+        job = await server.start_backup_job("backup_7.sql.gz", produce, {"kind": "full"}, 0)
+        await asyncio.sleep(0)
+        # Seen from a second worker, whose registry does not hold the job
+        monkeypatch.setattr(server, "backup_jobs", OrderedDict())
+        remote = await server.find_backup_job(job.id)
+        assert remote is not job and remote.remote and remote.status == "running"
+        assert (await server.running_backup_job("backup_7.sql.gz")).id == job.id
+        with pytest.raises(HTTPException) as error:
+            await server.restore_backup("backup_7.sql.gz", current_user=None)
+        assert error.value.status_code == 409
+
+        release.set()
+        await job.task
+        await remote.wait_changed(0.01)
+        return remote
+
+    remote = asyncio.run(test())
+    assert remote.status == "completed" and remote.finished_at is not None
+    # Progress within the persist interval stays in the running worker
+    assert jobs.writes == ["running", "completed"]
+
+
+def test_vanished_job_row_ends_a_remote_wait(jobs):
+    remote = server.BackupJob.from_row({"id": "gone", "filename": "backup_8.sql.gz", "status": "running",
+                                        "dump_bytes": 0, "written_bytes": 0, "estimated_bytes": 0,
+                                        "started_at": datetime(2026, 5, 1), "finished_at": None, "error": None,
+                                        "idle_seconds": 0})
+    asyncio.run(remote.wait_changed(0.01))
+    assert (remote.status, remote.error) == ("failed", "Backup job disappeared")
@@ -0,0 +1,64 @@
+import asyncio
+
+import bulk_ops
+from bulk_ops import bulk_result, execute_for_ids, id_chunks, in_list, lock_rows, unique_ids
+
+
+class RecordingCursor:
+    """Answers SELECT ... IN (...) from rows and records every statement."""
+
+    def __init__(self, rows=()):
+        self.rows = {row["id"]: row for row in rows}
+        self.statements = []
+        self.rowcount = 0
+        self.result = []
+
+    async def execute(self, statement, params=()):
+        self.statements.append((statement, list(params)))
+        ids = [param for param in params if param in self.rows]
+        self.result = [self.rows[item_id] for item_id in ids]
+        self.rowcount = len(ids)
+
+    async def fetchall(self):
+        return self.result
+
+
+def test_unique_ids_keeps_order_and_drops_blanks():
+    assert unique_ids(["b", "a", "", None, "b", 3]) == ["b", "a", "3"]
+
+
+def test_id_chunks(monkeypatch):
+    monkeypatch.setattr(bulk_ops, "BULK_CHUNK_SIZE", 2)
+    assert list(id_chunks(["a", "b", "c", "d", "e"])) == [["a", "b"], ["c", "d"], ["e"]]
+    assert list(id_chunks([])) == []
+    assert in_list(["a", "b", "c"]) == "%s, %s, %s"
+
+
+def test_lock_rows_selects_for_update_in_chunks(monkeypatch):
+    monkeypatch.setattr(bulk_ops, "BULK_CHUNK_SIZE", 2)
+    cursor = RecordingCursor([{"id": "a", "rating": 5}, {"id": "c", "rating": 3}])
+    found = asyncio.run(lock_rows(cursor, "reviews", "rating", ["a", "b", "c"]))
+    assert found == {"a": {"id": "a", "rating": 5}, "c": {"id": "c", "rating": 3}}
+    assert cursor.statements == [
+        ("SELECT id, rating FROM reviews WHERE id IN (%s, %s) FOR UPDATE", ["a", "b"]),
+        ("SELECT id, rating FROM reviews WHERE id IN (%s) FOR UPDATE", ["c"]),
+    ]
+
+
+def test_execute_for_ids_puts_params_before_the_chunk(monkeypatch):
+    monkeypatch.setattr(bulk_ops, "BULK_CHUNK_SIZE", 2)
+    cursor = RecordingCursor([{"id": item_id} for item_id in "abc"])
+    affected = asyncio.run(execute_for_ids(
+        cursor, "UPDATE reviews SET is_approved = %s WHERE id IN ({ids})", ["a", "b", "c"], (True,)))
+    assert affected == 3
+    assert cursor.statements == [
+        ("UPDATE reviews SET is_approved = %s WHERE id IN (%s, %s)", [True, "a", "b"]),
+        ("UPDATE reviews SET is_approved = %s WHERE id IN (%s)", [True, "c"]),
+    ]
+
+
+def test_bulk_result_counts_statuses():
+    assert bulk_result({"a": "deleted", "b": "not_found", "c": "deleted"}) == {
+        "results": {"a": "deleted", "b": "not_found", "c": "deleted"},
+        "counts": {"deleted": 2, "not_found": 1},
+    }
@@ -0,0 +1,49 @@
+import gzip
+import json
+import time
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture
+def client(monkeypatch):
+    registry = server.ContentRegistry(server.DEFAULT_CMS_CONTENT)
+    # Just synced: the requests are answered without asking MySQL
+    registry._checked_at = time.monotonic()
+    monkeypatch.setattr(server, "CACHE_VERSION_CHECK_INTERVAL", 3600)
+    monkeypatch.setattr(server, "cms_registry", registry)
+    return TestClient(server.app)
+
+
+def test_encoded_body_is_byte_identical_to_a_json_response():
+    data = {"title": "Über uns – Jimmy's", "price": 9.9, "open": True, "items": [None, 1],
+            "at": datetime(2026, 5, 1, 12, tzinfo=timezone.utc), "review": server.Review(
+                id="r1", customer_name="Ana", rating=5, comment="¡Olé!", date=datetime(2026, 5, 1))}
+    assert server.encode_json(data) == JSONResponse(jsonable_encoder(data)).body
+
+
+def test_every_default_section_is_served_pre_encoded(client):
+    for key in server.DEFAULT_CMS_CONTENT:
+        path = "/api/cms/" + key
+        response = client.get(path, headers={"Accept-Encoding": "identity"})
+        assert response.status_code == 200, path
+        assert response.json() == server.DEFAULT_CMS_CONTENT[key]
+        assert response.content == server.cms_registry.get(key).body
+
+
+def test_large_sections_carry_a_gzip_variant(client):
+    payload = server.cms_registry.get("homepage")
+    assert gzip.decompress(payload.variants["gzip"]) == payload.body
+    response = client.get("/api/cms/homepage", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == server.DEFAULT_CMS_CONTENT["homepage"]
+
+
+def test_unknown_website_texts_section_is_404(client):
+    assert client.get("/api/cms/website-texts/nope").status_code == 404
@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from fastapi import Request
+
+import server
+
+SAVED_AT = datetime(2026, 5, 1, 12, 0, 30, 400000, tzinfo=timezone.utc)
+
+
+def request(**headers) -> Request:
+    return Request({"type": "http", "headers": [(name.replace("_", "-").encode(), value.encode())
+                                                for name, value in headers.items()]})
+
+
+def test_payload_without_a_modification_time_relies_on_the_etag():
+    payload = server.make_payload([{"id": "r1", "rating": 5}])
+    response = server.conditional_response(request(), payload)
+    assert "last-modified" not in response.headers
+    # A date alone can not prove a list unchanged
+    since = format_datetime(datetime.now(timezone.utc), usegmt=True)
+    assert server.conditional_response(request(if_modified_since=since), payload).status_code == 200
+    assert server.conditional_response(request(if_none_match=payload.etag), payload).status_code == 304
+
+
+def test_payload_with_a_modification_time_answers_if_modified_since():
+    payload = server.make_payload({"title": "Hola"}, SAVED_AT)
+    response = server.conditional_response(request(), payload)
+    assert response.headers["last-modified"] == "Fri, 01 May 2026 12:00:30 GMT"
+    assert server.conditional_response(
+        request(if_modified_since="Fri, 01 May 2026 12:00:30 GMT"), payload).status_code == 304
+    assert server.conditional_response(
+        request(if_modified_since="Fri, 01 May 2026 12:00:29 GMT"), payload).status_code == 200
+
+
+def test_if_none_match_accepts_weak_lists_and_every_encoded_variant():
+    payload = server.make_payload({"text": "Tapas " * 400}, compress=True)
+    assert set(payload.variants) >= {"gzip"}
+    for header in (payload.etag, "W/" + payload.etag, f'"other", {payload.variant_etag("gzip")}', "*"):
+        response = server.conditional_response(request(if_none_match=header), payload)
+        assert response.status_code == 304 and response.body == b""
+    assert server.conditional_response(request(if_none_match='"other"'), payload).status_code == 200
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    payload = server.make_payload({"title": "Hola"}, SAVED_AT)
+    response = server.conditional_response(
+        request(if_none_match='"other"', if_modified_since="Fri, 01 May 2026 13:00:00 GMT"), payload)
+    assert response.status_code == 200
+
+
+def test_each_encoding_has_its_own_etag_and_varies_on_accept_encoding():
+    payload = server.make_payload({"text": "Tapas " * 400}, compress=True)
+    gzip_response = server.conditional_response(request(accept_encoding="gzip, deflate"), payload)
+    assert gzip_response.headers["content-encoding"] == "gzip"
+    assert gzip_response.headers["etag"] == payload.variant_etag("gzip") != payload.etag
+    assert gzip_response.headers["vary"] == "Accept-Encoding"
+    assert gzip_response.headers["cache-control"] == server.PUBLIC_CACHE_CONTROL
+    identity = server.conditional_response(request(accept_encoding="gzip;q=0, br;q=0"), payload)
+    assert "content-encoding" not in identity.headers and identity.headers["etag"] == payload.etag
+    assert identity.body == payload.body
+
+
+def test_small_bodies_are_not_compressed():
+    payload = server.make_payload({"ok": True}, compress=True)
+    assert payload.variants == {}
+    assert "vary" not in server.conditional_response(request(accept_encoding="gzip"), payload).headers
@@ -0,0 +1,168 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+import server
+
+UPDATED_AT = datetime(2026, 5, 1, 12, 0)
+
+
+class ContentCursor:
+    """content_sections and cache_versions as dicts, enough for ContentRegistry.sync."""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        self.db.statements.append(statement)
+        if self.db.down:
+            raise ConnectionError("MySQL server has gone away")
+        if statement.startswith("SELECT version FROM cache_versions"):
+            self.result = [{"version": self.db.versions.get(params[0], 0)}]
+        elif statement.startswith("INSERT INTO cache_versions"):
+            self.db.versions[params[0]] = self.db.versions.get(params[0], 0) + 1
+        elif statement.startswith("INSERT INTO content_sections"):
+            _, page, section, content, updated_at, updated_by = params
+            row = self.db.sections.get((page, section), {"version": 0})
+            self.db.sections[page, section] = {"version": row["version"] + 1, "content": content}
+        elif statement.startswith("SELECT version FROM content_sections"):
+            self.result = [{"version": self.db.sections[params]["version"]}]
+        elif statement == "SELECT page, section, version FROM content_sections":
+            self.result = [{"page": page, "section": section, "version": row["version"]}
+                           for (page, section), row in self.db.sections.items()]
+        elif statement.startswith("SELECT page, section, version, content, updated_at FROM content_sections"):
+            pairs = list(zip(params[::2], params[1::2]))
+            self.result = [{"page": page, "section": section, "updated_at": UPDATED_AT, **self.db.sections[page, section]}
+                           for page, section in pairs]
+        else:
+            raise AssertionError(statement)
+
+    async def fetchone(self):
+        return self.result[0] if self.result else None
+
+    async def fetchall(self):
+        return self.result
+
+
+class ContentDB:
+    def __init__(self):
+        self.sections = {}
+        self.versions = {}
+        self.statements = []
+        self.down = False
+
+    def store(self, page, section, content, raw=None):
+        row = self.sections.get((page, section), {"version": 0})
+        self.sections[page, section] = {"version": row["version"] + 1,
+                                        "content": raw if raw is not None else json.dumps(content)}
+        self.versions["cms"] = self.versions.get("cms", 0) + 1
+
+
+class Connection:
+    def __init__(self, db):
+        self.db = db
+
+    async def cursor(self):
+        return ContentCursor(self.db)
+
+    async def begin(self):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class NoPool:
+    def release(self, conn):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = ContentDB()
+
+    async def connection():
+        return Connection(db)
+
+    monkeypatch.setattr(server, "get_mysql_connection", connection)
+    monkeypatch.setattr(server, "mysql_pool", NoPool())
+    monkeypatch.setattr(server, "CACHE_VERSION_CHECK_INTERVAL", 0)
+    return db
+
+
+def content(registry, key):
+    return json.loads(registry.get(key).body)
+
+
+def fetched_sections(db):
+    return [statement for statement in db.statements
+            if statement.startswith("SELECT page, section, version, content, updated_at")]
+
+
+def test_invalid_json_in_one_row_does_not_block_the_others(db):
+    registry = server.ContentRegistry({"homepage": {"title": "Default"}, "website-texts/footer": {"text": "Default"}})
+    db.store("homepage", "main", None, raw="{not json")
+    db.store("website-texts", "footer", {"text": "Neu"})
+    asyncio.run(registry.sync())
+
+    assert content(registry, "homepage") == {"title": "Default"}
+    assert content(registry, "website-texts/footer") == {"text": "Neu"}
+    assert registry.version == db.versions["cms"]
+
+    # Neither row is fetched again until its version moves
+    db.statements.clear()
+    db.versions["cms"] += 1
+    asyncio.run(registry.sync())
+    assert fetched_sections(db) == []
+
+    db.store("homepage", "main", {"title": "Repariert"})
+    asyncio.run(registry.sync())
+    assert content(registry, "homepage") == {"title": "Repariert"}
+
+
+def test_save_bumps_the_section_version_and_other_workers_reload_only_that_section(db):
+    async def test():
+        editor = server.ContentRegistry({"homepage": {"title": "Default"}, "website-texts/footer": {"text": "Default"}})
+        reader = server.ContentRegistry({"homepage": {"title": "Default"}, "website-texts/footer": {"text": "Default"}})
+        db.store("homepage", "main", {"title": "Alt"})
+        await reader.sync()
+        db.statements.clear()
+
+        assert await editor.save("website-texts/footer", {"text": "Neu", "image_variants": {}}, "admin") == 1
+        assert await editor.save("website-texts/footer", {"text": "Neuer"}, "admin") == 2
+        assert content(editor, "website-texts/footer") == {"text": "Neuer"}
+        await reader.sync()
+        return reader
+
+    reader = asyncio.run(test())
+    assert json.loads(db.sections["website-texts", "footer"]["content"]) == {"text": "Neuer"}
+    assert content(reader, "website-texts/footer") == {"text": "Neuer"}
+    assert content(reader, "homepage") == {"title": "Alt"}
+    # One content fetch, for the footer only
+    assert len(fetched_sections(db)) == 1
+    assert reader.versions == {"homepage": 1, "website-texts/footer": 2}
+
+
+def test_unchanged_cms_version_reads_nothing_but_the_version(db):
+    registry = server.ContentRegistry({"homepage": {"title": "Default"}})
+    db.store("homepage", "main", {"title": "Alt"})
+    asyncio.run(registry.sync())
+    db.statements.clear()
+    asyncio.run(registry.sync())
+    assert db.statements == ["SELECT version FROM cache_versions WHERE name = %s"]
+
+
+def test_last_known_content_is_served_while_mysql_is_down(db):
+    registry = server.ContentRegistry({"homepage": {"title": "Default"}})
+    db.store("homepage", "main", {"title": "Alt"})
+    asyncio.run(registry.sync())
+    db.down = True
+    asyncio.run(registry.sync())
+    assert content(registry, "homepage") == {"title": "Alt"}
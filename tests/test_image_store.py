@@ -0,0 +1,253 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+
+import pytest
+from PIL import Image
+
+import image_store
+import server
+
+
+def png(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 80, 40)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_store, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(image_store, "DERIVED_DIR", tmp_path / "derived")
+    monkeypatch.setattr(image_store, "IMAGE_WIDTHS", [320, 640])
+    pipeline = image_store.DerivativePipeline(1)
+    monkeypatch.setattr(image_store, "image_pipeline", pipeline)
+    monkeypatch.setattr(server, "image_pipeline", pipeline)
+    yield pipeline
+    pipeline.executor.shutdown(wait=True)
+
+
+def test_content_published_before_its_derivatives_is_republished_once_they_exist(pipeline):
+    url = image_store.store_image_bytes(png(800, 600))["image_url"]
+    # Like the import-time defaults: nothing may be scheduled without an event loop
+    registry = server.ContentRegistry({"homepage": {"hero": {"image": url}}})
+    assert pipeline.pending == {}
+    assert "image_variants" not in json.loads(registry.get("homepage").body)
+
+    async def test():
+        built = asyncio.Event()
+
+        async def listener(digest):
+            registry.refresh_images()
+            built.set()
+
+        pipeline.listeners.append(listener)
+        # What the startup sync does for the defaults
+        registry.refresh_images()
+        assert len(pipeline.pending) == 1
+        await asyncio.wait_for(built.wait(), 10)
+
+    asyncio.run(test())
+    variants = json.loads(registry.get("homepage").body)["image_variants"][url]
+    assert variants["width"] == 800 and variants["webp_srcset"].endswith("640w")
+    assert registry.unbuilt == {}
+
+
+class Upload:
+    """Reads like starlette's UploadFile, in the chunk sizes save_upload asks for."""
+
+    def __init__(self, content: bytes, filename: str = "bild.png"):
+        self.file = io.BytesIO(content)
+        self.filename = filename
+        self.reads = []
+
+    async def read(self, size: int) -> bytes:
+        self.reads.append(size)
+        return self.file.read(size)
+
+
+def stored_files(root):
+    return sorted(path.relative_to(root).as_posix() for path in root.rglob("*") if path.is_file())
+
+
+def test_identical_images_are_stored_once_under_their_hash(pipeline, tmp_path):
+    content = png(40, 30)
+    first = image_store.store_image_bytes(content)
+    second = asyncio.run(image_store.save_upload(Upload(content)))
+    digest = hashlib.sha256(content).hexdigest()
+    assert first == second == {"image_url": f"/api/uploads/{digest[:2]}/{digest}.png", "size": len(content),
+                               "sha256": digest}
+    assert stored_files(tmp_path) == [f"{digest[:2]}/{digest}.png"]
+
+
+@pytest.mark.parametrize("header, extension", [
+    (b"\xff\xd8\xff\xe0\x00\x10JFIF", ".jpg"), (b"GIF89a\x01\x00", ".gif"),
+    (b"RIFF\x24\x00\x00\x00WEBPVP8 ", ".webp"), (b"\x00\x00\x00\x1cftypavif", ".avif"),
+])
+def test_type_is_sniffed_from_the_content(pipeline, header, extension):
+    assert image_store.store_image_bytes(header + b"\x00" * 32)["image_url"].endswith(extension)
+
+
+def test_uploads_are_streamed_in_chunks_and_rejected_early(pipeline, tmp_path, monkeypatch):
+    monkeypatch.setattr(image_store, "UPLOAD_MAX_BYTES", 200 * 1024)
+    upload = Upload(png(400, 400) + b"\x00" * 150 * 1024)
+    asyncio.run(image_store.save_upload(upload))
+    assert set(upload.reads) == {image_store.UPLOAD_CHUNK_SIZE}
+
+    uploads = []
+    for content, status in ((b"\x89PNG\r\n\x1a\n" + b"\x00" * 300 * 1024, 413),
+                            (b"<?php echo 'hi';", 415), (b"", 400)):
+        uploads.append(Upload(content))
+        with pytest.raises(image_store.ImageStoreError) as error:
+            asyncio.run(image_store.save_upload(uploads[-1]))
+        assert error.value.status_code == status
+    # The oversized upload stopped reading at the limit and left no temp file behind
+    assert len(uploads[0].reads) == 4
+    assert not [name for name in stored_files(tmp_path) if ".upload-" in name]
+
+
+def test_only_store_urls_are_parsed():
+    digest = "ab" + "0" * 62
+    assert image_store.parse_image_url(f"/api/uploads/ab/{digest}.jpg") == (digest, ".jpg")
+    assert image_store.parse_image_url(f"https://jimmys.example/api/uploads/ab/{digest}.webp?v=2") == (digest, ".webp")
+    for url in (None, 42, "data:image/png;base64,AAAA", f"/api/uploads/ab/{digest}.jpg/../x",
+                f"/api/uploads/cd/{digest[:10]}.jpg", "https://cdn.example/tapas.jpg"):
+        assert image_store.parse_image_url(url) is None
+
+
+class ExternalizeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.updates = []
+        self.result = []
+
+    async def execute(self, statement, params=()):
+        if statement.startswith("SELECT id FROM menu_items WHERE image LIKE"):
+            self.result = [{"id": item_id} for item_id, image in self.rows.items() if image.startswith("data:")]
+        elif statement.startswith("SELECT image FROM menu_items WHERE id = %s"):
+            self.result = [{"image": self.rows[params[0]]}]
+        elif statement.startswith("UPDATE menu_items SET image = %s"):
+            self.rows[params[2]] = params[0]
+            self.updates.append(params[2])
+        else:
+            raise AssertionError(statement)
+
+    async def fetchone(self):
+        return self.result[0]
+
+    async def fetchall(self):
+        return self.result
+
+
+def test_data_urls_in_menu_items_are_moved_into_the_store(pipeline, monkeypatch):
+    import server_mysql
+
+    image = png(50, 50)
+    cursor = ExternalizeCursor({
+        "m1": "data:image/png;base64," + base64.b64encode(image).decode(),
+        "m2": "data:text/plain;base64," + base64.b64encode(b"hello").decode(),
+        "m3": "data:image/png;base64,###",
+        "m4": "/api/uploads/already/stored.png",
+    })
+
+    class Connection:
+        async def cursor(self, cursor_class=None):
+            return cursor
+
+    async def connection():
+        return Connection()
+
+    class NoPool:
+        def release(self, conn):
+            pass
+
+    monkeypatch.setattr(server_mysql, "get_mysql_connection", connection)
+    monkeypatch.setattr(server_mysql, "mysql_pool", NoPool())
+    monkeypatch.setattr(server_mysql, "image_pipeline", pipeline)
+
+    async def test():
+        result = await server_mysql.externalize_menu_images(current_user=None)
+        await asyncio.gather(*pipeline.pending.values())
+        return result
+
+    result = asyncio.run(test())
+    assert result["converted"] == 1 and [failure["id"] for failure in result["failed"]] == ["m2", "m3"]
+    assert cursor.updates == ["m1"]
+    assert cursor.rows["m1"] == image_store.store_image_bytes(image)["image_url"]
+    # Derivatives are queued for the converted image
+    assert pipeline.variants(cursor.rows["m1"]) is not None
+
+
+def rgba_png(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 80, 40, 128)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def built(pipeline, content: bytes):
+    url = image_store.store_image_bytes(content)["image_url"]
+
+    async def build():
+        return await asyncio.gather(pipeline.build(url), pipeline.build(url))
+
+    return url, asyncio.run(build())
+
+
+def test_derivatives_fill_the_width_buckets_without_upscaling(pipeline):
+    for size, widths in (((800, 600), [320, 640]), ((500, 400), [320, 500]), ((200, 100), [200])):
+        url, (variants, again) = built(pipeline, png(*size))
+        digest = image_store.parse_image_url(url)[0]
+        assert variants == again and (variants["width"], variants["height"]) == size
+        assert variants["srcset"] == ", ".join(
+            f"/api/uploads/derived/{digest[:2]}/{digest}-{width}.jpg {width}w" for width in widths)
+        assert variants["webp_srcset"] == variants["srcset"].replace(".jpg", ".webp")
+        for width in widths:
+            with Image.open(image_store.derived_path(digest, f"-{width}.webp")) as image:
+                assert image.size == (width, max(1, round(size[1] * width / size[0])))
+
+
+def test_transparent_images_fall_back_to_png(pipeline):
+    url, (variants, _) = built(pipeline, rgba_png(400, 400))
+    assert variants["srcset"].endswith(".png 400w")
+    digest = image_store.parse_image_url(url)[0]
+    with Image.open(image_store.derived_path(digest, "-320.png")) as image:
+        assert image.mode == "RGBA"
+
+
+def test_broken_and_animated_images_are_recorded_and_not_retried(pipeline, monkeypatch):
+    buffer = io.BytesIO()
+    frames = [Image.new("RGB", (20, 20), color) for color in ((255, 0, 0), (0, 0, 255))]
+    frames[0].save(buffer, "GIF", save_all=True, append_images=frames[1:])
+    for content, error in ((b"\x89PNG\r\n\x1a\n" + b"\x00" * 64, "cannot identify"), (buffer.getvalue(), "animated")):
+        url, (variants, _) = built(pipeline, content)
+        digest = image_store.parse_image_url(url)[0]
+        assert variants is None and error in pipeline.manifest(digest)["error"]
+
+    calls = []
+    monkeypatch.setattr(image_store, "build_derivatives", lambda *args: calls.append(args))
+    assert asyncio.run(pipeline.build(url)) is None and calls == []
+
+
+def test_manifest_written_by_another_worker_is_used_without_rebuilding(pipeline):
+    url, (variants, _) = built(pipeline, png(700, 350))
+    other = image_store.DerivativePipeline(1)
+    try:
+        assert other.variants(url) == variants and other.pending == {}
+    finally:
+        other.executor.shutdown()
+
+
+def test_menu_items_gain_srcset_fields_once_built(pipeline):
+    url = image_store.store_image_bytes(png(900, 600))["image_url"]
+    assert image_store.srcset_fields("https://cdn.example/tapas.jpg") == {}
+
+    async def test():
+        # The first lookup queues the build and answers without a srcset
+        assert image_store.srcset_fields(url) == {}
+        await asyncio.gather(*pipeline.pending.values())
+        return image_store.srcset_fields(url)
+
+    fields = asyncio.run(test())
+    assert fields["image_srcset"].endswith("640w") and fields["image_webp_srcset"].endswith(".webp 640w")
@@ -0,0 +1,154 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+import server_mysql
+from server_mysql import MaintenanceMode, create_access_token, maintenance_state
+
+
+@pytest.fixture
+def maintenance():
+    previous = maintenance_state.mode
+    maintenance_state.set(MaintenanceMode(is_active=True, message="Wir sind gleich zurück"))
+    yield TestClient(server_mysql.app)
+    maintenance_state.set(previous)
+
+
+def test_public_routes_answer_503_without_a_valid_token(maintenance):
+    for headers in ({}, {"Authorization": "x"}, {"Authorization": "Bearer not-a-token"},
+                    {"Authorization": "Bearer " + create_access_token({"sub": "admin"})[:-2] + "xx"}):
+        response = maintenance.get("/api/menu/items", headers=headers)
+        assert response.status_code == 503
+        assert response.json() == {"detail": "Wir sind gleich zurück", "maintenance": True}
+        assert response.headers["Retry-After"] == "300"
+
+
+def test_status_endpoint_stays_reachable(maintenance):
+    response = maintenance.get("/api/maintenance")
+    assert response.status_code == 200 and response.json()["is_active"] is True
+
+
+def request(authorization: str) -> Request:
+    return Request({"type": "http", "headers": [(b"authorization", authorization.encode())]})
+
+
+def test_only_signed_tokens_with_a_subject_pass():
+    assert server_mysql.has_valid_token(request("Bearer " + create_access_token({"sub": "admin"})))
+    assert not server_mysql.has_valid_token(request("Bearer " + create_access_token({"role": "admin"})))
+    assert not server_mysql.has_valid_token(request(create_access_token({"sub": "admin"})))
+    assert not server_mysql.has_valid_token(request("Basic YWRtaW46YWRtaW4="))
+
+
+class MaintenanceCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = None
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        self.db.statements.append(statement)
+        if self.db.down:
+            raise ConnectionError("MySQL server has gone away")
+        if statement.startswith("SELECT is_active, message"):
+            self.result = dict(self.db.row) if self.db.row else None
+        elif statement.startswith("SELECT COUNT(*)"):
+            self.result = (int(self.db.row is not None),)
+        elif statement.startswith("INSERT INTO maintenance_mode"):
+            self.db.row = {"is_active": params[1], "message": params[2], "activated_by": None, "activated_at": None}
+        elif statement.startswith("UPDATE maintenance_mode"):
+            self.db.row = dict(zip(("is_active", "message", "activated_by", "activated_at"), params))
+        else:
+            raise AssertionError(statement)
+
+    async def fetchone(self):
+        return self.result
+
+
+class MaintenanceDB:
+    def __init__(self, row=None):
+        self.row = row
+        self.statements = []
+        self.down = False
+
+
+class Connection:
+    def __init__(self, db):
+        self.db = db
+
+    async def cursor(self, cursor_class=None):
+        return MaintenanceCursor(self.db)
+
+
+class NoPool:
+    def release(self, conn):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = MaintenanceDB()
+
+    async def connection():
+        return Connection(db)
+
+    monkeypatch.setattr(server_mysql, "get_mysql_connection", connection)
+    monkeypatch.setattr(server_mysql, "mysql_pool", NoPool())
+    previous = maintenance_state.mode
+    yield db
+    maintenance_state.set(previous)
+
+
+def test_load_reads_the_row_and_creates_the_default_once(db):
+    asyncio.run(maintenance_state.load())
+    assert maintenance_state.active is False
+    assert db.row["message"] == MaintenanceMode().message
+
+    db.row.update(is_active=True, message="Inventur")
+    asyncio.run(maintenance_state.load())
+    assert maintenance_state.active is True
+    assert json.loads(maintenance_state.body) == {"detail": "Inventur", "maintenance": True}
+    assert len([statement for statement in db.statements if statement.startswith("INSERT")]) == 1
+
+
+def test_background_refresh_picks_up_other_workers_changes_and_survives_errors(db, monkeypatch):
+    monkeypatch.setattr(server_mysql, "MAINTENANCE_REFRESH_INTERVAL", 0.001)
+    db.row = {"is_active": False, "message": "Bald zurück", "activated_by": None, "activated_at": None}
+
+    async def test():
+        task = asyncio.create_task(maintenance_state.refresh_forever())
+        db.down = True
+        await asyncio.sleep(0.01)
+        db.down = False
+        db.row["is_active"] = True
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(test())
+    assert maintenance_state.active is True
+
+
+def test_admin_update_applies_in_this_worker_without_a_reload(db):
+    server_mysql.app.dependency_overrides[server_mysql.get_admin_user] = lambda: server_mysql.User(
+        username="admin", email="admin@example.com", password_hash="x", role="admin")
+    try:
+        client = TestClient(server_mysql.app)
+        response = client.put("/api/admin/maintenance", json={"is_active": True, "message": "Umbau"})
+        assert response.status_code == 200 and response.json()["activated_by"] == "admin"
+        assert db.row["is_active"] is True
+        db.statements.clear()
+        blocked = client.get("/api/menu/items")
+        assert blocked.status_code == 503 and blocked.json()["detail"] == "Umbau"
+        assert client.get("/api/maintenance").json()["message"] == "Umbau"
+        # Answered from memory
+        assert db.statements == []
+    finally:
+        server_mysql.app.dependency_overrides.clear()
+
+
+def test_admin_and_preflight_requests_are_not_blocked(maintenance):
+    # Reaches the route's own auth check instead of the maintenance 503
+    assert maintenance.put("/api/admin/maintenance", json={"is_active": False}).status_code == 403
+    assert maintenance.options("/api/menu/items").status_code != 503
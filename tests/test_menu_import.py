@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from menu_import import MENU_FIELDS, MenuImportError, apply_menu_import, diff_menu, load_menu_items, menu_format
+
+
+def menu_row(item_id, name, category, **fields):
+    row = {field: "" for field in MENU_FIELDS}
+    row.update(vegan=False, vegetarian=False, glutenfree=False, order_index=1)
+    row.update({"id": item_id, "name": name, "category": category, "price": "9,50", "is_active": True, **fields})
+    return row
+
+
+class ImportCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.upserts = []
+        self.deactivated = []
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        if statement.startswith("UPDATE menu_items SET is_active = FALSE"):
+            self.deactivated.append(list(params))
+        else:
+            assert statement.startswith("SELECT id, is_active,") and statement.endswith("FOR UPDATE")
+
+    async def executemany(self, statement, rows):
+        assert " ".join(statement.split()).startswith("INSERT INTO menu_items (id, name,")
+        self.upserts.extend(rows)
+
+    async def fetchall(self):
+        return [dict(row) for row in self.rows]
+
+
+def test_csv_json_and_yaml_files_load_the_same_items():
+    csv_text = ("name;category;price;vegan;order_index\n"
+                "Patatas Bravas;Vorspeisen;8,50 €;ja;\n"
+                "Crema Catalana;Desserts;6,50;nein;7\n")
+    json_text = ('{"items": [{"name": "Patatas Bravas", "category": "Vorspeisen", "price": "8,50", "vegan": true},'
+                 ' {"name": "Crema Catalana", "category": "Desserts", "price": 6.5, "vegan": false, "order_index": 7}]}')
+    yaml_text = ("- {name: Patatas Bravas, category: Vorspeisen, price: '8,50 €', vegan: yes}\n"
+                 "- {name: Crema Catalana, category: Desserts, price: '6,50', vegan: no, order_index: 7}\n")
+    expected = [{"name": "Patatas Bravas", "category": "Vorspeisen", "price": "8,50", "vegan": True, "order_index": 1},
+                {"name": "Crema Catalana", "category": "Desserts", "price": "6,50", "vegan": False, "order_index": 7}]
+    assert load_menu_items(csv_text, "csv") == expected
+    assert load_menu_items(json_text, "json") == expected
+    assert load_menu_items(yaml_text, menu_format("speisekarte.yml")) == expected
+
+
+@pytest.mark.parametrize("text, message", [
+    ('[{"name": "Tapa", "category": "A"}, {"name": " tapa ", "category": "a"}]', "Duplicate menu item in file"),
+    ('[{"name": "Tapa"}]', "Item 1: name and category are required"),
+    ('[{"name": "Tapa", "category": "A", "order_index": "zwei"}]', "Item 1: order_index must be a number"),
+    ('{"menu": []}', "Menu file must contain a list of items"),
+])
+def test_invalid_files_are_rejected(text, message):
+    with pytest.raises(MenuImportError, match=message):
+        load_menu_items(text, "json")
+
+
+def test_unsupported_extension_is_rejected():
+    with pytest.raises(MenuImportError):
+        menu_format("speisekarte.xlsx")
+
+
+def test_diff_writes_only_the_differences():
+    current = [menu_row("m1", "Paella", "Hauptgerichte", description="Mit Huhn"),
+               menu_row("m2", "Gambas", "Vorspeisen", order_index=2),
+               menu_row("m3", "Tortilla", "Vorspeisen", order_index=3),
+               menu_row("m4", "Flan", "Desserts", is_active=False)]
+    items = [{"name": "Paella", "category": "Hauptgerichte", "order_index": 1},
+             {"name": "gambas", "category": "VORSPEISEN", "price": "10,50", "order_index": 2},
+             {"name": "Flan", "category": "Desserts", "order_index": 1},
+             {"name": "Churros", "category": "Desserts", "price": "5,00", "order_index": 4}]
+    diff = diff_menu(current, items)
+
+    assert (diff["inserted"], diff["updated"], diff["unchanged"]) == (1, 2, 1)
+    upserts = {row["name"]: row for row in diff["upserts"]}
+    # Matched on the folded (category, name); the file's spelling is written back
+    assert upserts["gambas"]["id"] == "m2" and upserts["gambas"]["price"] == "10,50"
+    # A listed inactive item comes back; fields missing from the file keep their values
+    assert upserts["Flan"]["id"] == "m4" and upserts["Flan"]["price"] == "9,50"
+    assert upserts["Churros"]["id"] not in {"m1", "m2", "m3", "m4"} and upserts["Churros"]["vegan"] is False
+    assert diff["deactivate"] == ["m3"]
+    assert diff_menu(current, items, deactivate_missing=False)["deactivate"] == []
+
+
+def test_duplicate_rows_left_by_full_reloads_are_deactivated():
+    current = [menu_row("old", "Paella", "Hauptgerichte", is_active=False),
+               menu_row("new", "Paella", "Hauptgerichte"),
+               menu_row("dup", "PAELLA", "Hauptgerichte")]
+    diff = diff_menu(current, [{"name": "Paella", "category": "Hauptgerichte", "order_index": 1}])
+    assert diff["unchanged"] == 1 and diff["deactivate"] == ["dup"]
+
+
+def test_new_item_needs_a_price():
+    with pytest.raises(MenuImportError, match="needs a price"):
+        diff_menu([], [{"name": "Churros", "category": "Desserts", "order_index": 1}])
+
+
+def test_apply_upserts_in_one_statement_and_chunks_deactivations(monkeypatch):
+    import menu_import
+    monkeypatch.setattr(menu_import, "MENU_IMPORT_CHUNK_SIZE", 2)
+    current = [menu_row(f"m{index}", f"Tapa {index}", "Vorspeisen" if index < 3 else "Tapas") for index in range(5)]
+    cursor = ImportCursor(current)
+    items = [{"name": "Tapa 0", "category": "Vorspeisen", "price": "1,00", "order_index": 1},
+             {"name": "Sangría", "category": "Getränke", "price": "6,90", "order_index": 2}]
+    result = asyncio.run(apply_menu_import(cursor, items))
+
+    assert {key: result[key] for key in ("inserted", "updated", "deactivated", "unchanged")} == {
+        "inserted": 1, "updated": 1, "deactivated": 4, "unchanged": 0}
+    assert result["categories"] == ["Getränke", "Tapas", "Vorspeisen"]
+    assert len(cursor.upserts) == 2 and all(row[-1] is True for row in cursor.upserts)
+    assert cursor.deactivated == [["m1", "m2"], ["m3", "m4"]]
+
+
+def test_dry_run_reports_without_writing():
+    cursor = ImportCursor([menu_row("m1", "Paella", "Hauptgerichte")])
+    result = asyncio.run(apply_menu_import(
+        cursor, [{"name": "Churros", "category": "Desserts", "price": "5,00", "order_index": 1}], dry_run=True))
+    assert (result["inserted"], result["deactivated"], result["dry_run"]) == (1, 1, True)
+    assert cursor.upserts == [] and cursor.deactivated == []
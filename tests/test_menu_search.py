@@ -0,0 +1,117 @@
+from menu_search import MenuSearchIndex, fold, query_terms, tokenize
+
+
+def item(item_id, name, category="Inicio / Vorspeisen", description="", ingredients="", allergens="",
+         vegan=False, vegetarian=False, glutenfree=False, order_index=0):
+    return {"id": item_id, "name": name, "category": category, "description": description,
+            "detailed_description": None, "ingredients": ingredients, "allergens": allergens, "origin": None,
+            "price": "9,90", "vegan": vegan, "vegetarian": vegetarian, "glutenfree": glutenfree,
+            "order_index": order_index}
+
+
+MENU = [
+    item("gambas", "Gambas al Ajillo", description="Klassische spanische Knoblauchgarnelen",
+         ingredients="Garnelen, Olivenöl, Knoblauch", allergens="Krustentiere", glutenfree=True, order_index=1),
+    item("bravas", "Patatas Bravas", category="Tapas Vegetarian", description="Kartoffeln mit Aioli",
+         ingredients="Kartoffeln, Tomaten, Aioli", allergens="Eier", vegetarian=True, glutenfree=True,
+         order_index=2),
+    item("jamon", "Jamón Ibérico", description="Iberischer Schinken", ingredients="Schinken, Manchego",
+         allergens="Milch", glutenfree=True, order_index=3),
+    item("ensalada", "Ensalada Mixta", category="Salate", ingredients="Salat, Tomate, Oliven",
+         vegan=True, vegetarian=True, glutenfree=True, order_index=4),
+    item("croquetas", "Croquetas de Jamón", description="Cremige Schinkenkroketten",
+         ingredients="Schinken, Milch, Mehl", allergens="Gluten; Milch", order_index=5),
+]
+
+
+def build(items=MENU):
+    index = MenuSearchIndex()
+    index.refresh([dict(entry) for entry in items])
+    return index
+
+
+def ids(result):
+    return [entry["id"] for entry in result["items"]]
+
+
+def test_fold_removes_diacritics_and_sharp_s():
+    assert fold("Jamón Ibérico") == "jamon iberico"
+    assert fold("Süß") == "suss"
+    assert fold(None) == ""
+
+
+def test_tokenize_drops_filler_words_and_stems():
+    assert tokenize("Gambas al Ajillo mit Tomaten") == ["gamba", "ajillo", "tomat"]
+    assert tokenize("Tomate") == tokenize("Tomaten")
+
+
+def test_last_query_word_is_kept_even_if_it_is_a_filler_word():
+    assert query_terms("gambas al") == ["gamba", "al"]
+
+
+def test_diacritic_insensitive_match():
+    index = build()
+    assert ids(index.search("jamon iberico"))[0] == "jamon"
+    assert ids(index.search("Jamón"))[0] == "jamon"
+
+
+def test_prefix_and_compound_parts():
+    index = build()
+    assert ids(index.search("croq")) == ["croquetas"]
+    assert "gambas" in ids(index.search("garnelen"))
+    assert set(ids(index.search("tomate"))) == {"bravas", "ensalada"}
+
+
+def test_name_hits_rank_above_description_hits():
+    index = build()
+    # "Jamón" in the name of two items, "Schinken" only in their descriptions
+    assert ids(index.search("jamon"))[:2] == ["jamon", "croquetas"]
+
+
+def test_diet_facets_and_counts():
+    index = build()
+    result = index.search("", vegetarian=True, limit=50)
+    assert set(ids(result)) == {"bravas", "ensalada"}
+    # Counts are taken before the diet toggles are applied
+    assert result["facets"]["vegan"] == 1
+    assert result["facets"]["glutenfree"] == 4
+
+
+def test_allergen_exclusion_by_label_prefix():
+    index = build()
+    result = index.search("", exclude_allergens=["milch", "Ei"], limit=50)
+    assert set(ids(result)) == {"gambas", "ensalada"}
+    assert index.search("")["facets"]["allergens"]["Milch"] == 2
+
+
+def test_category_filter_is_folded():
+    index = build()
+    assert ids(index.search("", category="salate")) == ["ensalada"]
+
+
+def test_refresh_only_reindexes_changes():
+    menu = [dict(entry) for entry in MENU]
+    index = build(menu)
+    assert index.refresh(menu) == {"added": 0, "updated": 0, "removed": 0}
+
+    menu[0] = {**menu[0], "name": "Gambas Pil Pil"}
+    assert index.refresh(menu) == {"added": 0, "updated": 1, "removed": 0}
+    assert ids(index.search("pil pil")) == ["gambas"]
+    assert not index.search("ajillo")["total"]
+
+    assert index.refresh(menu[1:]) == {"added": 0, "updated": 0, "removed": 1}
+    assert not index.search("gambas")["total"]
+    assert "Krustentiere" not in index.search("")["facets"]["allergens"]
+
+    # A freed slot is reused without leaking the old item's terms
+    assert index.refresh(menu[1:] + [item("pulpo", "Pulpo a la Gallega")]) == \
+        {"added": 1, "updated": 0, "removed": 0}
+    assert ids(index.search("pulpo")) == ["pulpo"]
+    assert len(index) == len(MENU)
+
+
+def test_limit_and_offset():
+    index = build()
+    everything = ids(index.search("", limit=50))
+    assert ids(index.search("", limit=2, offset=1)) == everything[1:3]
+    assert index.search("", limit=2)["total"] == len(MENU)
@@ -0,0 +1,147 @@
+import asyncio
+import io
+import json
+import os
+import zipfile
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+# The module connects lazily; the URL is only parsed at import
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "jimmys_test")
+
+import server_mongodb_backup as mongo_server  # noqa: E402
+
+ADMIN = mongo_server.User(username="admin", email="admin@example.com", password_hash="x", role="admin")
+CREATED = datetime(2026, 5, 1, 12, 0)
+
+
+class Cursor:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def batch_size(self, size):
+        self.collection.batch_sizes.append(size)
+        return self
+
+    async def __aiter__(self):
+        for doc in self.collection.docs:
+            self.collection.read += 1
+            yield doc
+
+
+class Collection:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.read = 0
+        self.batch_sizes = []
+        self.inserted = []
+
+    def find(self, query):
+        return Cursor(self)
+
+    async def insert_one(self, doc):
+        self.inserted.append(doc)
+
+
+class Database:
+    def __init__(self, collections):
+        self.collections = collections
+        self.backups = Collection()
+
+    async def list_collection_names(self):
+        return list(self.collections)
+
+    def __getitem__(self, name):
+        return self.backups if name == "system_backups" else self.collections[name]
+
+
+def menu_items(count):
+    # Image data URLs make the documents large, as in production
+    return [{"_id": ObjectId(), "id": f"m{index}", "name": f"Tapa {index}", "created_at": CREATED,
+             "image": "data:image/png;base64," + "A" * 5000, "tags": [{"at": CREATED}]}
+            for index in range(count)]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    users = [{"_id": ObjectId(), "username": "ana", "note": "Olé – ñ"}]
+    db = Database({"menu_items": Collection(menu_items(60)), "reviews": Collection(), "users": Collection(users)})
+    monkeypatch.setattr(mongo_server, "db", db)
+    return db
+
+
+@pytest.fixture
+def client():
+    mongo_server.app.dependency_overrides[mongo_server.get_admin_user] = lambda: ADMIN
+    yield TestClient(mongo_server.app)
+    mongo_server.app.dependency_overrides.clear()
+
+
+def test_export_is_yielded_in_bounded_chunks_while_the_cursor_is_read(db):
+    backup_info = {"type": "database"}
+
+    async def test():
+        chunks = []
+        async for chunk in mongo_server.iter_backup_json(list(db.collections), backup_info):
+            chunks.append((chunk, db.collections["menu_items"].read))
+        return chunks
+
+    chunks = asyncio.run(test())
+    assert len(chunks) > 2
+    # The first chunk leaves the generator long before the collection is exhausted
+    assert chunks[0][1] < 60
+    assert all(len(chunk) < mongo_server.BACKUP_CHUNK_SIZE + 6000 for chunk, _ in chunks)
+    assert db.collections["menu_items"].batch_sizes == [mongo_server.BACKUP_BATCH_SIZE]
+
+    export = json.loads(b"".join(chunk for chunk, _ in chunks))
+    assert [len(export["data"][name]) for name in ("menu_items", "reviews", "users")] == [60, 0, 1]
+    item = export["data"]["menu_items"][0]
+    assert item["created_at"] == "2026-05-01T12:00:00" and item["tags"] == [{"at": "2026-05-01T12:00:00"}]
+    assert item["_id"] == str(db.collections["menu_items"].docs[0]["_id"])
+    assert export["data"]["users"][0]["note"] == "Olé – ñ"
+    assert export["backup_info"] == backup_info == {"type": "database", "total_documents": 61}
+
+
+def test_database_backup_download_is_recorded_after_the_stream_completes(db, client):
+    response = client.post("/api/admin/backup/database")
+    assert response.status_code == 200
+    export = response.json()
+    assert export["backup_info"]["total_documents"] == 61
+    assert export["backup_info"]["created_by"] == "admin"
+    [record] = db.backups.inserted
+    assert record["id"] == response.headers["x-backup-id"]
+    assert (record["size_bytes"], record["total_documents"]) == (len(response.content), 61)
+
+
+def test_full_backup_zip_holds_the_streamed_export(db, client):
+    response = client.post("/api/admin/backup/full")
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == ["database.json", "README.txt", "system_info.json"]
+        export = json.loads(archive.read("database.json"))
+        system_info = json.loads(archive.read("system_info.json"))
+        assert "Dokumente: 61" in archive.read("README.txt").decode("utf-8")
+    assert len(export["data"]["menu_items"]) == 60
+    assert system_info["total_documents"] == 61
+    [record] = db.backups.inserted
+    assert (record["size_bytes"], record["includes_media"]) == (len(response.content), True)
+
+
+def test_failed_collection_read_records_no_backup(db):
+    class Broken(Collection):
+        def find(self, query):
+            raise RuntimeError("cursor killed")
+
+    db.collections["reviews"] = Broken()
+
+    async def test():
+        response = await mongo_server.create_database_backup(ADMIN)
+        return [chunk async for chunk in response.body_iterator]
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(test())
+    assert db.backups.inserted == []
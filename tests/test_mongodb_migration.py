@@ -0,0 +1,207 @@
+import asyncio
+import os
+
+import pytest
+from bson import ObjectId
+
+# Read at import; nothing connects until main() runs
+for name, value in {"MONGO_URL": "mongodb://localhost:27017", "DB_NAME": "jimmys_test", "MYSQL_HOST": "localhost",
+                    "MYSQL_PORT": "3306", "MYSQL_USER": "root", "MYSQL_PASSWORD": "",
+                    "MYSQL_DATABASE": "jimmys_test"}.items():
+    os.environ.setdefault(name, value)
+
+import mongodb_to_mysql_migration as migration_script  # noqa: E402
+
+USERS = migration_script.MIGRATIONS[0]
+
+
+class MongoCursor:
+    def __init__(self, collection, query):
+        self.collection = collection
+        self.after = query.get("_id", {}).get("$gt")
+        self.limit_to = None
+
+    def sort(self, key, direction=None):
+        return self
+
+    def limit(self, count):
+        self.limit_to = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def __aiter__(self):
+        docs = [doc for doc in self.collection.docs if self.after is None or doc["_id"] > self.after]
+        for doc in docs[:self.limit_to]:
+            if self.collection.fail_at == doc["id"]:
+                raise ConnectionError("connection closed")
+            self.collection.read += 1
+            yield doc
+
+
+class MongoCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.read = 0
+        self.fail_at = None
+
+    def find(self, query):
+        return MongoCursor(self, query)
+
+
+class MongoDB:
+    def __init__(self, collections):
+        self.collections = collections
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, MongoCollection([]))
+
+
+class MySQLCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.db = conn.db
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        if statement.startswith("SELECT * FROM migration_checkpoints"):
+            checkpoint = self.db.checkpoints.get(params[0])
+            self.result = dict(checkpoint) if checkpoint else None
+        elif statement.startswith("INSERT INTO migration_checkpoints"):
+            name, last_id, rows, completed = params
+            self.conn.pending.append(("checkpoint", name, {"last_id": last_id, "rows_migrated": rows,
+                                                           "completed": completed}))
+        elif statement.startswith("INSERT INTO"):
+            if "bad" in params:
+                raise ValueError("Data too long for column 'username'")
+            self.conn.pending.append(("row", statement.split()[2], params))
+        else:
+            raise AssertionError(statement)
+        if not self.conn.in_transaction:
+            await self.conn.commit()
+
+    async def executemany(self, statement, rows):
+        self.db.batches.append(len(rows))
+        for row in rows:
+            await self.execute(statement, row)
+
+    async def fetchone(self):
+        return self.result
+
+
+class MySQLConnection:
+    """Applies writes on commit so a rolled back batch leaves no trace."""
+
+    def __init__(self, db):
+        self.db = db
+        self.pending = []
+        self.in_transaction = False
+
+    async def cursor(self, cursor_class=None):
+        return MySQLCursor(self)
+
+    async def begin(self):
+        self.in_transaction = True
+
+    async def commit(self):
+        for kind, name, value in self.pending:
+            if kind == "row":
+                self.db.tables.setdefault(name, {})[value[0]] = value
+            else:
+                self.db.checkpoints[name] = value
+        self.pending, self.in_transaction = [], False
+
+    async def rollback(self):
+        self.pending, self.in_transaction = [], False
+
+
+class Acquire:
+    def __init__(self, db):
+        self.conn = MySQLConnection(db)
+
+    async def __aenter__(self):
+        return self.conn
+
+    async def __aexit__(self, *exc):
+        self.conn.pending, self.conn.in_transaction = [], False
+
+
+class MySQLPool:
+    def __init__(self):
+        self.tables = {}
+        self.checkpoints = {}
+        self.batches = []
+
+    def acquire(self):
+        return Acquire(self)
+
+
+def users(count):
+    return [{"_id": ObjectId(), "id": f"u{index:02d}", "username": f"user{index}", "email": f"u{index}@example.com"}
+            for index in range(count)]
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    mongo = MongoDB({"users": MongoCollection(users(25))})
+    monkeypatch.setattr(migration_script, "mongo_db", mongo)
+    monkeypatch.setattr(migration_script, "MIGRATION_BATCH_SIZE", 10)
+    return mongo
+
+
+def migrate(pool, table=USERS, restart=False):
+    return asyncio.run(migration_script.migrate_collection(pool, table, restart, asyncio.Semaphore(1)))
+
+
+def test_collection_is_written_in_batches_with_a_checkpoint_per_batch(mongo):
+    pool = MySQLPool()
+    stats = migrate(pool)
+    assert (stats["rows"], stats["failed"]) == (25, 0)
+    assert pool.batches == [10, 10, 5]
+    assert sorted(pool.tables["users"]) == [f"u{index:02d}" for index in range(25)]
+    assert pool.checkpoints["users"] == {"last_id": None, "rows_migrated": 25, "completed": True}
+
+
+def test_failed_batch_is_retried_row_by_row_and_skips_only_the_bad_row(mongo):
+    mongo["users"].docs[13]["username"] = "bad"
+    pool = MySQLPool()
+    stats = migrate(pool)
+    assert (stats["rows"], stats["failed"]) == (24, 1)
+    assert len(pool.tables["users"]) == 24 and "u13" not in pool.tables["users"]
+
+
+def test_rerun_resumes_after_the_last_committed_batch(mongo):
+    docs = mongo["users"].docs
+    mongo["users"].fail_at = "u15"
+    pool = MySQLPool()
+    with pytest.raises(ConnectionError):
+        migrate(pool)
+    assert pool.checkpoints["users"] == {"last_id": str(docs[9]["_id"]), "rows_migrated": 10, "completed": False}
+    assert len(pool.tables["users"]) == 10
+
+    mongo["users"].fail_at = None
+    mongo["users"].read = 0
+    stats = migrate(pool)
+    assert (stats["resumed_from"], stats["rows"], mongo["users"].read) == (10, 15, 15)
+    assert len(pool.tables["users"]) == 25
+    assert pool.checkpoints["users"]["rows_migrated"] == 25
+
+
+def test_completed_collections_are_skipped_unless_restarted(mongo):
+    pool = MySQLPool()
+    migrate(pool)
+    mongo["users"].read = 0
+    assert migrate(pool)["skipped"] and mongo["users"].read == 0
+    assert migrate(pool, restart=True)["rows"] == 25 and mongo["users"].read == 25
+
+
+def test_sorted_or_limited_selections_are_migrated_whole(mongo, monkeypatch):
+    maintenance = next(table for table in migration_script.MIGRATIONS if table.limit)
+    assert not maintenance.resumable
+    mongo.collections[maintenance.collection] = MongoCollection(
+        [{"_id": ObjectId(), "id": "1", "is_active": True}, {"_id": ObjectId(), "id": "2"}])
+    pool = MySQLPool()
+    assert migrate(pool, maintenance)["rows"] == 1
+    # Only the final "completed" mark, no resumable position
+    assert pool.checkpoints[maintenance.collection] == {"last_id": None, "rows_migrated": 1, "completed": True}
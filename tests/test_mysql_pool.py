@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+class Connection:
+    def __init__(self, idle: float, ping_fails: bool = False):
+        self.idle = idle
+        self.ping_fails = ping_fails
+        self.pings = 0
+
+    @property
+    def last_usage(self):
+        return asyncio.get_running_loop().time() - self.idle
+
+    async def ping(self, reconnect=False):
+        self.pings += 1
+        if self.ping_fails:
+            raise ConnectionError("gone away")
+
+
+class Pool:
+    def __init__(self, conn=None):
+        self.conn = conn
+        self.released = []
+
+    async def acquire(self):
+        if self.conn is None:
+            await asyncio.sleep(10)
+        return self.conn
+
+    def release(self, conn):
+        self.released.append(conn)
+
+
+def acquire(monkeypatch, pool):
+    monkeypatch.setattr(server, "mysql_pool", pool)
+    return asyncio.run(server.get_mysql_connection())
+
+
+def test_recently_used_connection_is_handed_out_without_a_ping(monkeypatch):
+    conn = Connection(idle=1)
+    assert acquire(monkeypatch, Pool(conn)) is conn
+    assert conn.pings == 0
+
+
+def test_idle_connection_is_pinged_first(monkeypatch):
+    conn = Connection(idle=server.MYSQL_POOL_PING_AFTER + 1)
+    assert acquire(monkeypatch, Pool(conn)) is conn
+    assert conn.pings == 1
+
+
+def test_dead_connection_goes_back_to_the_pool_with_a_503(monkeypatch):
+    conn = Connection(idle=server.MYSQL_POOL_PING_AFTER + 1, ping_fails=True)
+    pool = Pool(conn)
+    with pytest.raises(HTTPException) as error:
+        acquire(monkeypatch, pool)
+    assert error.value.status_code == 503 and pool.released == [conn]
+
+
+def test_exhausted_pool_answers_503_after_the_acquire_timeout(monkeypatch):
+    monkeypatch.setattr(server, "MYSQL_POOL_ACQUIRE_TIMEOUT", 0.01)
+    with pytest.raises(HTTPException) as error:
+        acquire(monkeypatch, Pool())
+    assert error.value.status_code == 503
+
+
+def test_pool_falls_back_to_tcp_when_the_socket_is_unavailable(monkeypatch):
+    calls = []
+
+    async def create_pool(**settings):
+        calls.append(settings)
+        if "unix_socket" in settings:
+            raise OSError("no socket")
+        return Pool()
+
+    monkeypatch.setattr(server, "mysql_pool", None)
+    monkeypatch.setattr(server.aiomysql, "create_pool", create_pool)
+    asyncio.run(server.init_mysql_pool())
+    assert isinstance(server.mysql_pool, Pool)
+    assert [("unix_socket" in call, "host" in call) for call in calls] == [(True, False), (False, True)]
+    assert calls[1]["autocommit"] is True and calls[1]["pool_recycle"] == server.MYSQL_POOL_RECYCLE
+    # Already initialised: no second pool
+    asyncio.run(server.init_mysql_pool())
+    assert len(calls) == 2
@@ -0,0 +1,94 @@
+import email
+from email import policy
+
+import pytest
+
+from newsletter_render import (NewsletterRecipientError, NewsletterTemplateError, clean_subscriber_name,
+                               compile_newsletter, compile_template, html_to_text, is_valid_email,
+                               unsubscribe_token, verify_unsubscribe_token)
+
+CONFIG = {"from_email": "newsletter@jimmys-tapasbar.de", "from_name": "Jimmy's Tapas Bar"}
+CONTENT = ("<h1>¡Hola {{name|liebe Gäste}}!</h1>"
+           + "<p>Gambas al Ajillo, Pimientos de Padrón und Crema Catalana – direkt an der Ostsee.</p>" * 5
+           + "<p>Sie erhalten diese E-Mail an {{email}}. <a href=\"{{unsubscribe_url}}\">Abbestellen</a></p>")
+
+
+def renderer(subject="{{name|Hallo}}, die Sommer-Tapas sind da", content=CONTENT, campaign_id="test"):
+    return compile_newsletter(CONFIG, {"id": campaign_id, "subject": subject, "content": content})
+
+
+def parse(raw: bytes):
+    return email.message_from_bytes(raw, policy=policy.default)
+
+
+def parts(message):
+    return [part.get_content().replace("\r\n", "\n").strip() for part in message.iter_parts()]
+
+
+@pytest.mark.parametrize("name", ["", "Anna", "Jürgen", "Zoë <3 & Co", "Ω" * 120])
+def test_quoted_printable_round_trip(name):
+    compiled = renderer()
+    subscriber = {"id": "sub-1", "email": "gast@example.de", "name": name}
+    message = parse(compiled.render(subscriber))
+
+    url = compiled.unsubscribe_url(subscriber)
+    filled = CONTENT.replace("{{name|liebe Gäste}}", (name or "liebe Gäste").replace("&", "&amp;")
+                             .replace("<", "&lt;").replace(">", "&gt;")) \
+        .replace("{{email}}", "gast@example.de").replace("{{unsubscribe_url}}", url)
+    assert parts(message) == [html_to_text(filled), filled.strip()]
+    assert str(message["Subject"]) == f"{name or 'Hallo'}, die Sommer-Tapas sind da"
+    assert message["To"].addresses[0].addr_spec == "gast@example.de"
+    assert message["Message-ID"] == "<test.sub-1@jimmys-tapasbar.de>"
+
+
+def test_encoded_lines_stay_within_rfc_limits():
+    raw = renderer().render({"id": "1", "email": "gast@example.de", "name": "Björn"})
+    assert all(len(line) <= 78 for line in raw.split(b"\r\n"))
+    assert b"\n" not in raw.replace(b"\r\n", b"")
+
+
+@pytest.mark.parametrize("subscriber", [
+    {"id": "1", "email": "gast@example.de", "name": "Eve\r\nBcc: victim@evil.example"},
+    {"id": "2", "email": "gast@example.de", "name": "Eve\nX-Injected: 1"},
+    {"id": "3", "email": "gast@example.de\r\nBcc: victim@evil.example", "name": ""},
+    {"id": "4", "email": "not-an-address", "name": ""},
+    {"id": "5", "email": "gast@example.de", "name": "Tab\x00Null"},
+])
+def test_header_injection_is_rejected(subscriber):
+    with pytest.raises(NewsletterRecipientError):
+        renderer().render(subscriber)
+
+
+def test_rendered_headers_never_contain_injected_lines():
+    raw = renderer().render({"id": "1", "email": "gast@example.de", "name": "Eve Bcc: victim@evil.example"})
+    headers = raw.split(b"\r\n\r\n", 1)[0]
+    assert not any(line.lower().startswith(b"bcc:") for line in headers.split(b"\r\n"))
+
+
+def test_subject_template_with_line_break_is_rejected():
+    with pytest.raises(NewsletterTemplateError):
+        compile_template("Hallo\r\nBcc: x@example.de", "<p>Hi</p>")
+    with pytest.raises(NewsletterTemplateError):
+        renderer(subject="Hallo\nBcc: x@example.de", campaign_id="bad-subject")
+
+
+def test_unknown_placeholder_is_rejected():
+    with pytest.raises(NewsletterTemplateError):
+        compile_template("Hallo {{vorname}}", "<p>Hi</p>")
+
+
+def test_email_validation_and_name_cleaning():
+    assert is_valid_email("gast@example.de")
+    assert is_valid_email("vor.nach+tapas@sub.example.de")
+    assert not is_valid_email("gast@example")
+    assert not is_valid_email("gast example@example.de")
+    assert not is_valid_email("gast@example.de\r\nBcc: x@y.de")
+    assert not is_valid_email(None)
+    assert clean_subscriber_name("Eve\r\nBcc:  x") == "Eve Bcc: x"
+
+
+def test_unsubscribe_token_round_trip():
+    token = unsubscribe_token("sub-42")
+    assert verify_unsubscribe_token(token) == "sub-42"
+    assert verify_unsubscribe_token(token[:-1] + ("0" if token[-1] != "0" else "1")) is None
+    assert verify_unsubscribe_token("garbage") is None
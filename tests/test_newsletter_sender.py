@@ -0,0 +1,254 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import newsletter_sender
+from newsletter_render import compile_newsletter
+
+from tests.smtp_sink import SMTPSink
+
+CAMPAIGN = {"id": "summer", "name": "Sommer", "subject": "Neue Tapas",
+            "content": "<p>Hola {{name|liebe Gäste}}!</p>"}
+
+
+def smtp_config(port: int) -> dict:
+    return {"smtp_server": "127.0.0.1", "smtp_port": port, "use_tls": False,
+            "from_email": "newsletter@jimmys-tapasbar.de", "from_name": "Jimmy's Tapas Bar"}
+
+
+def matches(document: dict, query: dict) -> bool:
+    """The few query operators run_campaign uses."""
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(document, option) for option in condition):
+                return False
+            continue
+        value = document.get(key)
+        if isinstance(condition, dict):
+            for operator, operand in condition.items():
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$lt" and not (value is not None and value < operand):
+                    return False
+                if operator == "$gt" and not (value is not None and value > operand):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def apply_update(document: dict, update: dict):
+    document.update(update.get("$set", {}))
+    for key, amount in update.get("$inc", {}).items():
+        document[key] = document.get(key, 0) + amount
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        self.documents.sort(key=lambda document: document[key], reverse=direction < 0)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        self.iterator = iter(self.documents)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, documents=()):
+        self.documents = [dict(document) for document in documents]
+
+    async def find_one(self, query=None, projection=None):
+        return next((dict(d) for d in self.documents if matches(d, query or {})), None)
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([dict(d) for d in self.documents if matches(d, query or {})])
+
+    async def find_one_and_update(self, query, update, return_document=False):
+        for document in self.documents:
+            if matches(document, query):
+                apply_update(document, update)
+                return dict(document)
+        return None
+
+    async def update_one(self, query, update, upsert=False):
+        for document in self.documents:
+            if matches(document, query):
+                apply_update(document, update)
+                return
+        if upsert:
+            document = dict(query)
+            apply_update(document, update)
+            self.documents.append(document)
+
+    async def distinct(self, key, query):
+        return list({d[key] for d in self.documents if matches(d, query)})
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            await self.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+
+class FakeDB:
+    def __init__(self, **collections):
+        for name in ("newsletter_campaigns", "newsletter_subscribers", "newsletter_deliveries",
+                     "newsletter_templates", "smtp_config"):
+            setattr(self, name, FakeCollection(collections.get(name, ())))
+
+
+def subscribers(count: int) -> list:
+    return [{"_id": i, "id": f"sub-{i}", "email": f"gast{i}@example.de", "name": "", "subscribed": True}
+            for i in range(1, count + 1)]
+
+
+async def with_sink(test, deferrals=None):
+    sink = SMTPSink(deferrals)
+    port = await sink.start()
+    try:
+        return await test(sink, port)
+    finally:
+        await sink.stop()
+
+
+def test_deliver_retries_temporary_failures_and_gives_up_on_permanent_ones():
+    async def test(sink, port):
+        config = smtp_config(port)
+        renderer = compile_newsletter(config, CAMPAIGN)
+        people = [{"id": "1", "email": "greylisted@example.de"}, {"id": "2", "email": "gone@invalid.example"},
+                  {"id": "3", "email": "gast@example.de"}]
+        pool = newsletter_sender.SMTPPool(config, 2)
+        try:
+            results = await newsletter_sender.deliver(pool, newsletter_sender.DomainThrottle(0), [
+                (person["id"], person["email"], renderer.render(person)) for person in people])
+        finally:
+            await pool.close()
+        return sink, {key: status for key, status, _ in results}
+
+    sink, statuses = asyncio.run(with_sink(test, {"greylisted@example.de": 1}))
+    assert statuses == {"1": "sent", "2": "failed", "3": "sent"}
+    assert sorted(recipient for recipient, _ in sink.received) == ["gast@example.de", "greylisted@example.de"]
+
+
+def test_run_campaign_sends_everyone_once_and_records_deliveries(monkeypatch):
+    async def test(sink, port):
+        people = subscribers(7)
+        people[2]["name"] = "Eve\r\nBcc: victim@evil.example"
+        db = FakeDB(newsletter_campaigns=[{**CAMPAIGN, "status": "draft"}], newsletter_subscribers=people,
+                    smtp_config=[smtp_config(port)])
+        stats = await newsletter_sender.run_campaign(db, "summer")
+        return sink, db, stats
+
+    monkeypatch.setattr(newsletter_sender, "NEWSLETTER_BATCH_SIZE", 3)
+    sink, db, stats = asyncio.run(with_sink(test))
+
+    assert (stats["sent"], stats["failed"]) == (6, 1)
+    assert sorted(recipient for recipient, _ in sink.received) == sorted(
+        f"gast{i}@example.de" for i in (1, 2, 4, 5, 6, 7))
+    assert all(b"Bcc:" not in raw for _, raw in sink.received)
+    deliveries = {d["subscriber_id"]: d["status"] for d in db.newsletter_deliveries.documents}
+    assert deliveries["sub-3"] == "failed" and list(deliveries.values()).count("sent") == 6
+    campaign = db.newsletter_campaigns.documents[0]
+    assert campaign["status"] == "sent" and campaign["resume_after"] == 7 and campaign["lease_until"] is None
+
+
+def test_run_campaign_resumes_after_checkpoint_without_resending():
+    async def test(sink, port):
+        expired = datetime.utcnow() - timedelta(seconds=1)
+        db = FakeDB(
+            newsletter_campaigns=[{**CAMPAIGN, "status": "sending", "lease_until": expired, "resume_after": 4}],
+            newsletter_subscribers=subscribers(8),
+            # Sent by the crashed run after its last checkpoint
+            newsletter_deliveries=[{"campaign_id": "summer", "subscriber_id": "sub-5", "status": "sent"}],
+            smtp_config=[smtp_config(port)])
+        assert await newsletter_sender.interrupted_campaign_ids(db) == ["summer"]
+        stats = await newsletter_sender.run_campaign(db, "summer", resume=True)
+        return sink, stats
+
+    sink, stats = asyncio.run(with_sink(test))
+    assert sorted(recipient for recipient, _ in sink.received) == [f"gast{i}@example.de" for i in (6, 7, 8)]
+    assert (stats["sent"], stats["skipped"]) == (3, 1)
+
+
+def test_campaign_with_a_live_lease_is_not_claimed_twice():
+    db = FakeDB(newsletter_campaigns=[{**CAMPAIGN, "status": "sending",
+                                       "lease_until": datetime.utcnow() + timedelta(minutes=1)}])
+    assert asyncio.run(newsletter_sender.claim_campaign(db, "summer")) is None
+    assert asyncio.run(newsletter_sender.interrupted_campaign_ids(db)) == []
+
+
+def test_heartbeat_renews_the_lease(monkeypatch):
+    db = FakeDB(newsletter_campaigns=[{**CAMPAIGN, "status": "sending", "lease_until": datetime.utcnow()}])
+
+    async def test():
+        heartbeat = asyncio.create_task(newsletter_sender.keep_lease(db, "summer"))
+        await asyncio.sleep(0.05)
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+
+    monkeypatch.setattr(newsletter_sender, "NEWSLETTER_LEASE_RENEW_SECONDS", 0.01)
+    asyncio.run(test())
+    lease_until = db.newsletter_campaigns.documents[0]["lease_until"]
+    assert lease_until > datetime.utcnow() + timedelta(seconds=newsletter_sender.NEWSLETTER_LEASE_SECONDS - 5)
+
+
+def test_stop_takes_effect_between_batches_and_resending_continues(monkeypatch):
+    async def test(sink, port):
+        db = FakeDB(newsletter_campaigns=[{**CAMPAIGN, "status": "draft"}], newsletter_subscribers=subscribers(6),
+                    smtp_config=[smtp_config(port)])
+        deliver = newsletter_sender.deliver
+
+        async def deliver_then_stop(pool, throttle, messages):
+            results = await deliver(pool, throttle, messages)
+            # Requested while the first batch is in flight
+            assert await newsletter_sender.request_stop(db, "summer") == "stopping"
+            return results
+
+        monkeypatch.setattr(newsletter_sender, "deliver", deliver_then_stop)
+        await newsletter_sender.run_campaign(db, "summer")
+        campaign = dict(db.newsletter_campaigns.documents[0])
+        monkeypatch.setattr(newsletter_sender, "deliver", deliver)
+        await newsletter_sender.run_campaign(db, "summer")
+        return sink, campaign, db.newsletter_campaigns.documents[0]
+
+    monkeypatch.setattr(newsletter_sender, "NEWSLETTER_BATCH_SIZE", 2)
+    sink, stopped, finished = asyncio.run(with_sink(test))
+    assert (stopped["status"], stopped["resume_after"], stopped["sent_count"]) == ("stopped", 2, 2)
+    assert stopped["lease_until"] is None
+    recipients = [recipient for recipient, _ in sink.received]
+    assert sorted(recipients) == sorted(set(recipients)) == [f"gast{i}@example.de" for i in range(1, 7)]
+    assert (finished["status"], finished["sent_count"]) == ("sent", 6)
+
+
+def test_campaign_that_reached_nobody_is_failed():
+    async def test(sink, port):
+        people = [{**subscriber, "email": f"gast{subscriber['_id']}@invalid.example"} for subscriber in subscribers(3)]
+        db = FakeDB(newsletter_campaigns=[{**CAMPAIGN, "status": "draft"}], newsletter_subscribers=people,
+                    smtp_config=[smtp_config(port)])
+        stats = await newsletter_sender.run_campaign(db, "summer")
+        return stats, db.newsletter_campaigns.documents[0]
+
+    stats, campaign = asyncio.run(with_sink(test))
+    assert (stats["sent"], stats["failed"]) == (0, 3)
+    assert campaign["status"] == "failed" and campaign["error"] and campaign["lease_until"] is None
+
+
+def test_stop_of_a_campaign_whose_run_is_gone_applies_at_once():
+    expired = datetime.utcnow() - timedelta(seconds=1)
+    db = FakeDB(newsletter_campaigns=[{**CAMPAIGN, "status": "sending", "lease_until": expired},
+                                      {**CAMPAIGN, "id": "draft", "status": "draft"}])
+    assert asyncio.run(newsletter_sender.request_stop(db, "summer")) == "stopped"
+    assert db.newsletter_campaigns.documents[0]["status"] == "stopped"
+    assert asyncio.run(newsletter_sender.request_stop(db, "draft")) is None
@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+
+import server
+from cache_versions import bump_menu_versions
+
+
+class VersionCursor:
+    """cache_versions as a dict, enough for PartitionedCache.sync and bump_cache_version."""
+
+    def __init__(self, versions: dict):
+        self.versions = versions
+        self.name = None
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        if statement.startswith("INSERT INTO cache_versions"):
+            self.versions[params[0]] = self.versions.get(params[0], 0) + 1
+        self.name = params[0] if params else None
+
+    async def fetchone(self):
+        return {"version": self.versions[self.name]}
+
+    async def fetchall(self):
+        prefix = self.name + ":"
+        return [{"name": name, "version": version} for name, version in self.versions.items()
+                if name == self.name or name.startswith(prefix)]
+
+
+class VersionConnection:
+    def __init__(self, versions: dict):
+        self.versions = versions
+
+    async def cursor(self):
+        return VersionCursor(self.versions)
+
+
+class NoPool:
+    def release(self, conn):
+        pass
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    shared = {}
+
+    async def connection():
+        return VersionConnection(shared)
+
+    monkeypatch.setattr(server, "get_mysql_connection", connection)
+    monkeypatch.setattr(server, "mysql_pool", NoPool())
+    monkeypatch.setattr(server, "CACHE_VERSION_CHECK_INTERVAL", 0)
+    return shared
+
+
+def builder(log: list, value, delay: float = 0):
+    async def build():
+        log.append(value)
+        await asyncio.sleep(delay)
+        return value
+    return build
+
+
+def test_invalidate_rebuilds_only_the_touched_category(versions):
+    async def test():
+        cache, built = server.PartitionedCache("menu_category"), []
+        for category in ("Paella", "Salate"):
+            await cache.get_or_build(category, builder(built, category))
+        await cache.get_or_build(None, builder(built, "index"))
+        await cache.invalidate(VersionCursor(versions), ["Paella", None])
+        for category in ("Paella", "Salate"):
+            await cache.get_or_build(category, builder(built, category))
+        await cache.get_or_build(None, builder(built, "index"))
+        return built
+
+    assert asyncio.run(test()) == ["Paella", "Salate", "index", "Paella", "index"]
+
+
+def test_category_keys_are_case_and_accent_insensitive():
+    cache = server.PartitionedCache("menu_category")
+    assert cache.version_name("Paella") == cache.version_name("paella ")
+    assert cache.version_name("Heißgetränke") == cache.version_name("HEISSGETRANKE")
+    assert cache.version_name("Paella") != cache.version_name("Salate")
+    assert len(cache.version_name("x" * 100)) <= 50
+
+
+def test_other_workers_drop_only_bumped_categories(versions):
+    async def test():
+        worker, other, built = server.PartitionedCache("menu_category"), server.PartitionedCache("menu_category"), []
+        for category in ("Paella", "Salate"):
+            await worker.get_or_build(category, builder(built, category))
+        await other.invalidate(VersionCursor(versions), ["Salate"])
+        for category in ("Paella", "Salate"):
+            await worker.get_or_build(category, builder(built, category))
+        await other.invalidate_all(VersionCursor(versions))
+        await worker.get_or_build("Paella", builder(built, "Paella"))
+        return built
+
+    assert asyncio.run(test()) == ["Paella", "Salate", "Salate", "Paella"]
+
+
+def test_command_line_import_drops_the_touched_categories_and_the_list(versions):
+    async def test():
+        worker, built = server.PartitionedCache("menu_category"), []
+        for category in ("Paella", "Salate"):
+            await worker.get_or_build(category, builder(built, category))
+        await worker.get_or_build(None, builder(built, "index"))
+        # menu_import.py's main() after committing an import that touched Paella
+        await bump_menu_versions(VersionCursor(versions), ["paella"])
+        for category in ("Paella", "Salate"):
+            await worker.get_or_build(category, builder(built, category))
+        await worker.get_or_build(None, builder(built, "index"))
+        return built
+
+    assert asyncio.run(test()) == ["Paella", "Salate", "index", "Paella", "index"]
+    assert versions["menu"] == 1
+
+
+def test_categories_build_in_parallel_and_unrelated_writes_keep_results(versions):
+    async def test():
+        cache, built = server.PartitionedCache("menu_category"), []
+        running = [0, 0]  # now, peak
+
+        def tracked(value):
+            async def build():
+                running[0] += 1
+                running[1] = max(running)
+                await asyncio.sleep(0.02)
+                running[0] -= 1
+                built.append(value)
+                return value
+            return build
+
+        async def write_paella():
+            await asyncio.sleep(0.005)
+            await cache.invalidate(VersionCursor(versions), ["Paella"])
+
+        await asyncio.gather(*(cache.get_or_build(name, tracked(name)) for name in ("Paella", "Salate", "Pasta")),
+                             write_paella())
+        return cache, running[1]
+
+    cache, peak = asyncio.run(test())
+    assert peak == 3
+    # The Paella build started before the write and is stale; the others are kept
+    assert sorted(cache.payloads.values()) == ["Pasta", "Salate"]
+    assert cache._locks == {}
+
+
+def test_missing_category_is_not_cached(versions):
+    async def test():
+        cache, built = server.PartitionedCache("menu_category"), []
+        for _ in range(2):
+            assert await cache.get_or_build("Nope", builder(built, None)) is None
+        return built
+
+    assert asyncio.run(test()) == [None, None]
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import threading
+import time
+
+from fastapi import HTTPException
+
+import server
+
+
+class RecordingContext:
+    """Stands in for the bcrypt CryptContext and records the thread of every call."""
+
+    def __init__(self):
+        self.threads = []
+
+    def hash(self, password):
+        self.threads.append(threading.get_ident())
+        return "hashed:" + password
+
+    def verify(self, password, hashed):
+        self.threads.append(threading.get_ident())
+        return hashed == "hashed:" + password
+
+
+def test_hash_and_verify_run_in_the_pool_off_the_event_loop(monkeypatch):
+    context = RecordingContext()
+    monkeypatch.setattr(server, "pwd_context", context)
+
+    async def test():
+        hashed = await server.get_password_hash("geheim")
+        return (threading.get_ident(), await server.verify_password("geheim", hashed),
+                await server.verify_password("falsch", hashed))
+
+    loop_thread, right, wrong = asyncio.run(test())
+    assert (right, wrong) == (True, False)
+    assert len(context.threads) == 3 and loop_thread not in context.threads
+
+
+def test_event_loop_keeps_running_while_hashes_are_computed():
+    hasher = server.PasswordHasher(workers=2, max_queue=4)
+
+    async def test():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await asyncio.gather(*(hasher.run(time.sleep, 0.1) for _ in range(2)))
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(test()) >= 5
+    hasher.executor.shutdown()
+
+
+def test_full_queue_is_rejected_with_503_and_counted():
+    hasher = server.PasswordHasher(workers=1, max_queue=2)
+
+    async def test():
+        results = await asyncio.gather(*(hasher.run(time.sleep, 0.05) for _ in range(3)), return_exceptions=True)
+        return results
+
+    results = asyncio.run(test())
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    assert len(rejected) == 1 and rejected[0].status_code == 503 and rejected[0].headers == {"Retry-After": "1"}
+    metrics = hasher.metrics()
+    assert (metrics["completed"], metrics["rejected"], metrics["pending"]) == (2, 1, 0)
+    assert metrics["max_ms"] >= 50
+    # Each uvicorn worker reports its own pool
+    assert metrics["pid"] == os.getpid()
+    hasher.executor.shutdown()
@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+class VersionCursor:
+    """cache_versions only, enough for PrincipalCache.sync and invalidate."""
+
+    def __init__(self, versions):
+        self.versions = versions
+        self.result = []
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        if statement.startswith("INSERT INTO cache_versions"):
+            self.versions[params[0]] = self.versions.get(params[0], 0) + 1
+        elif statement.startswith("SELECT version FROM cache_versions"):
+            self.result = [{"version": self.versions[params[0]]}] if params[0] in self.versions else []
+        else:
+            raise AssertionError(statement)
+
+    async def fetchone(self):
+        return self.result[0] if self.result else None
+
+
+class Connection:
+    def __init__(self, versions):
+        self.versions = versions
+
+    async def cursor(self):
+        return VersionCursor(self.versions)
+
+
+class NoPool:
+    def release(self, conn):
+        pass
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    versions = {}
+
+    async def connection():
+        return Connection(versions)
+
+    monkeypatch.setattr(server, "get_mysql_connection", connection)
+    monkeypatch.setattr(server, "mysql_pool", NoPool())
+    monkeypatch.setattr(server, "CACHE_VERSION_CHECK_INTERVAL", 0)
+    return versions
+
+
+def user(name, role="admin"):
+    return server.User(id="id-" + name, username=name, email=name + "@example.com", role=role)
+
+
+def loader(log: list, delay: float = 0, users=None):
+    async def load(username):
+        log.append(username)
+        await asyncio.sleep(delay)
+        return (users or {}).get(username, user(username))
+    return load
+
+
+def test_concurrent_requests_share_one_lookup_and_later_ones_hit_the_cache(versions):
+    cache, loads = server.PrincipalCache(ttl=60, max_size=8), []
+
+    async def test():
+        first = await asyncio.gather(*(cache.get_or_load("ana", loader(loads, 0.01)) for _ in range(5)))
+        return first + [await cache.get_or_load("ana", loader(loads))]
+
+    results = asyncio.run(test())
+    assert loads == ["ana"]
+    assert all(result is results[0] for result in results)
+
+
+def test_entries_expire_after_the_ttl(versions):
+    cache, loads = server.PrincipalCache(ttl=0.01, max_size=8), []
+
+    async def test():
+        await cache.get_or_load("ana", loader(loads))
+        await asyncio.sleep(0.02)
+        await cache.get_or_load("ana", loader(loads))
+
+    asyncio.run(test())
+    assert loads == ["ana", "ana"]
+
+
+def test_least_recently_used_entry_is_evicted(versions):
+    cache, loads = server.PrincipalCache(ttl=60, max_size=2), []
+
+    async def test():
+        for name in ("ana", "ben", "ana", "cleo", "ana", "ben"):
+            await cache.get_or_load(name, loader(loads))
+
+    asyncio.run(test())
+    # "ben" was the oldest when "cleo" arrived
+    assert loads == ["ana", "ben", "cleo", "ben"]
+    assert list(cache.entries) == ["ana", "ben"]
+
+
+def test_unknown_users_and_failed_lookups_are_not_cached(versions):
+    cache, loads = server.PrincipalCache(ttl=60, max_size=8), []
+
+    async def failing(username):
+        loads.append(username)
+        raise ConnectionError("MySQL server has gone away")
+
+    async def test():
+        assert await cache.get_or_load("ghost", loader(loads, users={"ghost": None})) is None
+        assert await cache.get_or_load("ghost", loader(loads, users={"ghost": None})) is None
+        with pytest.raises(ConnectionError):
+            await cache.get_or_load("ana", failing)
+        assert (await cache.get_or_load("ana", loader(loads))).username == "ana"
+
+    asyncio.run(test())
+    assert loads == ["ghost", "ghost", "ana", "ana"]
+    assert cache.inflight == {}
+
+
+def test_invalidate_drops_the_user_here_and_in_other_workers(versions):
+    worker, other = server.PrincipalCache(ttl=60, max_size=8), server.PrincipalCache(ttl=60, max_size=8)
+    loads = []
+
+    async def test():
+        for cache in (worker, other):
+            await cache.get_or_load("ana", loader(loads))
+            await cache.get_or_load("ben", loader(loads))
+        await worker.invalidate(VersionCursor(versions), "id-ana")
+        assert list(worker.entries) == ["ben"]
+        # The other worker sees the bumped "users" row and starts over
+        await other.get_or_load("ben", loader(loads))
+
+    asyncio.run(test())
+    assert versions["users"] == 1
+    assert loads == ["ana", "ben", "ana", "ben", "ben"]
+
+
+def test_lookup_overlapping_an_invalidation_is_not_cached(versions):
+    cache, loads = server.PrincipalCache(ttl=60, max_size=8), []
+
+    async def test():
+        async def deactivate():
+            await asyncio.sleep(0.005)
+            await cache.invalidate(VersionCursor(versions), "id-ana")
+
+        await asyncio.gather(cache.get_or_load("ana", loader(loads, 0.02)), deactivate())
+        await cache.get_or_load("ana", loader(loads))
+
+    asyncio.run(test())
+    assert loads == ["ana", "ana"]
@@ -0,0 +1,128 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import Request
+
+import server
+
+MENU_ROW = {"id": "m1", "name": "Paella Valenciana", "description": "Mit Huhn", "detailed_description": None,
+            "price": "18,90", "category": "Paella", "origin": None, "allergens": None, "additives": None,
+            "preparation_method": None, "ingredients": None, "image": None, "vegan": False,
+            "vegetarian": False, "glutenfree": True, "order_index": 1, "is_active": True}
+
+
+class MenuCursor:
+    """cache_versions and menu_items, enough for ResponseCache and build_menu_items_payload."""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        self.db.statements.append(statement)
+        if statement.startswith("INSERT INTO cache_versions"):
+            self.db.versions[params[0]] = self.db.versions.get(params[0], 0) + 1
+        elif statement.startswith("SELECT version FROM cache_versions"):
+            self.result = [{"version": self.db.versions[params[0]]}] if params[0] in self.db.versions else []
+        elif statement.startswith("SELECT * FROM menu_items"):
+            self.result = [dict(row) for row in self.db.menu]
+        else:
+            raise AssertionError(statement)
+
+    async def fetchone(self):
+        return self.result[0] if self.result else None
+
+    async def fetchall(self):
+        return self.result
+
+
+class MenuDB:
+    def __init__(self):
+        self.menu = [MENU_ROW]
+        self.versions = {}
+        self.statements = []
+
+    def selects(self):
+        return sum(statement.startswith("SELECT * FROM menu_items") for statement in self.statements)
+
+
+class Connection:
+    def __init__(self, db):
+        self.db = db
+
+    async def cursor(self):
+        return MenuCursor(self.db)
+
+
+class NoPool:
+    def release(self, conn):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = MenuDB()
+
+    async def connection():
+        return Connection(db)
+
+    monkeypatch.setattr(server, "get_mysql_connection", connection)
+    monkeypatch.setattr(server, "mysql_pool", NoPool())
+    monkeypatch.setattr(server, "menu_cache", server.ResponseCache("menu"))
+    return db
+
+
+def builder(log: list, value, delay: float = 0):
+    async def build():
+        log.append(value)
+        await asyncio.sleep(delay)
+        return value
+    return build
+
+
+def test_menu_is_built_once_and_served_from_memory(db):
+    async def test():
+        request = Request({"type": "http", "headers": []})
+        responses = await asyncio.gather(*(server.get_menu_items(request) for _ in range(5)))
+        return responses + [await server.get_menu_items(request)]
+
+    responses = asyncio.run(test())
+    assert db.selects() == 1
+    assert json.loads(responses[0].body) == [server.MenuItem(**MENU_ROW).model_dump(mode="json")]
+    assert len({response.body for response in responses}) == 1
+
+
+def test_invalidate_rebuilds_here_and_after_the_interval_in_other_workers(db, monkeypatch):
+    async def test():
+        worker, other, built = server.ResponseCache("menu"), server.ResponseCache("menu"), []
+        await worker.get_or_build("items", builder(built, "worker v0"))
+        await other.get_or_build("items", builder(built, "other v0"))
+        await worker.invalidate(MenuCursor(db))
+        await worker.get_or_build("items", builder(built, "worker v1"))
+        # Within the check interval the other worker still serves its copy
+        monkeypatch.setattr(server, "CACHE_VERSION_CHECK_INTERVAL", 60)
+        assert await other.get_or_build("items", builder(built, "other v1")) == "other v0"
+        monkeypatch.setattr(server, "CACHE_VERSION_CHECK_INTERVAL", 0)
+        assert await other.get_or_build("items", builder(built, "other v1")) == "other v1"
+        return built
+
+    assert asyncio.run(test()) == ["worker v0", "other v0", "worker v1", "other v1"]
+
+
+def test_build_overlapping_a_write_is_not_cached(db, monkeypatch):
+    monkeypatch.setattr(server, "CACHE_VERSION_CHECK_INTERVAL", 60)
+
+    async def test():
+        cache, built = server.ResponseCache("menu"), []
+
+        async def write():
+            await asyncio.sleep(0.005)
+            await cache.invalidate(MenuCursor(db))
+
+        first, _ = await asyncio.gather(cache.get_or_build("items", builder(built, "stale", 0.02)), write())
+        second = await cache.get_or_build("items", builder(built, "fresh"))
+        return first, second, built
+
+    assert asyncio.run(test()) == ("stale", "fresh", ["stale", "fresh"])
@@ -0,0 +1,145 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+START = datetime(2026, 5, 1, 12, 0)
+
+
+class ReviewCursor:
+    """Evaluates the keyset query of get_reviews_page over a list of review rows."""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        self.db.statements.append((statement, params))
+        assert statement.startswith("SELECT ") and statement.endswith("ORDER BY date DESC, id DESC LIMIT %s")
+        columns = statement[len("SELECT "):statement.index(" FROM reviews")].split(", ")
+        params, limit = list(params[:-1]), params[-1]
+        rows = self.db.reviews
+        if "is_approved = TRUE" in statement:
+            rows = [row for row in rows if row["is_approved"]]
+        if "rating = %s" in statement:
+            rating = params.pop(0)
+            rows = [row for row in rows if row["rating"] == rating]
+        if "date < %s" in statement:
+            last_date, _, last_id = params
+            rows = [row for row in rows
+                    if row["date"] < last_date or (row["date"] == last_date and row["id"] < last_id)]
+        rows = sorted(rows, key=lambda row: (row["date"], row["id"]), reverse=True)[:limit]
+        self.result = [{column: row[column] for column in columns} for row in rows]
+
+    async def fetchall(self):
+        return self.result
+
+
+class ReviewDB:
+    def __init__(self):
+        self.statements = []
+        # Pairs of reviews share a timestamp so the id has to break ties
+        self.reviews = [{"id": f"r{index:02d}", "customer_name": f"Gast {index}", "rating": index % 5 + 1,
+                         "comment": "Lecker", "date": START + timedelta(minutes=index // 2),
+                         "is_approved": index % 3 != 0}
+                        for index in range(25)]
+
+
+class Connection:
+    def __init__(self, db):
+        self.db = db
+
+    async def cursor(self):
+        return ReviewCursor(self.db)
+
+
+class NoPool:
+    def release(self, conn):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = ReviewDB()
+
+    async def connection():
+        return Connection(db)
+
+    monkeypatch.setattr(server, "get_mysql_connection", connection)
+    monkeypatch.setattr(server, "mysql_pool", NoPool())
+    return db
+
+
+@pytest.fixture
+def client():
+    return TestClient(server.app)
+
+
+def walk(client, **query):
+    pages, cursor = [], None
+    while True:
+        params = dict(query, **({"cursor": cursor} if cursor else {}))
+        response = client.get("/api/reviews/page", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        pages.append([item["id"] for item in page["items"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def expected_ids(db, keep=lambda row: True):
+    rows = sorted((row for row in db.reviews if keep(row)), key=lambda row: (row["date"], row["id"]), reverse=True)
+    return [row["id"] for row in rows]
+
+
+def test_pages_cover_every_review_once_in_order_across_equal_dates(db, client):
+    pages = walk(client, approved_only=False, limit=4)
+    assert [len(page) for page in pages] == [4] * 6 + [1]
+    assert sum(pages, []) == expected_ids(db)
+
+
+def test_filters_apply_to_every_page(db, client):
+    pages = walk(client, limit=2, rating=2)
+    assert len(pages) == 2
+    assert sum(pages, []) == expected_ids(db, lambda row: row["is_approved"] and row["rating"] == 2)
+    assert all("is_approved = TRUE" in statement and "rating = %s" in statement
+               for statement, _ in db.statements)
+
+
+def test_the_last_full_page_has_no_next_cursor(db, client):
+    db.reviews = db.reviews[:4]
+    page = client.get("/api/reviews/page", params={"approved_only": False, "limit": 4}).json()
+    assert len(page["items"]) == 4 and page["next_cursor"] is None
+    # One extra row is read to tell whether another page exists
+    assert db.statements[0][1][-1] == 5
+
+
+def test_limit_is_clamped(db, client):
+    client.get("/api/reviews/page", params={"limit": 0})
+    client.get("/api/reviews/page", params={"limit": 5000})
+    assert [params[-1] for _, params in db.statements] == [2, server.REVIEWS_PAGE_MAX + 1]
+
+
+def test_fields_select_columns_but_the_sort_key_is_still_read(db, client):
+    page = client.get("/api/reviews/page", params={"fields": "rating, comment", "limit": 2}).json()
+    assert [set(item) for item in page["items"]] == [{"rating", "comment"}] * 2
+    assert db.statements[0][0].startswith("SELECT rating, comment, date, id FROM reviews")
+    assert page["next_cursor"] is not None
+
+    response = client.get("/api/reviews/page", params={"fields": "rating,password"})
+    assert response.status_code == 400 and response.json()["detail"] == "Unknown fields: password"
+
+
+def test_cursor_round_trips_and_garbage_is_a_400(db, client):
+    review = {"id": "r07", "date": START + timedelta(minutes=3, microseconds=5)}
+    assert server.decode_review_cursor(server.encode_review_cursor(review)) == (review["date"], "r07")
+    for cursor in ("not-base64!", base64.urlsafe_b64encode(b"[1]").decode(), base64.urlsafe_b64encode(b'["x", 1]').decode()):
+        response = client.get("/api/reviews/page", params={"cursor": cursor})
+        assert response.status_code == 400, cursor
+        assert response.json()["detail"] == "Invalid cursor"
+    assert db.statements == []
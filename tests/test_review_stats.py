@@ -0,0 +1,171 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+ADMIN = server.User(id="u1", username="admin", email="admin@example.com", role="admin")
+
+
+class StatsCursor:
+    """reviews, review_stats and cache_versions, enough for the review write paths."""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+        self.rowcount = 0
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        self.db.statements.append(statement)
+        if statement.startswith("INSERT INTO reviews"):
+            review_id, customer_name, rating, comment, date, is_approved = params
+            self.db.reviews[review_id] = {"rating": rating, "is_approved": is_approved}
+        elif statement.startswith("SELECT id, rating, is_approved FROM reviews WHERE id IN"):
+            self.result = [{"id": review_id, **self.db.reviews[review_id]}
+                           for review_id in params if review_id in self.db.reviews]
+        elif statement.startswith("SELECT rating, is_approved FROM reviews WHERE id = %s"):
+            review = self.db.reviews.get(params[0])
+            self.result = [dict(review)] if review else []
+        elif statement.startswith("UPDATE reviews SET is_approved = TRUE"):
+            for review_id in params:
+                self.db.reviews[review_id]["is_approved"] = True
+            self.rowcount = len(params)
+        elif statement.startswith("DELETE FROM reviews"):
+            for review_id in params:
+                del self.db.reviews[review_id]
+            self.rowcount = len(params)
+        elif statement.startswith("INSERT INTO review_stats"):
+            rating, delta, updated_at = params
+            count = self.db.stats.get(rating, {"review_count": 0})["review_count"]
+            self.db.stats[rating] = {"review_count": max(count + delta, 0), "updated_at": updated_at}
+        elif statement == "SELECT rating, review_count, updated_at FROM review_stats":
+            self.result = [{"rating": rating, **row} for rating, row in self.db.stats.items()]
+        elif statement.startswith("INSERT INTO cache_versions"):
+            self.db.versions[params[0]] = self.db.versions.get(params[0], 0) + 1
+        elif statement.startswith("SELECT version FROM cache_versions"):
+            self.result = [{"version": self.db.versions[params[0]]}] if params[0] in self.db.versions else []
+        else:
+            raise AssertionError(statement)
+
+    async def fetchone(self):
+        return self.result[0] if self.result else None
+
+    async def fetchall(self):
+        return self.result
+
+
+class StatsDB:
+    def __init__(self):
+        self.reviews = {}
+        self.stats = {}
+        self.versions = {}
+        self.statements = []
+
+    def histogram(self):
+        """What a full scan of the approved reviews would report."""
+        histogram = {str(rating): 0 for rating in range(1, 6)}
+        for review in self.reviews.values():
+            if review["is_approved"]:
+                histogram[str(review["rating"])] += 1
+        return histogram
+
+    def scans(self):
+        return sum(statement.startswith("SELECT rating, review_count") for statement in self.statements)
+
+
+class Connection:
+    def __init__(self, db):
+        self.db = db
+
+    async def cursor(self):
+        return StatsCursor(self.db)
+
+    async def begin(self):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class NoPool:
+    def release(self, conn):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = StatsDB()
+
+    async def connection():
+        return Connection(db)
+
+    monkeypatch.setattr(server, "get_mysql_connection", connection)
+    monkeypatch.setattr(server, "mysql_pool", NoPool())
+    monkeypatch.setattr(server, "review_stats_cache", server.ResponseCache("review_stats"))
+    monkeypatch.setattr(server, "CACHE_VERSION_CHECK_INTERVAL", 3600)
+    return db
+
+
+@pytest.fixture
+def client():
+    server.app.dependency_overrides[server.get_current_user] = lambda: ADMIN
+    yield TestClient(server.app)
+    server.app.dependency_overrides.clear()
+
+
+def submit(client, rating):
+    return client.post("/api/reviews", json={"customer_name": "Gast", "rating": rating, "comment": "Gut"}).json()["id"]
+
+
+def test_stats_follow_approvals_and_deletes_without_scanning_reviews(db, client):
+    empty = client.get("/api/reviews/stats").json()
+    assert (empty["count"], empty["average"], empty["last_updated"]) == (0, None, None)
+
+    ids = [submit(client, rating) for rating in (5, 5, 4, 2)]
+    # Pending reviews are not counted
+    assert client.get("/api/reviews/stats").json()["count"] == 0
+    for review_id in ids:
+        assert client.put(f"/api/reviews/{review_id}/approve").status_code == 200
+    # Approving twice counts once
+    client.put(f"/api/reviews/{ids[0]}/approve")
+    client.delete(f"/api/admin/reviews/{ids[3]}")
+
+    stats = client.get("/api/reviews/stats").json()
+    assert stats["histogram"] == db.histogram() == {"1": 0, "2": 0, "3": 0, "4": 1, "5": 2}
+    assert (stats["count"], stats["rating_sum"], stats["average"]) == (3, 14, 4.67)
+    assert stats["last_updated"] is not None
+    assert not any("FROM reviews WHERE is_approved" in statement or "COUNT(" in statement
+                   for statement in db.statements)
+
+
+def test_bulk_operations_adjust_the_counts_in_one_pass(db, client):
+    ids = [submit(client, rating) for rating in (3, 3, 1)]
+    result = client.post("/api/admin/reviews/bulk-approve", json={"ids": ids + ["missing"]}).json()
+    assert result["counts"] == {"approved": 3, "not_found": 1}
+    assert client.get("/api/reviews/stats").json()["histogram"] == db.histogram()
+    client.post("/api/admin/reviews/bulk-delete", json={"ids": ids[:2]})
+    assert client.get("/api/reviews/stats").json()["histogram"] == db.histogram() == {
+        "1": 1, "2": 0, "3": 0, "4": 0, "5": 0}
+
+
+def test_stats_are_built_once_until_a_write_invalidates_them(db, client):
+    for _ in range(3):
+        client.get("/api/reviews/stats")
+    assert db.scans() == 1
+    client.put(f"/api/reviews/{submit(client, 4)}/approve")
+    client.get("/api/reviews/stats")
+    assert db.scans() == 2
+
+    # Deleting a pending review leaves the stats and their cache alone
+    client.delete(f"/api/admin/reviews/{submit(client, 1)}")
+    client.get("/api/reviews/stats")
+    assert db.scans() == 2
+
+
+def test_counts_never_go_negative(db, client):
+    db.reviews["r1"] = {"rating": 5, "is_approved": True}
+    client.delete("/api/admin/reviews/r1")
+    assert db.stats[5]["review_count"] == 0
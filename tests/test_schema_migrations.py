@@ -0,0 +1,141 @@
+import asyncio
+
+import aiomysql
+import pytest
+
+import server
+
+
+class SchemaCursor:
+    """Records DDL and answers the bookkeeping queries of migrate_schema and init_database."""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        self.db.statements.append(statement)
+        self.result = []
+        if statement.startswith("SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations"):
+            self.result = [{"version": max(self.db.applied, default=0)}]
+        elif statement.startswith("INSERT INTO schema_migrations"):
+            self.db.applied.append(params[0])
+        elif "FROM information_schema.COLUMNS" in statement:
+            self.result = [{"count": int(params in self.db.columns)}]
+        elif statement.startswith("ALTER TABLE"):
+            _, _, table, _, _, column = statement.split()[:6]
+            self.db.columns.add((table, column))
+        elif statement.startswith("SELECT GET_LOCK"):
+            self.result = [{"locked": self.db.lock_results.pop(0)}]
+            if not self.result[0]["locked"] and self.db.migrated_elsewhere:
+                self.db.applied.append(server.SCHEMA_VERSION)
+        elif statement.startswith("SELECT (SELECT MAX(version) FROM schema_migrations) AS version"):
+            if not self.db.applied:
+                raise aiomysql.ProgrammingError(1146, "Table 'schema_migrations' doesn't exist")
+            self.result = [{"version": max(self.db.applied), "has_admin": 1, "has_menu": 1}]
+        elif statement.startswith("SELECT COUNT(*) as count FROM"):
+            self.result = [{"count": 1}]
+
+    async def fetchone(self):
+        return self.result[0] if self.result else None
+
+
+class SchemaDB:
+    def __init__(self):
+        self.statements = []
+        self.applied = []
+        self.columns = set()
+        self.lock_results = [1]
+        self.migrated_elsewhere = False
+
+    def ddl(self):
+        return [statement for statement in self.statements if statement.startswith(("CREATE", "ALTER"))]
+
+
+class Connection:
+    def __init__(self, db):
+        self.db = db
+
+    async def cursor(self):
+        return SchemaCursor(self.db)
+
+    async def commit(self):
+        self.db.statements.append("COMMIT")
+
+
+class NoPool:
+    def release(self, conn):
+        pass
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = SchemaDB()
+
+    async def connection():
+        return Connection(db)
+
+    monkeypatch.setattr(server, "get_mysql_connection", connection)
+    monkeypatch.setattr(server, "mysql_pool", NoPool())
+    return db
+
+
+def test_migrations_are_applied_once_in_order(db):
+    cursor = SchemaCursor(db)
+    assert asyncio.run(server.migrate_schema(cursor)) == server.SCHEMA_VERSION
+    assert db.applied == [version for version, _, _ in server.SCHEMA_MIGRATIONS]
+    assert ("content_sections", "version") in db.columns and ("menu_items", "image") in db.columns
+
+    db.statements.clear()
+    assert asyncio.run(server.migrate_schema(cursor)) == server.SCHEMA_VERSION
+    assert db.ddl() == ["CREATE TABLE IF NOT EXISTS schema_migrations ( version INT PRIMARY KEY, "
+                        "description VARCHAR(255) NOT NULL, applied_at DATETIME NOT NULL )"]
+
+
+def test_only_pending_migrations_run_on_an_older_schema(db):
+    db.applied = [1, 2, 3]
+    asyncio.run(server.migrate_schema(SchemaCursor(db)))
+    assert db.applied == [1, 2, 3] + [version for version, _, _ in server.SCHEMA_MIGRATIONS[3:]]
+    assert not any("review_stats" in statement for statement in db.statements)
+
+
+def test_add_column_if_missing_leaves_existing_columns_alone(db):
+    db.columns.add(("content_sections", "version"))
+    cursor = SchemaCursor(db)
+    asyncio.run(server.add_column_if_missing(cursor, "content_sections", "version", "INT NOT NULL DEFAULT 1"))
+    asyncio.run(server.add_column_if_missing(cursor, "reviews", "updated_at", "DATETIME"))
+    assert db.ddl() == ["ALTER TABLE reviews ADD COLUMN updated_at DATETIME"]
+
+
+def test_init_database_migrates_under_the_named_lock(db):
+    assert asyncio.run(server.init_database()) is True
+    lock = db.statements.index("SELECT GET_LOCK('jimmys_schema_migrations', %s) AS locked")
+    release = db.statements.index("SELECT RELEASE_LOCK('jimmys_schema_migrations')")
+    migrations = [index for index, statement in enumerate(db.statements) if statement.startswith("INSERT INTO schema_migrations")]
+    assert lock < min(migrations) and max(migrations) < release < db.statements.index("COMMIT")
+
+
+def test_busy_lock_is_retried_and_gives_up_after_the_last_attempt(db, monkeypatch):
+    monkeypatch.setattr(server, "SCHEMA_LOCK_ATTEMPTS", 3)
+    db.lock_results = [0, 0, 0]
+    assert asyncio.run(server.init_database()) is False
+    assert db.applied == []
+    assert "SELECT RELEASE_LOCK('jimmys_schema_migrations')" not in db.statements
+
+
+def test_worker_waiting_for_the_lock_stops_once_another_worker_migrated(db):
+    db.lock_results = [0]
+    db.migrated_elsewhere = True
+    assert asyncio.run(server.init_database()) is True
+    assert db.applied == [server.SCHEMA_VERSION] and db.ddl() == []
+
+
+def test_contact_and_newsletter_writes_issue_no_ddl(db):
+    async def test():
+        await server.submit_contact_form({"name": "Ana", "email": "ana@example.com", "subject": "Hola", "message": "Tisch"})
+        await server.newsletter_subscribe({"email": " Ana@Example.com "})
+
+    asyncio.run(test())
+    assert [statement.split(" (")[0] for statement in db.statements] == [
+        "INSERT INTO contact_messages", "INSERT INTO newsletter_subscribers"]
@@ -0,0 +1,146 @@
+import asyncio
+
+import aiomysql
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+class BootCursor:
+    """Answers the boot state query; everything after it is only recorded."""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    async def execute(self, statement, params=()):
+        statement = " ".join(statement.split())
+        self.db.statements.append(statement)
+        if self.db.down:
+            raise ConnectionError("Can't connect to MySQL server")
+        self.result = [{}]
+        if statement.startswith("SELECT (SELECT MAX(version) FROM schema_migrations)"):
+            if self.db.state is None:
+                raise aiomysql.ProgrammingError(1146, "Table 'schema_migrations' doesn't exist")
+            self.result = [self.db.state]
+        elif statement.startswith("SELECT GET_LOCK"):
+            self.result = [{"locked": 1}]
+        elif statement.startswith("SELECT COALESCE(MAX(version), 0)"):
+            self.result = [{"version": (self.db.state or {}).get("version") or 0}]
+        elif statement.startswith("SELECT COUNT(*) as count FROM users"):
+            self.result = [{"count": int(bool(self.db.state and self.db.state["has_admin"]))}]
+        elif statement.startswith("SELECT COUNT(*) as count FROM menu_items"):
+            self.result = [{"count": int(bool(self.db.state and self.db.state["has_menu"]))}]
+        elif "information_schema.COLUMNS" in statement:
+            self.result = [{"count": 1}]
+
+    async def fetchone(self):
+        return self.result[0]
+
+
+class BootDB:
+    def __init__(self, state):
+        self.state = state
+        self.statements = []
+        self.down = False
+
+    def ran(self, prefix):
+        return [statement for statement in self.statements if statement.startswith(prefix)]
+
+
+class Connection:
+    def __init__(self, db):
+        self.db = db
+
+    async def cursor(self):
+        return BootCursor(self.db)
+
+    async def commit(self):
+        pass
+
+
+class NoPool:
+    def release(self, conn):
+        pass
+
+
+def current_state(**changes):
+    return {"version": server.SCHEMA_VERSION, "has_admin": 1, "has_menu": 1, **changes}
+
+
+@pytest.fixture
+def boot(monkeypatch):
+    def install(state):
+        db = BootDB(state)
+
+        async def connection():
+            return Connection(db)
+
+        async def password_hash(password):
+            return "hashed"
+
+        monkeypatch.setattr(server, "get_mysql_connection", connection)
+        monkeypatch.setattr(server, "mysql_pool", NoPool())
+        monkeypatch.setattr(server, "get_password_hash", password_hash)
+        return db
+    return install
+
+
+def test_warm_boot_is_a_single_query(boot):
+    db = boot(current_state())
+    assert asyncio.run(server.init_database()) is True
+    assert len(db.statements) == 1 and db.ran("SELECT GET_LOCK") == []
+
+
+@pytest.mark.parametrize("state", [
+    None, current_state(version=server.SCHEMA_VERSION - 1), current_state(has_admin=0), current_state(has_menu=0)])
+def test_fresh_outdated_or_unseeded_databases_take_the_slow_path(boot, state):
+    db = boot(state)
+    assert asyncio.run(server.init_database()) is True
+    assert len(db.ran("SELECT GET_LOCK")) == 1 and len(db.ran("SELECT RELEASE_LOCK")) == 1
+    pending = len([version for version, _, _ in server.SCHEMA_MIGRATIONS if version > ((state or {}).get("version") or 0)])
+    assert len(db.ran("INSERT INTO schema_migrations")) == pending
+    assert len(db.ran("INSERT INTO users")) == int(not (state and state["has_admin"]))
+    assert bool(db.ran("INSERT INTO menu_items")) == (not (state and state["has_menu"]))
+
+
+def test_startup_records_step_timings_and_marks_ready(boot, monkeypatch):
+    boot(current_state())
+    calls = []
+
+    async def init_pool():
+        calls.append("pool")
+
+    async def sync(force=False):
+        calls.append(("cms", force))
+
+    monkeypatch.setattr(server, "boot_state", {"ready": False, "database_initialized": False, "timings_ms": {}})
+    monkeypatch.setattr(server, "init_mysql_pool", init_pool)
+    monkeypatch.setattr(server.cms_registry, "sync", sync)
+    asyncio.run(server.startup_event())
+
+    assert calls == ["pool", ("cms", True)]
+    assert server.boot_state["ready"] and server.boot_state["database_initialized"]
+    assert list(server.boot_state["timings_ms"]) == ["mysql_pool", "init_database", "cms_sync", "total"]
+
+
+def test_readiness_probe_needs_a_finished_startup_and_a_reachable_database(boot, monkeypatch):
+    db = boot(current_state())
+    client = TestClient(server.app)
+    monkeypatch.setattr(server, "boot_state", {"ready": False, "database_initialized": False, "timings_ms": {}})
+    response = client.get("/api/health/ready")
+    assert response.status_code == 503 and response.headers["cache-control"] == "no-store"
+    assert db.statements == []
+
+    server.boot_state.update(ready=True, database_initialized=True)
+    response = client.get("/api/health/ready")
+    assert response.status_code == 200 and response.json()["database"] is True
+
+    db.down = True
+    assert client.get("/api/health/ready").status_code == 503
+
+    # A failed init_database never turns ready, even with MySQL back
+    db.down = False
+    server.boot_state["database_initialized"] = False
+    assert client.get("/api/health/ready").status_code == 503